@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# Measure the cold-start time of "cobang decode" on one small image, against only importing what the GUI needs.
+# Run from the repository root: python3 dev/bench-cli-startup.py
+
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import qrcode
+
+
+ROOT = Path(__file__).parent.parent
+ROUNDS = 10
+
+DECODE_SCRIPT = """
+import sys
+sys.path.insert(0, {root!r})
+from src import cli
+cli.main([{path!r}])
+"""
+
+GUI_IMPORT_SCRIPT = """
+import gi
+gi.require_version('Gtk', '4.0')
+gi.require_version('Adw', '1')
+gi.require_version('Gst', '1.0')
+from gi.repository import Adw, Gst, Gtk
+Gst.init(None)
+"""
+
+
+def measure(script: str) -> list[float]:
+    timings = []
+    for _i in range(ROUNDS):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', script], check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(label: str, timings: list[float]):
+    print(f'{label:<28} median {statistics.median(timings) * 1000:7.1f} ms, min {min(timings) * 1000:7.1f} ms')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        path = Path(folder) / 'label.png'
+        qrcode.make('https://quan.hoabinh.vn').save(path)
+        report('python -c pass', measure('pass'))
+        report('cobang decode label.png', measure(DECODE_SCRIPT.format(root=str(ROOT), path=str(path))))
+        report('GUI imports + Gst.init', measure(GUI_IMPORT_SCRIPT))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# Compare the old and new way of handing webcam frames to ZBar:
+# bytes copied and Python allocations per frame.
+# python-zbar only accepts bytes, so both copy the frame once. The new way unmaps the buffer
+# and doesn't keep the copy around.
+# Run from the repository root: python3 dev/bench-frame-access.py
+
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import gi
+
+
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst  # noqa: E402
+
+from src.decoding import get_zbar_data  # noqa: E402
+from src.frame_access import mapped_sample  # noqa: E402
+
+
+FRAMES = 500
+SIZES = ((640, 480), (1920, 1080), (3840, 2160))
+
+
+def make_sample(width: int, height: int) -> Gst.Sample:
+    buffer = Gst.Buffer.new_wrapped(bytes(width * height))
+    caps = Gst.Caps.from_string(f'video/x-raw,format=GRAY8,width={width},height={height}')
+    return Gst.Sample.new(buffer, caps, None, None)
+
+
+def old_path(sample: Gst.Sample) -> int:
+    # What on_new_webcam_sample used to do: map, copy the plane out and never unmap.
+    buffer = sample.get_buffer()
+    mapinfo = buffer.map(Gst.MapFlags.READ)
+    data = mapinfo.data.tobytes() if isinstance(mapinfo.data, memoryview) else mapinfo.data
+    return len(data)
+
+
+def new_path(sample: Gst.Sample) -> int:
+    with mapped_sample(sample) as frame:
+        assert frame
+        # What scan_mapped_frame() hands to ZBar.
+        return len(get_zbar_data(frame))
+
+
+def measure(func, sample: Gst.Sample) -> tuple[float, float, float]:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    copied = 0
+    start = time.perf_counter()
+    for _i in range(FRAMES):
+        copied += func(sample)
+    elapsed = time.perf_counter() - start
+    after = tracemalloc.take_snapshot()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n_allocs = sum(s.count_diff for s in after.compare_to(before, 'lineno') if s.count_diff > 0)
+    return copied / FRAMES, n_allocs / FRAMES, elapsed / FRAMES * 1000
+
+
+def main():
+    Gst.init(None)
+    print(f'{"size":>10} {"path":>4} {"bytes copied/frame":>20} {"live allocs/frame":>18} {"ms/frame":>9}')
+    for width, height in SIZES:
+        sample = make_sample(width, height)
+        for name, func in (('old', old_path), ('new', new_path)):
+            copied, allocs, ms = measure(func, sample)
+            print(f'{width}x{height:<5} {name:>4} {copied:>20.0f} {allocs:>18.2f} {ms:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
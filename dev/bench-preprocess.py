@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# Compare the PIL-chain preprocessing which prep.py used to do with the NumPy one in preprocess.py.
+# Run from the repository root: python3 dev/bench-preprocess.py
+
+import sys
+import time
+from pathlib import Path
+
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import gi
+
+
+gi.require_version('Gdk', '4.0')
+gi.require_version('Gst', '1.0')
+import numpy as np  # noqa: E402
+from PIL import Image, ImageOps  # noqa: E402
+
+from src.prep import invert_and_make_grayscale, is_image_almost_black_white, make_grayscale  # noqa: E402
+from src.preprocess import flatten_to_gray, invert, is_almost_black_white  # noqa: E402
+
+
+ROUNDS = 10
+SIZES = ((640, 480), (1920, 1080), (4000, 3000))
+
+
+def old_make_grayscale(rgba_img: Image.Image) -> Image.Image:
+    grayscale = rgba_img.convert('LA')
+    canvas = Image.new('LA', rgba_img.size, (255, 255))
+    canvas.paste(grayscale, mask=grayscale)
+    return canvas.convert('L')
+
+
+def old_invert_and_make_grayscale(rgba_img: Image.Image) -> Image.Image:
+    return ImageOps.invert(old_make_grayscale(rgba_img).convert('RGB')).convert('L')
+
+
+def old_is_image_almost_black_white(rgba_img: Image.Image) -> bool:
+    total_pixel = rgba_img.width * rgba_img.height
+    htg = rgba_img.histogram()
+    polar_red = sum(htg[:10] + htg[256 - 10 : 256])
+    polar_green = sum(htg[256 : 256 + 10] + htg[512 - 10 : 512])
+    polar_blue = sum(htg[512 : 512 + 10] + htg[768 - 10 : 768])
+    return (polar_red / total_pixel > 0.9) and (polar_green / total_pixel > 0.9) and (polar_blue / total_pixel > 0.9)
+
+
+CASES = (
+    ('grayscale', old_make_grayscale, make_grayscale, flatten_to_gray),
+    ('invert', old_invert_and_make_grayscale, invert_and_make_grayscale, lambda a: invert(flatten_to_gray(a))),
+    ('polarity', old_is_image_almost_black_white, is_image_almost_black_white, is_almost_black_white),
+)
+
+
+def measure(func, *args) -> float:
+    func(*args)
+    start = time.perf_counter()
+    for _i in range(ROUNDS):
+        func(*args)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def main():
+    rng = np.random.default_rng(0)
+    # "wrapper" is the prep.py function, with PIL image in and out.
+    # "array" is the preprocess.py function alone, for callers which already have the pixels in a buffer.
+    print(f'{"size":>10} {"case":>10} {"PIL ms":>9} {"wrapper ms":>11} {"array ms":>9}')
+    for width, height in SIZES:
+        pixels = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+        img = Image.fromarray(pixels, 'RGBA')
+        for name, old, wrapper, engine in CASES:
+            old_ms = measure(old, img)
+            wrapper_ms = measure(wrapper, img, width, height) if name != 'polarity' else measure(wrapper, img)
+            array_ms = measure(engine, pixels)
+            print(f'{width}x{height:<5} {name:>10} {old_ms:>9.2f} {wrapper_ms:>11.2f} {array_ms:>9.2f}')
+    # Polarity of a real black & white image, where all three channels must be counted.
+    bw = np.where(rng.random((3000, 4000, 1)) < 0.5, 0, 255).astype(np.uint8).repeat(4, axis=2)
+    bw_img = Image.fromarray(bw, 'RGBA')
+    old_ms = measure(old_is_image_almost_black_white, bw_img)
+    wrapper_ms = measure(is_image_almost_black_white, bw_img)
+    array_ms = measure(is_almost_black_white, bw)
+    print(f'{"4000x3000":>10} {"b&w polar":>10} {old_ms:>9.2f} {wrapper_ms:>11.2f} {array_ms:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Compare regenerating a QR code image from scratch, like the generator used to do on each style change,
+# with redoing only the raster stage from a cached matrix, and with the one-pixel-per-module preview buffer.
+# Run from the repository root: python3 dev/bench-qr-generate.py
+
+import sys
+import time
+from pathlib import Path
+
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import qrcode  # noqa: E402
+
+from src.consts import ErrorCorrectionLevel  # noqa: E402
+from src.qr_matrix import (  # noqa: E402
+    QRMatrixCache,
+    get_qrcode_error_correction,
+    make_qr_png,
+    rasterize_qr_matrix,
+    rasterize_qr_modules,
+)
+
+
+ROUNDS = 20
+TEXTS = {
+    'short URL': 'https://quan.hoabinh.vn',
+    'WiFi': 'WIFI:T:WPA;S:Home network;P:correct horse battery staple;;',
+    '1000 chars': 'x' * 1000,
+}
+COLORS = ('#000000', '#1c71d8', '#26a269', '#a51d2d')
+
+
+def full_generate(text: str, color: str):
+    qr = qrcode.QRCode(error_correction=get_qrcode_error_correction(ErrorCorrectionLevel.LOW), box_size=8, border=3)
+    qr.add_data(text)
+    qr.make(fit=True)
+    return qr.make_image(fill_color=color, back_color='#ffffff')
+
+
+def main():
+    for label, text in TEXTS.items():
+        start = time.perf_counter()
+        for i in range(ROUNDS):
+            full_generate(text, COLORS[i % len(COLORS)])
+        full = (time.perf_counter() - start) / ROUNDS
+        cache = QRMatrixCache()
+        start = time.perf_counter()
+        for i in range(ROUNDS):
+            matrix = cache.get_matrix(text, ErrorCorrectionLevel.LOW)
+            rasterize_qr_matrix(matrix, 8, 3, COLORS[i % len(COLORS)], '#ffffff')
+        staged = (time.perf_counter() - start) / ROUNDS
+        start = time.perf_counter()
+        for i in range(ROUNDS):
+            matrix = cache.get_matrix(text, ErrorCorrectionLevel.LOW)
+            make_qr_png(matrix, 8, 3, COLORS[i % len(COLORS)], '#ffffff')
+        png = (time.perf_counter() - start) / ROUNDS
+        start = time.perf_counter()
+        for i in range(ROUNDS):
+            matrix = cache.get_matrix(text, ErrorCorrectionLevel.LOW)
+            rasterize_qr_modules(matrix, 3, COLORS[i % len(COLORS)], '#ffffff').tobytes()
+        preview = (time.perf_counter() - start) / ROUNDS
+        print(
+            f'{label:>12}: full {full * 1000:7.2f} ms, cached matrix + raster {staged * 1000:7.2f} ms, '
+            f'+ PNG {png * 1000:7.2f} ms, module pixels for preview {preview * 1000:7.3f} ms'
+        )
+
+
+if __name__ == '__main__':
+    main()
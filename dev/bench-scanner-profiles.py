@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# Measure per-frame ZBar decode time for each scanner profile in the GSettings schema.
+# Run from the repository root: python3 dev/bench-scanner-profiles.py
+
+import statistics
+import sys
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import qrcode
+import zbar
+from gi.repository import GLib
+from PIL import Image
+
+from src.decoding import create_scanner
+from src.scanner_profiles import load_profiles
+
+
+ROOT = Path(__file__).parent.parent
+SCHEMA_FILE = ROOT / 'data' / 'vn.hoabinh.quan.CoBang.gschema.xml'
+FRAME_SIZE = (1280, 720)
+ROUNDS = 30
+
+
+def read_default_profiles():
+    tree = ET.parse(SCHEMA_FILE)
+    key = next(k for k in tree.iter('key') if k.get('name') == 'scanner-profiles')
+    value = GLib.Variant.parse(GLib.VariantType(key.get('type')), key.findtext('default'), None, None)
+    return load_profiles(value.unpack())
+
+
+def make_frames() -> dict[str, bytes]:
+    # Noise makes ZBar work as hard as with a real camera image.
+    empty = Image.effect_noise(FRAME_SIZE, 40)
+    with_qr = empty.copy()
+    qr = qrcode.make('https://github.com/hongquan/CoBang').get_image().convert('L').resize((240, 240))
+    with_qr.paste(qr, (500, 200))
+    return {'empty': empty.tobytes(), 'qr': with_qr.tobytes()}
+
+
+def main():
+    frames = make_frames()
+    width, height = FRAME_SIZE
+    print(f'{"profile":>12} {"frame":>6} {"median ms":>10} {"found":>6}')
+    for profile in read_default_profiles().values():
+        scanner = create_scanner(profile)
+        for frame_name, data in frames.items():
+            durations = []
+            found = 0
+            for _i in range(ROUNDS):
+                zimg = zbar.Image(width, height, 'Y800', data)
+                start = time.perf_counter()
+                found = scanner.scan(zimg)
+                durations.append(time.perf_counter() - start)
+            print(f'{profile.name:>12} {frame_name:>6} {statistics.median(durations) * 1000:>10.2f} {found:>6}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# Compare the old and new way of getting Y800 pixels out of a Gdk.Texture for ZBar:
+# PNG round trip + PIL compositing, versus Gdk.TextureDownloader.
+# Run from the repository root: python3 dev/bench-texture-grayscale.py
+
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import gi
+
+
+gi.require_version('Gdk', '4.0')
+gi.require_version('Gst', '1.0')
+from gi.repository import Gdk, GLib  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from src.prep import make_grayscale, texture_to_grayscale  # noqa: E402
+
+
+ROUNDS = 5
+# The last one is a 24MP photo.
+SIZES = ((640, 480), (1920, 1080), (4000, 3000), (6000, 4000))
+
+
+def make_texture(width: int, height: int, with_alpha: bool) -> Gdk.Texture:
+    channels = 4 if with_alpha else 3
+    fmt = Gdk.MemoryFormat.R8G8B8A8 if with_alpha else Gdk.MemoryFormat.R8G8B8
+    data = GLib.Bytes.new(os.urandom(width * height * channels))
+    return Gdk.MemoryTexture.new(width, height, fmt, data, width * channels)
+
+
+def old_path(texture: Gdk.Texture) -> Image.Image:
+    rgba_img = Image.open(io.BytesIO(texture.save_to_png_bytes().get_data()))
+    return make_grayscale(rgba_img, texture.get_width(), texture.get_height())
+
+
+def measure(func, texture: Gdk.Texture) -> float:
+    start = time.perf_counter()
+    for _i in range(ROUNDS):
+        func(texture)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def main():
+    print(f'{"size":>10} {"alpha":>5} {"old ms":>9} {"new ms":>9} {"speed-up":>8}')
+    for width, height in SIZES:
+        for with_alpha in (False, True):
+            texture = make_texture(width, height, with_alpha)
+            old_ms = measure(old_path, texture)
+            new_ms = measure(texture_to_grayscale, texture)
+            print(f'{width}x{height:<5} {with_alpha!s:>5} {old_ms:>9.1f} {new_ms:>9.1f} {old_ms / new_ms:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -36,6 +36,7 @@ gi.require_version('GObject', '2.0')
 gi.require_version('GLib', '2.0')
 gi.require_version('Gst', '1.0')
 gi.require_version('GstApp', '1.0')
+gi.require_version('GstVideo', '1.0')
 gi.require_version('Xdp', '1.0')
 gi.require_version('XdpGtk4', '1.0')
 gi.require_version('NM', '1.0')
@@ -47,7 +48,8 @@ from gi.repository import Adw, Gio, GLib, Gst, Gtk, Xdp  # pyright: ignore[repor
 from logbook import Logger
 
 from .consts import APP_ID, BRAND_NAME, SHORT_NAME
-from .prep import guess_mimetype
+from .metrics import startup_metrics
+from .prep import guess_mimetype, is_directory
 from .window import CoBangWindow
 
 
@@ -105,6 +107,13 @@ class CoBangApplication(Adw.Application):
         self.create_action('about', self.on_about_action)
         self.portal = Xdp.Portal()
 
+    def do_shutdown(self):
+        startup_metrics.save(self.get_version() or '0.0')
+        for win in self.get_windows():
+            if isinstance(win, CoBangWindow):
+                win.scanner_page.still_decoder.shutdown()
+        Adw.Application.do_shutdown(self)
+
     def do_activate(self):
         """Called when the application is activated.
 
@@ -119,7 +128,12 @@ class CoBangApplication(Adw.Application):
         """Called when the application is opened with files."""
         if not files:
             return
-        # We only handle the first file
+        if len(files) > 1 or is_directory(files[0]):
+            if not (win := cast(CoBangWindow | None, self.props.active_window)):
+                win = CoBangWindow(application=self)
+            win.present()
+            win.open_batch_scan(files)
+            return
         file = files[0]
         log.debug('Opening file: {}', file)
         mime_type = guess_mimetype(file)
@@ -173,6 +187,7 @@ class CoBangApplication(Adw.Application):
 
 def main(version):
     """The application's entry point."""
+    startup_metrics.restart()
     Gst.init(None)
     GLibLogHandler().push_application()
     app = CoBangApplication()
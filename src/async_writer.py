@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+
+from gi.repository import Gio, GLib  # pyright: ignore[reportMissingModuleSource]
+from logbook import Logger
+
+
+log = Logger(__name__)
+
+
+class ChunkedFileWriter:
+    """Write a stream of chunks to a file with Gio async calls, without blocking the main loop.
+
+    The next chunk is only pulled from `chunks` when the previous one is written, so a big file never has to
+    be held in memory. The file is replaced only when everything is written: on error, the old content stays.
+
+    `on_done` is called with the error, or None on success.
+    """
+
+    def __init__(
+        self,
+        file: Gio.File,
+        chunks: Iterator[bytes],
+        on_done: Callable[[Gio.File, GLib.Error | None], object],
+        priority: int = GLib.PRIORITY_DEFAULT,
+    ):
+        self.file = file
+        self.chunks = chunks
+        self.on_done = on_done
+        self.priority = priority
+        self.cancellable = Gio.Cancellable()
+        self.stream: Gio.FileOutputStream | None = None
+        # Rest of the current chunk, when the stream took only a part of it.
+        self.pending: GLib.Bytes | None = None
+        self.error: GLib.Error | None = None
+        self.bytes_written = 0
+
+    def start(self):
+        self.file.replace_async(
+            None, False, Gio.FileCreateFlags.REPLACE_DESTINATION, self.priority, self.cancellable, self.on_replaced
+        )
+
+    def cancel(self):
+        self.cancellable.cancel()
+
+    def on_replaced(self, file: Gio.File, result: Gio.AsyncResult):
+        try:
+            self.stream = file.replace_finish(result)
+        except GLib.Error as e:
+            self.on_done(file, e)
+            return
+        self.write_next()
+
+    def write_next(self):
+        assert self.stream
+        if self.pending is None:
+            if (chunk := next(self.chunks, None)) is None:
+                self.stream.close_async(self.priority, None, self.on_closed)
+                return
+            self.pending = GLib.Bytes.new(chunk)
+        self.stream.write_bytes_async(self.pending, self.priority, self.cancellable, self.on_written)
+
+    def on_written(self, stream: Gio.FileOutputStream, result: Gio.AsyncResult):
+        try:
+            n = stream.write_bytes_finish(result)
+        except GLib.Error as e:
+            self.abort(e)
+            return
+        assert self.pending
+        self.bytes_written += n
+        size = self.pending.get_size()
+        self.pending = self.pending.new_from_bytes(n, size - n) if n < size else None
+        self.write_next()
+
+    def abort(self, error: GLib.Error):
+        # Closing with a cancelled cancellable leaves the destination untouched.
+        log.error('Failed to write {}: {}', self.file.get_parse_name(), error)
+        self.error = error
+        self.cancellable.cancel()
+        assert self.stream
+        self.stream.close_async(self.priority, self.cancellable, self.on_closed)
+
+    def on_closed(self, stream: Gio.FileOutputStream, result: Gio.AsyncResult):
+        try:
+            stream.close_finish(result)
+        except GLib.Error as e:
+            self.error = self.error or e
+        self.on_done(self.file, self.error)
@@ -0,0 +1,139 @@
+"""Results, progress and export of batch scanning, i.e. decoding many image files at once."""
+
+from __future__ import annotations
+
+import csv
+import json
+import os
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from enum import StrEnum
+from pathlib import Path
+from typing import TYPE_CHECKING, TextIO
+
+
+if TYPE_CHECKING:
+    from .decoding import DecodedSymbol
+
+
+# Files with these extensions are picked when walking a folder. Files given explicitly are always tried.
+IMAGE_SUFFIXES = frozenset('.png .jpg .jpeg .jpe .jfif .gif .bmp .tif .tiff .webp .pbm .pgm .ppm .pnm .pdf'.split())
+EXPORT_FIELDS = ('path', 'status', 'frame', 'symbol_type', 'data', 'strategy', 'elapsed_ms', 'error')
+
+
+class BatchStatus(StrEnum):
+    FOUND = 'found'
+    NOT_FOUND = 'not-found'
+    ERROR = 'error'
+
+
+@dataclass
+class BatchResult:
+    path: str
+    symbols: list[DecodedSymbol] = field(default_factory=list)
+    # Name of the decode strategy which found the symbols.
+    strategy: str = ''
+    # Seconds, spent in the worker.
+    elapsed: float = 0
+    error: str = ''
+    # Index of the frame or page where the symbols are, for multi-frame images and PDFs.
+    frame: int = 0
+
+    @property
+    def status(self) -> BatchStatus:
+        if self.error:
+            return BatchStatus.ERROR
+        return BatchStatus.FOUND if self.symbols else BatchStatus.NOT_FOUND
+
+
+def iter_image_paths(paths: Iterable[str | Path]) -> Iterator[Path]:
+    """Yield the given files, and the image files in the given folders, recursively and in name order."""
+    for p in map(Path, paths):
+        if not p.is_dir():
+            yield p
+            continue
+        for root, dirs, files in os.walk(p):
+            dirs.sort()
+            for name in sorted(files):
+                if Path(name).suffix.lower() in IMAGE_SUFFIXES:
+                    yield Path(root, name)
+
+
+@dataclass
+class BatchProgress:
+    # Number of files found so far. It grows while folders are being walked.
+    total: int = 0
+    done: int = 0
+    found: int = 0
+    failed: int = 0
+    # Whether all the files have been found, i.e. "total" is final.
+    is_total_known: bool = False
+    started: float = field(default_factory=time.monotonic)
+    finished: float | None = None
+
+    def record(self, result: BatchResult):
+        self.done += 1
+        if result.status == BatchStatus.FOUND:
+            self.found += 1
+        elif result.status == BatchStatus.ERROR:
+            self.failed += 1
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Files per second."""
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0
+
+    @property
+    def fraction(self) -> float:
+        return self.done / self.total if self.total else 0
+
+
+def result_to_dict(result: BatchResult) -> dict[str, object]:
+    """One object per file, with all its symbols, for `cobang decode` output."""
+    return {
+        'path': result.path,
+        'status': result.status.value,
+        'frame': result.frame,
+        'symbols': [
+            {'type': s.type_name, 'data': s.data, 'quality': s.quality, 'location': [list(p) for p in s.location]}
+            for s in result.symbols
+        ],
+        'strategy': result.strategy,
+        'elapsed_ms': round(result.elapsed * 1000, 1),
+        'error': result.error,
+    }
+
+
+def iter_export_rows(results: Iterable[BatchResult]) -> Iterator[dict[str, str | float]]:
+    """One row per symbol, or one row for a file without symbol."""
+    for r in results:
+        base: dict[str, str | float] = {
+            'path': r.path,
+            'status': r.status.value,
+            'frame': r.frame,
+            'strategy': r.strategy,
+            'elapsed_ms': round(r.elapsed * 1000, 1),
+            'error': r.error,
+        }
+        if not r.symbols:
+            yield {**base, 'symbol_type': '', 'data': ''}
+        for s in r.symbols:
+            yield {**base, 'symbol_type': s.type_name, 'data': s.data}
+
+
+def write_csv(results: Iterable[BatchResult], stream: TextIO):
+    writer = csv.DictWriter(stream, EXPORT_FIELDS)
+    writer.writeheader()
+    writer.writerows(iter_export_rows(results))
+
+
+def write_jsonl(results: Iterable[BatchResult], stream: TextIO):
+    for row in iter_export_rows(results):
+        stream.write(json.dumps({k: row[k] for k in EXPORT_FIELDS}, ensure_ascii=False))
+        stream.write('\n')
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from logbook import Logger
+from PIL import Image
+
+from .batch import BatchProgress, BatchResult, iter_image_paths
+from .cascade import scan_prepared
+from .frames import iter_file_frames
+from .scanner_profiles import ScannerProfile
+from .strategies import DecodeStrategy
+
+
+log = Logger(__name__)
+
+# For thousands of files, throughput matters more than finding the hardest codes,
+# so we only try the strategies which rescue most of the images.
+BATCH_STRATEGIES: tuple[DecodeStrategy, ...] = (
+    DecodeStrategy('plain'),
+    DecodeStrategy('inverted', invert=True),
+    DecodeStrategy('adaptive-threshold', threshold=True),
+)
+# Files submitted to the pool per process, ahead of the ones being decoded. Enough to keep the processes busy,
+# few enough to stop quickly and to not hold a future for each of thousands of files.
+TASKS_PER_PROCESS = 4
+
+
+def decode_file(path: str, strategies: Sequence[DecodeStrategy], profile: ScannerProfile | None) -> BatchResult:
+    """Run in worker process. Try the strategies one after another until one finds a code.
+
+    For multi-frame images and PDFs, the frames are tried in order, and the first one with a code wins.
+    """
+    started = time.perf_counter()
+    try:
+        for index, gray in enumerate(iter_file_frames(path)):
+            for strategy in strategies:
+                if symbols := scan_prepared(strategy.prepare(gray), strategy, gray.size, profile):
+                    return BatchResult(path, symbols, strategy.name, time.perf_counter() - started, frame=index)
+    except (OSError, ValueError, EOFError, Image.DecompressionBombError) as e:
+        return BatchResult(path, elapsed=time.perf_counter() - started, error=str(e))
+    return BatchResult(path, elapsed=time.perf_counter() - started)
+
+
+class BatchScanner:
+    """Decode many image files, one file per task, in worker processes using all cores.
+
+    Folders are walked in a feeder thread, which submits the files as it finds them, so that the first
+    results come before the walking is done. Only a few tasks per process are submitted ahead.
+
+    `on_result` is called for each file and `on_finished` when all are done, both in a worker-managing thread.
+    """
+
+    def __init__(
+        self,
+        on_result: Callable[[BatchResult], object],
+        on_finished: Callable[[], object] | None = None,
+        n_processes: int = 0,
+        profile: ScannerProfile | None = None,
+        strategies: Sequence[DecodeStrategy] = BATCH_STRATEGIES,
+    ):
+        self.on_result = on_result
+        self.on_finished = on_finished
+        self.n_processes = n_processes or os.cpu_count() or 1
+        self.profile = profile
+        self.strategies = tuple(strategies)
+        self.progress = BatchProgress(is_total_known=True)
+        self.lock = threading.Lock()
+        self.slots = threading.Semaphore(self.n_processes * TASKS_PER_PROCESS)
+        self.roots: deque[str] = deque()
+        self.feeder: threading.Thread | None = None
+        self.n_running = 0
+        self.stopping = False
+        self.executor: ProcessPoolExecutor | None = None
+
+    @property
+    def is_running(self) -> bool:
+        with self.lock:
+            return bool(self.feeder or self.n_running)
+
+    def add(self, paths: Iterable[str]):
+        """Add files or folders to scan. They are queued after the ones which are already added."""
+        with self.lock:
+            self.roots.extend(paths)
+            self.stopping = False
+            if not self.feeder:
+                if not self.n_running:
+                    self.progress = BatchProgress()
+                self.progress.is_total_known = False
+                self.feeder = threading.Thread(target=self.run_feeder, name='cobang-batch-feeder', daemon=True)
+                self.feeder.start()
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        if not self.executor:
+            self.executor = ProcessPoolExecutor(self.n_processes, multiprocessing.get_context('spawn'))
+            log.info('Started {} processes for batch scanning', self.n_processes)
+        return self.executor
+
+    def run_feeder(self):
+        while True:
+            with self.lock:
+                if self.stopping or not self.roots:
+                    self.roots.clear()
+                    self.feeder = None
+                    self.progress.is_total_known = True
+                    finished = not self.n_running
+                    break
+                root = self.roots.popleft()
+            for path in iter_image_paths((root,)):
+                self.slots.acquire()
+                with self.lock:
+                    if self.stopping:
+                        self.slots.release()
+                        break
+                    self.n_running += 1
+                    self.progress.total += 1
+                future = self.submit(str(path))
+                future.add_done_callback(partial(self.on_future_done, str(path)))
+        if finished:
+            self.finish()
+
+    def submit(self, path: str) -> Future[BatchResult]:
+        try:
+            return self.get_executor().submit(decode_file, path, self.strategies, self.profile)
+        except BrokenProcessPool:
+            # A worker was killed, e.g. by the OOM killer on a huge image. Start new ones.
+            log.warning('Batch scanning processes died, restarting them')
+            self.executor = None
+            return self.get_executor().submit(decode_file, path, self.strategies, self.profile)
+
+    def on_future_done(self, path: str, future: Future[BatchResult]):
+        self.slots.release()
+        result = None
+        if not future.cancelled():
+            if e := future.exception():
+                # E.g. the worker was killed. The file still gets a row, as an error.
+                log.error('Batch decoding of {} failed: {}', path, e)
+                result = BatchResult(path, error=str(e) or type(e).__name__)
+            else:
+                result = future.result()
+        with self.lock:
+            self.n_running -= 1
+            if result:
+                self.progress.record(result)
+            finished = not self.n_running and not self.feeder
+        if result:
+            self.on_result(result)
+        if finished:
+            self.finish()
+
+    def finish(self):
+        self.progress.finished = time.monotonic()
+        log.info(
+            'Batch scanning done: {} files, {} with code, {} errors, {:.1f} files/s',
+            self.progress.done,
+            self.progress.found,
+            self.progress.failed,
+            self.progress.throughput,
+        )
+        if self.on_finished:
+            self.on_finished()
+
+    def stop(self):
+        """Stop submitting files. The ones already in the workers still report their results."""
+        with self.lock:
+            self.stopping = True
+            self.roots.clear()
+
+    def shutdown(self):
+        self.stop()
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
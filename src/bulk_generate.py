@@ -0,0 +1,276 @@
+"""Generate many QR codes at once, from a CSV file or a list with one content per line. No GTK here.
+
+The codes are made in worker processes and written, in the order of the list, into a folder or a ZIP file.
+"""
+
+from __future__ import annotations
+
+import csv
+import multiprocessing
+import re
+import threading
+import time
+import zipfile
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO, TextIO
+
+from logbook import Logger
+from qrcode.exceptions import DataOverflowError
+
+from .qr_export import QRExportFormat, QRStyle, iter_export_chunks
+from .qr_matrix import make_qr_matrix
+
+
+log = Logger(__name__)
+
+# Header names, in lower case, of the CSV column with the content to encode and of the one with the file name.
+TEXT_COLUMNS = ('text', 'data', 'content', 'url', 'value')
+NAME_COLUMNS = ('name', 'filename', 'file', 'id', 'tag')
+# Codes handed to a worker process at once. Each takes a few milliseconds, less than a round trip to the process.
+CHUNK_SIZE = 32
+# Below this, making the codes in the calling process is faster than starting the worker processes.
+MIN_PARALLEL_ITEMS = 64
+MAX_STEM_LENGTH = 100
+
+
+@dataclass(frozen=True)
+class BulkItem:
+    # File name, without extension.
+    name: str
+    text: str
+
+
+@dataclass
+class BulkResult:
+    item: BulkItem
+    # Name in the output folder or ZIP file. Empty if the code couldn't be made.
+    file_name: str = ''
+    size: int = 0
+    elapsed: float = 0
+    error: str = ''
+
+
+@dataclass
+class BulkProgress:
+    total: int = 0
+    done: int = 0
+    failed: int = 0
+    bytes_written: int = 0
+    started: float = field(default_factory=time.monotonic)
+    finished: float | None = None
+
+    def record(self, result: BulkResult):
+        self.done += 1
+        self.bytes_written += result.size
+        if result.error:
+            self.failed += 1
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Codes per second."""
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0
+
+    @property
+    def fraction(self) -> float:
+        return self.done / self.total if self.total else 0
+
+    def summary_text(self) -> str:
+        return (
+            f'{self.done} of {self.total} codes done, {self.failed} errors, {self.bytes_written / 1024:.0f} KiB, '
+            f'in {self.elapsed:.1f} s ({self.throughput:.0f} codes/s)'
+        )
+
+
+def make_file_stem(name: str) -> str:
+    """Make a name safe to use as file name, on any file system."""
+    stem = re.sub(r'[^\w.-]+', '_', name.strip()).strip('._')
+    return stem[:MAX_STEM_LENGTH]
+
+
+def name_items(rows: Iterable[tuple[str, str]]) -> list[BulkItem]:
+    """Make items from (name, text) rows, numbering the ones without name and making duplicate names unique."""
+    items = []
+    used: set[str] = set()
+    for index, (name, text) in enumerate(rows, 1):
+        base = make_file_stem(name) or f'qrcode-{index:05d}'
+        stem, n = base, 1
+        while stem.lower() in used:
+            n += 1
+            stem = f'{base}-{n}'
+        used.add(stem.lower())
+        items.append(BulkItem(stem, text))
+    return items
+
+
+def find_column(header: Sequence[str], names: Sequence[str]) -> int | None:
+    lowered = [h.strip().lower() for h in header]
+    return next((lowered.index(n) for n in names if n in lowered), None)
+
+
+def read_csv_items(stream: TextIO) -> list[BulkItem]:
+    """Read a CSV file. With a header, the columns are found by name, otherwise the first column is
+    the content and the second one, if any, the file name.
+    """
+    rows = [r for r in csv.reader(stream) if any(c.strip() for c in r)]
+    if not rows:
+        return []
+    text_index = find_column(rows[0], TEXT_COLUMNS)
+    name_index = find_column(rows[0], NAME_COLUMNS)
+    if text_index is None and name_index is None:
+        text_index, name_index = 0, 1
+    else:
+        rows = rows[1:]
+        if text_index is None:
+            # Only a name column is recognized, take the first other one as content.
+            text_index = 1 if name_index == 0 else 0
+    return name_items(
+        (row[name_index] if name_index is not None and name_index < len(row) else '', row[text_index])
+        for row in rows
+        if text_index < len(row) and row[text_index]
+    )
+
+
+def read_text_items(stream: TextIO) -> list[BulkItem]:
+    """Read a list with one content per line. Blank lines are skipped."""
+    return name_items(('', line) for raw in stream if (line := raw.rstrip('\r\n')).strip())
+
+
+def read_bulk_items(stream: TextIO, is_csv: bool) -> list[BulkItem]:
+    return read_csv_items(stream) if is_csv else read_text_items(stream)
+
+
+def is_csv_file(name: str) -> bool:
+    return name.lower().endswith('.csv')
+
+
+def read_bulk_file(path: str | Path, is_csv: bool | None = None) -> list[BulkItem]:
+    """Read a CSV file or a text list. By default, CSV files are recognized by their name."""
+    if is_csv is None:
+        is_csv = is_csv_file(str(path))
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return read_bulk_items(f, is_csv)
+
+
+def make_code(item: BulkItem, style: QRStyle, fmt: QRExportFormat) -> tuple[BulkResult, bytes]:
+    """Run in worker process. The matrix cache is not used, each text is encoded only once."""
+    started = time.perf_counter()
+    try:
+        matrix = make_qr_matrix(item.text, style.error_correction)
+    # Newer qrcode versions raise ValueError when no version is big enough.
+    except (DataOverflowError, ValueError):
+        return BulkResult(item, elapsed=time.perf_counter() - started, error='Too much data for a QR code'), b''
+    data = b''.join(iter_export_chunks(fmt, matrix, style))
+    result = BulkResult(item, f'{item.name}.{fmt.value}', len(data), time.perf_counter() - started)
+    return result, data
+
+
+class BulkOutput(ABC):
+    """Where the generated files go: a folder, or a ZIP file."""
+
+    @abstractmethod
+    def write(self, file_name: str, data: bytes): ...
+
+    @abstractmethod
+    def close(self): ...
+
+
+class FolderOutput(BulkOutput):
+    def __init__(self, folder: Path):
+        self.folder = folder
+        folder.mkdir(parents=True, exist_ok=True)
+
+    def write(self, file_name: str, data: bytes):
+        (self.folder / file_name).write_bytes(data)
+
+    def close(self):
+        pass
+
+
+class ZipOutput(BulkOutput):
+    """Write into a ZIP file, which can be a non-seekable stream like stdout."""
+
+    def __init__(self, target: Path | BinaryIO):
+        self.zip_file = zipfile.ZipFile(target, 'w')
+        self.date_time = time.localtime()[:6]
+
+    def write(self, file_name: str, data: bytes):
+        info = zipfile.ZipInfo(file_name, self.date_time)
+        # PNG is already compressed, SVG, PDF and EPS are text which shrinks a lot.
+        info.compress_type = zipfile.ZIP_STORED if file_name.endswith('.png') else zipfile.ZIP_DEFLATED
+        self.zip_file.writestr(info, data)
+
+    def close(self):
+        self.zip_file.close()
+
+
+def open_bulk_output(path: Path) -> BulkOutput:
+    """A ZIP file if the name ends with ".zip", a folder otherwise."""
+    if path.suffix.lower() == '.zip':
+        return ZipOutput(path)
+    return FolderOutput(path)
+
+
+def iter_codes(
+    items: Sequence[BulkItem], style: QRStyle, fmt: QRExportFormat, n_processes: int, stop: threading.Event
+) -> Iterator[tuple[BulkResult, bytes]]:
+    make = partial(make_code, style=style, fmt=fmt)
+    if len(items) < MIN_PARALLEL_ITEMS or n_processes < 2:
+        for item in items:
+            if stop.is_set():
+                return
+            yield make(item)
+        return
+    n_processes = min(n_processes, len(items) // CHUNK_SIZE + 1)
+    executor = ProcessPoolExecutor(n_processes, multiprocessing.get_context('spawn'))
+    try:
+        for pair in executor.map(make, items, chunksize=CHUNK_SIZE):
+            if stop.is_set():
+                return
+            yield pair
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def generate_codes(
+    items: Sequence[BulkItem],
+    style: QRStyle,
+    fmt: QRExportFormat,
+    output: BulkOutput,
+    n_processes: int,
+    progress: BulkProgress | None = None,
+    on_result: Callable[[BulkResult], object] | None = None,
+    stop: threading.Event | None = None,
+) -> BulkProgress:
+    """Make a code for each item, in worker processes, and write them to `output`, which is closed at the end.
+
+    `progress` is updated as the codes are written, it can be read from another thread.
+    """
+    progress = progress or BulkProgress()
+    progress.total = len(items)
+    stop = stop or threading.Event()
+    try:
+        for result, data in iter_codes(items, style, fmt, n_processes, stop):
+            if not result.error:
+                try:
+                    output.write(result.file_name, data)
+                except OSError as e:
+                    result.error = str(e)
+                    result.size = 0
+            progress.record(result)
+            if on_result:
+                on_result(result)
+    finally:
+        output.close()
+        progress.finished = time.monotonic()
+    log.info('Bulk generation done: {}', progress.summary_text())
+    return progress
@@ -0,0 +1,169 @@
+"""Pick the camera format to ask for, from the caps the device advertises.
+
+Working on caps strings (Gst.Caps.to_string()) instead of Gst.Structure lets us deal with
+fixed values, lists and ranges the same way across PyGObject versions.
+"""
+
+import re
+from dataclasses import dataclass
+from fractions import Fraction
+
+from logbook import Logger
+
+
+log = Logger(__name__)
+
+RAW_MEDIA_TYPE = 'video/x-raw'
+JPEG_MEDIA_TYPE = 'image/jpeg'
+# How expensive it is to get to GRAY8 (for ZBar) and RGB (for display) from each raw format.
+# Formats with a separate luma plane are the cheapest. Unlisted formats cost the most.
+RAW_FORMAT_COSTS = {
+    'GRAY8': 0,
+    'NV12': 1,
+    'NV21': 1,
+    'I420': 1,
+    'YV12': 1,
+    'YUY2': 2,
+    'YVYU': 2,
+    'UYVY': 2,
+}
+DEFAULT_FORMAT_COST = 3
+MAX_LADDER_LENGTH = 6
+
+FIELD_PATTERN = re.compile(r'([\w-]+)=\((\w+)\)(\{[^}]*\}|\[[^\]]*\]|[^,;]+)')
+
+
+@dataclass(frozen=True)
+class CapsCandidate:
+    media_type: str
+    # Raw pixel format, e.g. 'YUY2'. Empty for JPEG, or to let GStreamer choose.
+    format: str
+    width: int
+    height: int
+    framerate: Fraction
+
+    @property
+    def is_raw(self) -> bool:
+        return self.media_type == RAW_MEDIA_TYPE
+
+    @property
+    def area(self) -> int:
+        return self.width * self.height
+
+    def meets(self, width: int, height: int, fps: float) -> bool:
+        return self.width >= width and self.height >= height and self.framerate >= fps
+
+    def to_caps_string(self) -> str:
+        parts = [self.media_type]
+        if self.format:
+            parts.append(f'format={self.format}')
+        parts.append(f'width={self.width}')
+        parts.append(f'height={self.height}')
+        if self.framerate:
+            parts.append(f'framerate={self.framerate.numerator}/{self.framerate.denominator}')
+        return ','.join(parts)
+
+
+@dataclass
+class FieldValue:
+    # Fixed value or list of values.
+    choices: list[str]
+    # Range, as (min, max).
+    bounds: tuple[str, str] | None = None
+
+
+def parse_field_value(raw: str) -> FieldValue:
+    raw = raw.strip()
+    if raw.startswith('{'):
+        return FieldValue([v.strip() for v in raw.strip('{} ').split(',') if v.strip()])
+    if raw.startswith('['):
+        low, high, *_step = (v.strip() for v in raw.strip('[] ').split(','))
+        return FieldValue([], (low, high))
+    return FieldValue([raw])
+
+
+def parse_structure(text: str) -> tuple[str, dict[str, FieldValue]]:
+    media_type, _sep, rest = text.strip().partition(',')
+    fields = {m.group(1): parse_field_value(m.group(3)) for m in FIELD_PATTERN.finditer(rest)}
+    return media_type.strip(), fields
+
+
+def pick_size(value: FieldValue | None, target: int) -> list[int]:
+    if not value:
+        return [target]
+    if value.bounds:
+        low, high = int(value.bounds[0]), int(value.bounds[1])
+        return [min(max(target, low), high)]
+    return [int(v) for v in value.choices]
+
+
+def pick_framerate(value: FieldValue | None, target: float) -> Fraction:
+    """Pick the lowest framerate which is not below the target, or the highest available."""
+    if not value:
+        return Fraction(0)
+    if value.bounds:
+        low, high = Fraction(value.bounds[0]), Fraction(value.bounds[1])
+        return min(max(Fraction(target).limit_denominator(1000), low), high)
+    rates = sorted(Fraction(v) for v in value.choices)
+    return next((r for r in rates if r >= target), rates[-1])
+
+
+def parse_caps_string(caps: str, target_width: int, target_height: int, target_fps: float) -> list[CapsCandidate]:
+    candidates = []
+    for text in caps.split(';'):
+        if not text.strip():
+            continue
+        media_type, fields = parse_structure(text)
+        # This also skips "video/x-raw(memory:DMABuf)" and the like, we need frames in system memory.
+        if media_type not in (RAW_MEDIA_TYPE, JPEG_MEDIA_TYPE):
+            continue
+        formats = fields['format'].choices if media_type == RAW_MEDIA_TYPE and 'format' in fields else ['']
+        framerate = pick_framerate(fields.get('framerate'), target_fps)
+        for fmt in formats:
+            for width in pick_size(fields.get('width'), target_width):
+                for height in pick_size(fields.get('height'), target_height):
+                    candidates.append(CapsCandidate(media_type, fmt, width, height, framerate))
+    return candidates
+
+
+def build_caps_ladder(
+    caps: str, target_width: int, target_height: int, target_fps: float
+) -> list[CapsCandidate | None]:
+    """Build the list of caps to try, from the best to the worst.
+
+    The best are the smallest formats which meet the target resolution and framerate, raw ones first
+    because they don't need a JPEG decoder. Then come the formats below the target, from the biggest,
+    those with enough framerate first.
+    The last rung is None, which means not to ask for any format and let the driver decide.
+    """
+    candidates = set(parse_caps_string(caps, target_width, target_height, target_fps))
+    meeting = [c for c in candidates if c.meets(target_width, target_height, target_fps)]
+    below = [c for c in candidates if c not in meeting]
+    meeting.sort(key=lambda c: (not c.is_raw, c.area, c.framerate, RAW_FORMAT_COSTS.get(c.format, DEFAULT_FORMAT_COST)))
+    below.sort(
+        key=lambda c: (
+            c.framerate < target_fps,
+            -c.area,
+            not c.is_raw,
+            RAW_FORMAT_COSTS.get(c.format, DEFAULT_FORMAT_COST),
+        )
+    )
+    ladder: list[CapsCandidate | None] = [*meeting, *below][: MAX_LADDER_LENGTH - 1]
+    ladder.append(None)
+    log.debug('Caps ladder: {}', [c.to_caps_string() if c else 'any' for c in ladder])
+    return ladder
+
+
+def build_generic_caps_ladder(target_width: int, target_height: int, target_fps: float) -> list[CapsCandidate | None]:
+    """Ladder for when we cannot query the device, e.g. PipeWire camera from the portal."""
+    fps = Fraction(target_fps).limit_denominator(1000)
+    return [CapsCandidate(RAW_MEDIA_TYPE, '', target_width, target_height, fps), None]
+
+
+def build_caps_filter_desc(candidate: CapsCandidate | None) -> str:
+    """Return the part of the pipeline description to append to the source element."""
+    if not candidate:
+        return ''
+    if candidate.is_raw:
+        return f' ! {candidate.to_caps_string()}'
+    return f' ! {candidate.to_caps_string()} ! jpegdec'
@@ -0,0 +1,561 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, replace
+from itertools import count
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.sharedctypes import Synchronized
+
+import numpy as np
+import zbar  # zuban: ignore[import-not-found]
+from logbook import Logger
+from PIL import Image
+
+from .decoding import DecodedSymbol, create_scanner, symbols_from_image
+from .scanner_profiles import ScannerProfile
+from .strategies import DEFAULT_STRATEGIES, DecodeStrategy, count_strategies_in_flight, pick_strategies
+from .tiling import DEFAULT_TILE_SIZE, TILED_DECODE_MIN_PIXELS, Tile, count_tiles_in_flight, merge_symbols, plan_tiles
+
+
+log = Logger(__name__)
+
+# Leave one core for the UI and the webcam decode threads.
+DEFAULT_PROCESS_COUNT = max(1, min(4, (os.cpu_count() or 2) - 1))
+DEFAULT_MEMORY_LIMIT = 512 * 1024 * 1024
+# The image is copied into shared memory by bands of this many rows, to not make a full copy of it.
+COPY_BAND_HEIGHT = 256
+# Name of the "strategy" in the report when a large image is decoded in tiles.
+TILED_STRATEGY_NAME = 'tiled'
+
+# State of each worker process, set by init_worker().
+# Jobs with id up to this value are cancelled. The strategies check it between steps.
+worker_cancelled_job: Synchronized | None = None
+worker_scanners: dict[ScannerProfile | None, zbar.ImageScanner] = {}
+
+
+@dataclass
+class StrategyOutcome:
+    name: str
+    symbols: list[DecodedSymbol] = field(default_factory=list)
+    # Seconds spent in the worker. None if the strategy was cancelled before it started,
+    # or was still running when the report was made.
+    elapsed: float | None = None
+    cancelled: bool = False
+
+
+@dataclass
+class CascadeReport:
+    job_id: int
+    symbols: list[DecodedSymbol]
+    # Name of the strategy which produced the symbols.
+    winner: str | None
+    outcomes: list[StrategyOutcome]
+    # Wall time, from submission to the winner (or to the last strategy if none won).
+    elapsed: float
+    # For multi-frame images: index of the frame where the symbols are found, and how many frames were tried.
+    frame: int = 0
+    n_frames: int = 1
+    # Some strategies or tiles raised (dead worker, bad scanner config...), so "no code" is not to be trusted.
+    failed: bool = False
+
+    def summary_text(self) -> str:
+        def fmt(o: StrategyOutcome) -> str:
+            if o.elapsed is None:
+                return f'{o.name}: -'
+            suffix = ' (cancelled)' if o.cancelled else ''
+            return f'{o.name}: {o.elapsed * 1000:.1f} ms{suffix}'
+
+        result = f'won by {self.winner}' if self.winner else 'no result'
+        if self.failed:
+            result += ' (some failed)'
+        if self.n_frames > 1:
+            result += f' at frame {self.frame} of {self.n_frames} tried'
+        return f'{result} in {self.elapsed * 1000:.1f} ms. ' + ', '.join(fmt(o) for o in self.outcomes)
+
+
+def init_worker(cancelled_job: Synchronized):
+    global worker_cancelled_job
+    worker_cancelled_job = cancelled_job
+
+
+def is_job_cancelled(job_id: int) -> bool:
+    return worker_cancelled_job is not None and job_id <= worker_cancelled_job.value
+
+
+def get_worker_scanner(profile: ScannerProfile | None) -> zbar.ImageScanner:
+    if not (scanner := worker_scanners.get(profile)):
+        scanner = worker_scanners[profile] = create_scanner(profile)
+    return scanner
+
+
+def run_strategy(
+    job_id: int, strategy: DecodeStrategy, shm_name: str, size: tuple[int, int], profile: ScannerProfile | None
+) -> StrategyOutcome:
+    """Run in worker process. Prepare the shared grayscale image with the strategy and scan it."""
+    if is_job_cancelled(job_id):
+        return StrategyOutcome(strategy.name, cancelled=True)
+    started = time.perf_counter()
+    shm = SharedMemory(shm_name)
+    try:
+        with shm.buf[: size[0] * size[1]] as view:
+            gray = Image.frombytes('L', size, view)
+    finally:
+        shm.close()
+    prepared = strategy.prepare(gray)
+    if is_job_cancelled(job_id):
+        return StrategyOutcome(strategy.name, elapsed=time.perf_counter() - started, cancelled=True)
+    symbols = scan_prepared(prepared, strategy, size, profile)
+    return StrategyOutcome(strategy.name, symbols, time.perf_counter() - started)
+
+
+def scan_prepared(
+    prepared: Image.Image, strategy: DecodeStrategy, original_size: tuple[int, int], profile: ScannerProfile | None
+) -> list[DecodedSymbol]:
+    """Scan an image prepared by the strategy, and map the symbol locations back to the original image."""
+    zimg = zbar.Image(prepared.width, prepared.height, 'Y800', prepared.tobytes())
+    symbols = symbols_from_image(zimg) if get_worker_scanner(profile).scan(zimg) else []
+    return [
+        replace(s, location=tuple(strategy.map_back(p, prepared.size, original_size) for p in s.location))
+        for s in symbols
+    ]
+
+
+def run_tile(
+    job_id: int, tile: Tile, shm_name: str, size: tuple[int, int], profile: ScannerProfile | None
+) -> StrategyOutcome:
+    """Run in worker process. Cut the tile out of the shared image and scan it.
+
+    Only the tile is copied, the worker never holds the whole image.
+    """
+    name = get_tile_name(tile)
+    if is_job_cancelled(job_id):
+        return StrategyOutcome(name, cancelled=True)
+    started = time.perf_counter()
+    shm = SharedMemory(shm_name)
+    full = np.ndarray((size[1], size[0]), np.uint8, buffer=shm.buf)
+    try:
+        data = tile.cut(full).tobytes()
+    finally:
+        # The array must be released before the shared memory can be closed.
+        del full
+        shm.close()
+    width, height = tile.size
+    zimg = zbar.Image(width, height, 'Y800', data)
+    symbols = symbols_from_image(zimg) if get_worker_scanner(profile).scan(zimg) else []
+    symbols = [replace(s, location=tuple(tile.map_back(p) for p in s.location)) for s in symbols]
+    return StrategyOutcome(name, symbols, time.perf_counter() - started)
+
+
+def get_tile_name(tile: Tile) -> str:
+    return f'tile {tile.factor}x at {tile.left},{tile.top}'
+
+
+def copy_to_shared_memory(gray: Image.Image) -> SharedMemory:
+    width, height = gray.size
+    shm = SharedMemory(create=True, size=max(1, width * height))
+    for top in range(0, height, COPY_BAND_HEIGHT):
+        bottom = min(height, top + COPY_BAND_HEIGHT)
+        shm.buf[top * width : bottom * width] = gray.crop((0, top, width, bottom)).tobytes()
+    return shm
+
+
+class CascadeJob:
+    """The strategies of one image. Collect their outcomes as they finish.
+
+    The strategies are given to the workers in cascade order, only a few at a time to bound the memory,
+    the next one is submitted when one is done.
+    """
+
+    def __init__(
+        self,
+        decoder: StillImageDecoder,
+        job_id: int,
+        strategies: Sequence[DecodeStrategy],
+        shm: SharedMemory,
+        size: tuple[int, int],
+        on_done: Callable[[CascadeReport], object],
+    ):
+        self.decoder = decoder
+        self.job_id = job_id
+        self.shm = shm
+        self.size = size
+        self.profile = decoder.profile
+        self.on_done = on_done
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.waiting = deque(strategies)
+        self.n_running = 0
+        self.futures: list[Future[StrategyOutcome]] = []
+        self.outcomes: dict[str, StrategyOutcome] = {s.name: StrategyOutcome(s.name) for s in strategies}
+        self.n_failed = 0
+        self.report: CascadeReport | None = None
+
+    def start(self, n_in_flight: int):
+        for _i in range(n_in_flight):
+            self.submit_next()
+
+    def submit_next(self):
+        with self.lock:
+            if not self.waiting:
+                return
+            strategy = self.waiting.popleft()
+            self.n_running += 1
+        future = self.decoder.submit_task(run_strategy, self.job_id, strategy, self.shm.name, self.size, self.profile)
+        with self.lock:
+            self.futures.append(future)
+        future.add_done_callback(self.on_future_done)
+
+    def on_future_done(self, future: Future[StrategyOutcome]):
+        # Called in a thread of the executor, or in the submitting thread if the future is already done.
+        outcome = None
+        failed = False
+        if not future.cancelled():
+            if e := future.exception():
+                log.error('Decode strategy failed: {}', e)
+                failed = True
+            else:
+                outcome = future.result()
+        with self.lock:
+            self.n_failed += failed
+            if outcome:
+                self.outcomes[outcome.name] = outcome
+            if outcome and outcome.symbols and not self.report:
+                self.report = winner_report = self.make_report(outcome.name)
+            else:
+                winner_report = None
+        if winner_report:
+            self.cancel()
+            self.on_done(winner_report)
+        if self.decoder.is_cancelled(self.job_id):
+            with self.lock:
+                self.waiting.clear()
+        self.submit_next()
+        with self.lock:
+            self.n_running -= 1
+            finished = not self.n_running and not self.waiting
+            if finished and not self.report:
+                self.report = report = self.make_report(None)
+            else:
+                report = None
+        if report:
+            self.on_done(report)
+        if finished:
+            self.shm.unlink()
+            self.shm.close()
+
+    def make_report(self, winner: str | None) -> CascadeReport:
+        symbols = self.outcomes[winner].symbols if winner else []
+        return CascadeReport(
+            self.job_id,
+            symbols,
+            winner,
+            list(self.outcomes.values()),
+            time.perf_counter() - self.started,
+            failed=self.n_failed > 0,
+        )
+
+    def cancel(self):
+        """Skip the strategies which haven't started, and make the running ones stop before scanning."""
+        self.decoder.cancel_up_to(self.job_id)
+        with self.lock:
+            self.waiting.clear()
+            futures = list(self.futures)
+        for f in futures:
+            f.cancel()
+
+
+class TiledJob:
+    """The tiles of one large image.
+
+    To bound the memory, only a few tiles are given to the workers at a time, the next one is submitted when
+    one is done. All tiles are decoded, the symbols found in overlapping tiles are merged.
+    """
+
+    def __init__(
+        self,
+        decoder: StillImageDecoder,
+        job_id: int,
+        tiles: Sequence[Tile],
+        shm: SharedMemory,
+        size: tuple[int, int],
+        on_done: Callable[[CascadeReport], object],
+    ):
+        self.decoder = decoder
+        self.job_id = job_id
+        self.shm = shm
+        self.size = size
+        self.on_done = on_done
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.waiting = deque(tiles)
+        self.n_running = 0
+        self.outcomes: list[StrategyOutcome] = []
+        self.failed = False
+
+    def start(self, n_in_flight: int):
+        for _i in range(n_in_flight):
+            self.submit_next()
+
+    def submit_next(self):
+        with self.lock:
+            if not self.waiting:
+                return
+            tile = self.waiting.popleft()
+            self.n_running += 1
+        future = self.decoder.submit_task(run_tile, self.job_id, tile, self.shm.name, self.size, self.decoder.profile)
+        future.add_done_callback(self.on_future_done)
+
+    def on_future_done(self, future: Future[StrategyOutcome]):
+        if not future.cancelled():
+            if e := future.exception():
+                log.error('Decoding tile failed: {}', e)
+                self.failed = True
+            else:
+                with self.lock:
+                    self.outcomes.append(future.result())
+        if self.decoder.is_cancelled(self.job_id):
+            with self.lock:
+                self.waiting.clear()
+        self.submit_next()
+        with self.lock:
+            self.n_running -= 1
+            finished = not self.n_running and not self.waiting
+        if not finished:
+            return
+        self.shm.unlink()
+        self.shm.close()
+        symbols = merge_symbols(s for o in self.outcomes for s in o.symbols)
+        winner = TILED_STRATEGY_NAME if symbols else None
+        elapsed = time.perf_counter() - self.started
+        self.on_done(CascadeReport(self.job_id, symbols, winner, self.outcomes, elapsed, failed=self.failed))
+
+
+class FrameSequenceJob:
+    """The frames of a multi-frame image (or the pages of a PDF), decoded one after another.
+
+    The frames are pulled from the iterator in a thread, so that only one is in memory, and each one
+    goes through the strategy cascade like a single image. Each frame gets its own job id, so a new image
+    submitted meanwhile stops the sequence.
+    """
+
+    def __init__(
+        self,
+        decoder: StillImageDecoder,
+        job_id: int,
+        frames: Iterator[Image.Image],
+        on_done: Callable[[CascadeReport], object],
+        stop_at_first: bool = True,
+    ):
+        self.decoder = decoder
+        self.job_id = job_id
+        self.frames = frames
+        self.on_done = on_done
+        self.stop_at_first = stop_at_first
+        self.thread = threading.Thread(target=self.run, name='cobang-frame-decoder', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def decode_frame(self, job_id: int, gray: Image.Image) -> CascadeReport:
+        done = threading.Event()
+        reports: list[CascadeReport] = []
+
+        def on_frame_done(report: CascadeReport):
+            reports.append(report)
+            done.set()
+
+        self.decoder.start_job(job_id, gray, on_frame_done)
+        done.wait()
+        return reports[0]
+
+    def run(self):
+        started = time.perf_counter()
+        job_id = self.job_id
+        symbols: list[DecodedSymbol] = []
+        outcomes: list[StrategyOutcome] = []
+        winner = None
+        first_hit = 0
+        n_frames = 0
+        failed = False
+        try:
+            for index, gray in enumerate(self.frames):
+                if index:
+                    if (next_id := self.decoder.get_next_frame_job_id(job_id)) is None:
+                        break
+                    job_id = next_id
+                report = self.decode_frame(job_id, gray)
+                # Let the frame go before the next one is read.
+                del gray
+                n_frames += 1
+                failed = failed or report.failed
+                outcomes.extend(replace(o, name=f'{o.name} #{index}') for o in report.outcomes)
+                if report.job_id != self.decoder.last_job_id:
+                    break
+                if report.symbols:
+                    if not winner:
+                        winner, first_hit = report.winner, index
+                    symbols.extend(report.symbols)
+                    if self.stop_at_first:
+                        break
+        except (OSError, ValueError, EOFError) as e:
+            log.error('Failed to read the next frame: {}', e)
+        except Exception as e:
+            # E.g. a corrupt frame which Pillow can't parse, or dead workers. The result is partial.
+            log.error('Failed to decode the frames: {}', e)
+            failed = True
+        finally:
+            # Always report, or the caller would wait forever.
+            # If another image has been submitted, the id is stale and the report is ignored, like for a single image.
+            elapsed = time.perf_counter() - started
+            self.on_done(CascadeReport(job_id, symbols, winner, outcomes, elapsed, first_hit, n_frames, failed))
+
+
+class StillImageDecoder:
+    """Decode a still image by running a cascade of preprocessing strategies in worker processes.
+
+    All strategies are submitted at once and picked by the workers in cascade order. The first one which
+    finds a code wins, the others are cancelled. The image is put in shared memory once, instead of being
+    pickled for each strategy.
+
+    Images which are too large to be copied for each strategy are decoded in tiles instead, see TiledJob.
+
+    Processes are spawned, not forked, because the main process runs GTK and GStreamer threads.
+    They are started at the first decode.
+    """
+
+    def __init__(
+        self,
+        strategies: Sequence[DecodeStrategy] = DEFAULT_STRATEGIES,
+        n_processes: int = DEFAULT_PROCESS_COUNT,
+        profile: ScannerProfile | None = None,
+        memory_limit: int = DEFAULT_MEMORY_LIMIT,
+        tile_size: int = DEFAULT_TILE_SIZE,
+    ):
+        self.strategies = tuple(strategies)
+        self.n_processes = max(1, n_processes)
+        # In bytes. Bounds the strategies or tiles decoded at the same time.
+        self.memory_limit = memory_limit
+        self.tile_size = tile_size
+        # Can be replaced at any time, it is used from the next decode.
+        self.profile = profile
+        self.mp_context = multiprocessing.get_context('spawn')
+        self.cancelled_job = self.mp_context.Value('q', 0)
+        self.job_ids = count(1)
+        self.last_job_id = 0
+        self.job_id_lock = threading.Lock()
+        self.executor: ProcessPoolExecutor | None = None
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        if not self.executor:
+            self.executor = ProcessPoolExecutor(
+                self.n_processes, self.mp_context, initializer=init_worker, initargs=(self.cancelled_job,)
+            )
+            log.info('Started {} processes for still image decoding', self.n_processes)
+        return self.executor
+
+    def warm_up(self):
+        """Start the worker processes ahead of the first decode, spawning them takes a while."""
+        if self.executor:
+            return
+        executor = self.get_executor()
+        for _i in range(self.n_processes):
+            executor.submit(int)
+
+    def cancel(self):
+        """Cancel the decoding which is in progress, if any. Its report won't match `last_job_id` anymore."""
+        with self.job_id_lock:
+            self.cancel_up_to(self.last_job_id)
+            self.last_job_id = next(self.job_ids)
+
+    def new_job_id(self) -> int:
+        """Allocate the id for a new image, cancelling the previous ones, which are not interesting anymore."""
+        with self.job_id_lock:
+            job_id = self.last_job_id = next(self.job_ids)
+        self.cancel_up_to(job_id - 1)
+        return job_id
+
+    def get_next_frame_job_id(self, previous: int) -> int | None:
+        """Allocate the id for the next frame of an image, unless another image has been submitted since."""
+        with self.job_id_lock:
+            if self.last_job_id != previous:
+                return None
+            job_id = self.last_job_id = next(self.job_ids)
+        return job_id
+
+    def cancel_up_to(self, job_id: int):
+        with self.cancelled_job.get_lock():
+            self.cancelled_job.value = max(self.cancelled_job.value, job_id)
+
+    def is_cancelled(self, job_id: int) -> bool:
+        return job_id <= self.cancelled_job.value
+
+    def submit_task(self, fn: Callable[..., StrategyOutcome], *args) -> Future[StrategyOutcome]:
+        try:
+            return self.get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker was killed, e.g. by the OOM killer on a huge image. Start new ones.
+            log.warning('Still image decoding processes died, restarting them')
+            self.executor = None
+            return self.get_executor().submit(fn, *args)
+
+    def submit(self, gray: Image.Image, on_done: Callable[[CascadeReport], object]) -> CascadeJob | TiledJob:
+        """Start decoding a grayscale image. on_done is called once, from a worker-managing thread.
+
+        A new image cancels the previous one, which is not interesting anymore.
+        """
+        return self.start_job(self.new_job_id(), gray, on_done)
+
+    def submit_frames(
+        self, frames: Iterator[Image.Image], on_done: Callable[[CascadeReport], object], stop_at_first: bool = True
+    ) -> FrameSequenceJob:
+        """Start decoding the frames of a multi-frame image, one by one. See FrameSequenceJob."""
+        job = FrameSequenceJob(self, self.new_job_id(), frames, on_done, stop_at_first)
+        job.start()
+        return job
+
+    def start_job(
+        self, job_id: int, gray: Image.Image, on_done: Callable[[CascadeReport], object]
+    ) -> CascadeJob | TiledJob:
+        shm = copy_to_shared_memory(gray)
+        width, height = gray.size
+        if width * height > TILED_DECODE_MIN_PIXELS:
+            tiles = plan_tiles(width, height, self.tile_size)
+            n_in_flight = count_tiles_in_flight(self.memory_limit, width * height, self.tile_size, self.n_processes)
+            log.info('Decoding {}x{} image in {} tiles, {} at a time', width, height, len(tiles), n_in_flight)
+            tiled_job = TiledJob(self, job_id, tiles, shm, gray.size, on_done)
+            tiled_job.start(n_in_flight)
+            return tiled_job
+        strategies = pick_strategies(self.strategies, width, height)
+        if not strategies:
+            strategies = [DecodeStrategy('plain')]
+        n_in_flight = count_strategies_in_flight(self.memory_limit, strategies, width, height, self.n_processes)
+        if n_in_flight < self.n_processes:
+            log.info('Decoding {}x{} image with {} strategies at a time', width, height, n_in_flight)
+        job = CascadeJob(self, job_id, strategies, shm, gray.size, on_done)
+        job.start(n_in_flight)
+        return job
+
+    def decode(self, gray: Image.Image) -> CascadeReport:
+        """Decode and wait for the result."""
+        done = threading.Event()
+        reports: list[CascadeReport] = []
+
+        def on_done(report: CascadeReport):
+            reports.append(report)
+            done.set()
+
+        self.submit(gray, on_done)
+        done.wait()
+        return reports[0]
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from logbook import Logger
+from PIL import Image, ImageChops, ImageStat
+
+
+if TYPE_CHECKING:
+    from .frame_access import MappedFrame
+
+
+log = Logger(__name__)
+
+
+def make_thumbnail(frame: MappedFrame, width: int) -> Image.Image:
+    full = frame.to_image()
+    height = max(1, frame.height * width // frame.width)
+    return full.resize((width, height), Image.Resampling.BOX)
+
+
+@dataclass
+class ChangeGate:
+    """Skip decoding of frames which look the same as the last decoded one.
+
+    Frames are compared by the mean absolute difference (in gray levels, 0-255) of small thumbnails.
+    A frame is scanned anyway if the last scan is older than `force_interval` seconds,
+    in case the small change we ignored was the one which matters.
+
+    Decode workers share one gate, so it is thread-safe.
+    """
+
+    # Mean difference below which two frames are considered the same. 0 disables the gate.
+    threshold: float = 2.0
+    force_interval: float = 2.0
+    thumbnail_width: int = 32
+    last_thumbnail: Image.Image | None = field(default=None, init=False)
+    last_scan_at: float = field(default=0.0, init=False)
+    frames_checked: int = field(default=0, init=False)
+    frames_skipped: int = field(default=0, init=False)
+    lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    @property
+    def skip_rate(self) -> float:
+        return self.frames_skipped / self.frames_checked if self.frames_checked else 0.0
+
+    def should_scan(self, frame: MappedFrame, now: float | None = None) -> bool:
+        if self.threshold <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        thumbnail = make_thumbnail(frame, self.thumbnail_width)
+        with self.lock:
+            self.frames_checked += 1
+            last = self.last_thumbnail
+            if last and last.size == thumbnail.size and now - self.last_scan_at < self.force_interval:
+                difference = ImageStat.Stat(ImageChops.difference(thumbnail, last)).mean[0]
+                if difference < self.threshold:
+                    self.frames_skipped += 1
+                    return False
+            self.last_thumbnail = thumbnail
+            self.last_scan_at = now
+            return True
+
+    def reset(self):
+        """Forget the last frame, so that the next one is always scanned."""
+        with self.lock:
+            self.last_thumbnail = None
+
+    def stats_text(self) -> str:
+        return (
+            f'Change gate checked {self.frames_checked} frames, skipped {self.frames_skipped} '
+            f'({self.skip_rate:.0%}) as unchanged'
+        )
@@ -0,0 +1,166 @@
+# cli.py
+#
+# Copyright 2025 Nguyễn Hồng Quân
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Headless `cobang decode FILE...` command.
+
+It must start fast, so this module and what it imports must not touch GTK, Adw or NetworkManager.
+GStreamer is only loaded when there are video files.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import TextIO
+
+import logbook
+
+from .batch import BatchResult, BatchStatus, iter_image_paths, result_to_dict
+from .batch_scanner import BATCH_STRATEGIES, decode_file
+from .scanner_profiles import ScannerProfile, load_profiles, pick_valid_profile
+from .strategies import DEFAULT_STRATEGIES
+from .video_results import DEFAULT_SAMPLE_INTERVAL, VIDEO_SUFFIXES, VideoScanReport
+
+
+COMMAND = 'decode'
+# Files handed to a worker process at once. Small images decode in a few milliseconds,
+# so sending them one by one would spend more time in inter-process communication.
+CHUNK_SIZE = 4
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog=f'cobang {COMMAND}',
+        description='Decode QR codes and barcodes in image and video files, printing one JSON object per file.',
+    )
+    parser.add_argument(
+        'paths', nargs='+', metavar='FILE', help='image or video files, or folders to scan recursively for images'
+    )
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=0, help='number of worker processes (default: number of CPU cores)'
+    )
+    parser.add_argument(
+        '--thorough',
+        action='store_true',
+        help='try all the image transformations which the GUI tries, slower but finds more codes',
+    )
+    parser.add_argument(
+        '--sample-interval',
+        type=float,
+        default=DEFAULT_SAMPLE_INTERVAL,
+        metavar='SECONDS',
+        help=f'for videos, decode one frame per this many seconds, 0 for every frame (default: {DEFAULT_SAMPLE_INTERVAL})',
+    )
+    parser.add_argument('--profile', help='use a scanner profile from the application settings, e.g. "qr"')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print log messages to stderr')
+    return parser
+
+
+def load_profile(name: str) -> ScannerProfile:
+    # Reading GSettings needs Gio, which is still much lighter than GTK. Only import it when asked.
+    from .settings import get_settings
+
+    if not (settings := get_settings()):
+        return ScannerProfile(name)
+    return pick_valid_profile(load_profiles(settings.get_value('scanner-profiles').unpack()), name)
+
+
+def is_video(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in VIDEO_SUFFIXES
+
+
+def decode_images(
+    files: Sequence[str], n_processes: int, thorough: bool = False, profile: ScannerProfile | None = None
+) -> Iterator[BatchResult]:
+    """Decode the image files, yielding results in the same order as the files."""
+    strategies = DEFAULT_STRATEGIES if thorough else BATCH_STRATEGIES
+    decode = partial(decode_file, strategies=strategies, profile=profile)
+    # Spawning processes costs more than decoding one file.
+    if len(files) < 2 or n_processes < 2:
+        yield from map(decode, files)
+        return
+    n_processes = min(n_processes, len(files))
+    with ProcessPoolExecutor(n_processes, multiprocessing.get_context('spawn')) as executor:
+        yield from executor.map(decode, files, chunksize=CHUNK_SIZE)
+
+
+def scan_video(path: str, sample_interval: float, profile: ScannerProfile | None) -> VideoScanReport:
+    import gi
+
+    try:
+        gi.require_version('Gst', '1.0')
+        gi.require_version('GstApp', '1.0')
+        gi.require_version('GstVideo', '1.0')
+    except ValueError:
+        return VideoScanReport(path, error='Scanning videos needs GStreamer')
+    from .video_scan import scan_video_file
+
+    return scan_video_file(path, sample_interval, profile)
+
+
+def decode_paths(
+    paths: Sequence[str],
+    n_processes: int,
+    thorough: bool = False,
+    profile: ScannerProfile | None = None,
+    sample_interval: float = DEFAULT_SAMPLE_INTERVAL,
+) -> Iterator[BatchResult | VideoScanReport]:
+    """Decode the files, yielding results in the same order as the files."""
+    files = [str(p) for p in iter_image_paths(paths)]
+    image_results = decode_images([f for f in files if not is_video(f)], n_processes, thorough, profile)
+    for path in files:
+        if not is_video(path):
+            yield next(image_results)
+            continue
+        yield scan_video(path, sample_interval, profile)
+
+
+def write_results(results: Iterator[BatchResult | VideoScanReport], stream: TextIO) -> int:
+    """Print results as JSON Lines. Return the exit code."""
+    code = 0
+    for result in results:
+        row = result.to_dict() if isinstance(result, VideoScanReport) else result_to_dict(result)
+        stream.write(json.dumps(row, ensure_ascii=False))
+        stream.write('\n')
+        stream.flush()
+        if row['status'] != BatchStatus.FOUND:
+            code = 1
+    return code
+
+
+def main(argv: Sequence[str]) -> int:
+    """Entry point of `cobang decode`. Exit code is 0 if all files have codes, 1 otherwise."""
+    args = build_parser().parse_args(argv)
+    level = logbook.DEBUG if args.verbose else logbook.WARNING
+    logbook.StderrHandler(level=level, bubble=False).push_application()
+    profile = load_profile(args.profile) if args.profile else None
+    n_processes = args.jobs or os.cpu_count() or 1
+    try:
+        results = decode_paths(args.paths, n_processes, args.thorough, profile, args.sample_interval)
+        return write_results(results, sys.stdout)
+    except BrokenPipeError:
+        # Output piped to "head" or the like, which has exited.
+        sys.stderr.close()
+        return 1
@@ -7,6 +7,8 @@ BRAND_NAME = 'CoBang'
 APP_ID = 'vn.hoabinh.quan.CoBang'
 
 ENV_EMULATE_SANDBOX = 'COBANG_LIKE_IN_SANDBOX'
+# Under the user cache folder, for the decode results of still images.
+DECODE_CACHE_FOLDER_NAME = 'decode-cache'
 
 
 class JobName(StrEnum):
@@ -123,3 +125,5 @@ GST_SOURCE_NAME = 'webcam_source'
 GST_FLIP_FILTER_NAME = 'videoflip'
 GST_SINK_NAME = 'widget_sink'
 GST_APP_SINK_NAME = 'app_sink'
+GST_SELECTOR_NAME = 'source_selector'
+GST_FREEZE_VALVE_NAME = 'freeze_valve'
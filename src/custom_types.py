@@ -1,3 +1,6 @@
+import os
+from datetime import datetime
+
 from gi.repository import GObject  # pyright: ignore[reportMissingModuleSource]
 
 from .consts import DeviceSourceType
@@ -11,16 +14,19 @@ class WebcamDeviceInfo(GObject.GObject):
     # or PipeWire serial number.
     path = GObject.Property(type=str)
     name = GObject.Property(type=str)
+    # Caps advertised by the device (Gst.Caps.to_string()), used to pick the format to ask for.
+    caps = GObject.Property(type=str, default='')
 
     __gsignals__ = {
         'changed': (GObject.SignalFlags.RUN_LAST, None, ()),
     }
 
-    def __init__(self, source_type: DeviceSourceType, path: str, name: str):
+    def __init__(self, source_type: DeviceSourceType, path: str, name: str, caps: str = ''):
         super().__init__()
         self.source_type = source_type
         self.path = path
         self.name = name
+        self.caps = caps
 
 
 class WifiNetworkInfo(GObject.GObject):
@@ -76,3 +82,48 @@ class GeneratorChoiceItem(GObject.GObject):
         super().__init__()
         self.label = label
         self.value = value
+
+
+class ScanResultItem(GObject.GObject):
+    """A code found in continuous scanning mode."""
+
+    __gtype_name__ = 'ScanResultItem'
+    data = GObject.Property(type=str)
+    # ZBar symbology name, e.g. QRCODE, EAN13.
+    symbol_type = GObject.Property(type=str)
+    # Unix time when the code was scanned.
+    timestamp = GObject.Property(type=float)
+    # The timestamp, formatted for display.
+    time_text = GObject.Property(type=str)
+
+    def __init__(self, data: str, symbol_type: str, timestamp: float):
+        super().__init__()
+        self.data = data
+        self.symbol_type = symbol_type
+        self.timestamp = timestamp
+        self.time_text = datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')
+
+
+class BatchResultItem(GObject.GObject):
+    """A row in the batch scanning results: a code found in a file, or a file without code."""
+
+    __gtype_name__ = 'BatchResultItem'
+    path = GObject.Property(type=str)
+    file_name = GObject.Property(type=str)
+    # Translated status, for display.
+    status_text = GObject.Property(type=str)
+    symbol_type = GObject.Property(type=str)
+    # The decoded data, or the error message.
+    data = GObject.Property(type=str)
+    strategy = GObject.Property(type=str)
+    time_text = GObject.Property(type=str)
+
+    def __init__(self, path: str, status_text: str, symbol_type: str, data: str, strategy: str, elapsed: float):
+        super().__init__()
+        self.path = path
+        self.file_name = os.path.basename(path)
+        self.status_text = status_text
+        self.symbol_type = symbol_type
+        self.data = data
+        self.strategy = strategy
+        self.time_text = f'{elapsed * 1000:.0f} ms'
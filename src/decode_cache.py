@@ -0,0 +1,160 @@
+"""Content-addressed cache of still image decode results.
+
+Pasting the same screenshot twice, or opening the same file again, gives the same grayscale pixels,
+so we key the results by a hash of those pixels and skip ZBar on a hit.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from collections.abc import Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from logbook import Logger
+from PIL import Image
+
+
+if TYPE_CHECKING:
+    from .decoding import DecodedSymbol
+    from .scanner_profiles import ScannerProfile
+
+
+log = Logger(__name__)
+
+DEFAULT_CAPACITY = 64
+DEFAULT_DISK_CAPACITY = 1024
+CACHE_FILE_SUFFIX = '.json'
+
+
+def get_image_key(gray: Image.Image, profile: ScannerProfile | None = None) -> str:
+    """Hash the pixels, plus what else changes the result: image size and scanner config."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{gray.mode} {gray.width}x{gray.height}\n'.encode())
+    if profile:
+        h.update('\n'.join(profile.to_config_strings()).encode())
+    h.update(gray.tobytes())
+    return h.hexdigest()
+
+
+def symbols_to_records(symbols: Sequence[DecodedSymbol]) -> list[dict]:
+    return [
+        {'type_name': s.type_name, 'data': s.data, 'quality': s.quality, 'location': [list(p) for p in s.location]}
+        for s in symbols
+    ]
+
+
+def records_to_symbols(records: Sequence[dict]) -> list[DecodedSymbol]:
+    # Imported here because decoding.py needs ZBar, which the rest of this module doesn't.
+    from .decoding import DecodedSymbol
+
+    return [
+        DecodedSymbol(r['type_name'], r['data'], r['quality'], tuple((x, y) for x, y in r['location'])) for r in records
+    ]
+
+
+class DecodeCache:
+    """LRU cache of decoded symbols, by image key. An empty result (no code found) is cached too.
+
+    If `folder` is given, the entries are also saved there, one small JSON file per image, and the least
+    recently used files are deleted when there are more than `disk_capacity` of them.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        folder: Path | None = None,
+        disk_capacity: int = DEFAULT_DISK_CAPACITY,
+    ):
+        self.capacity = capacity
+        self.folder = folder
+        self.disk_capacity = disk_capacity
+        self.entries: OrderedDict[str, list[DecodedSymbol]] = OrderedDict()
+        # Keys of the files on disk, least recently used first. Loaded on first use.
+        self.disk_keys: OrderedDict[str, None] | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> list[DecodedSymbol] | None:
+        symbols = self.entries.get(key)
+        if symbols is not None:
+            self.entries.move_to_end(key)
+        elif (symbols := self.load(key)) is not None:
+            self.remember(key, symbols)
+        if symbols is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return list(symbols)
+
+    def put(self, key: str, symbols: Sequence[DecodedSymbol]):
+        if self.capacity <= 0:
+            return
+        self.remember(key, list(symbols))
+        self.save(key, symbols)
+
+    def remember(self, key: str, symbols: list[DecodedSymbol]):
+        self.entries[key] = symbols
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+    def stats_text(self) -> str:
+        return f'{self.hits} hits, {self.misses} misses, {len(self.entries)} entries'
+
+    def get_file_path(self, key: str) -> Path:
+        assert self.folder
+        return self.folder / f'{key}{CACHE_FILE_SUFFIX}'
+
+    def get_disk_keys(self) -> OrderedDict[str, None]:
+        if self.disk_keys is None:
+            self.disk_keys = OrderedDict()
+            assert self.folder
+            try:
+                files = [e for e in os.scandir(self.folder) if e.name.endswith(CACHE_FILE_SUFFIX)]
+            except OSError:
+                files = []
+            for e in sorted(files, key=lambda e: e.stat().st_mtime):
+                self.disk_keys[e.name.removesuffix(CACHE_FILE_SUFFIX)] = None
+        return self.disk_keys
+
+    def load(self, key: str) -> list[DecodedSymbol] | None:
+        if not self.folder or key not in (disk_keys := self.get_disk_keys()):
+            return None
+        path = self.get_file_path(key)
+        try:
+            symbols = records_to_symbols(json.loads(path.read_text()))
+            # The file modification time tells which entries were used recently, after restart.
+            os.utime(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning('Failed to load cached decode result {}: {}', path, e)
+            disk_keys.pop(key, None)
+            return None
+        disk_keys.move_to_end(key)
+        return symbols
+
+    def save(self, key: str, symbols: Sequence[DecodedSymbol]):
+        if not self.folder or self.disk_capacity <= 0:
+            return
+        disk_keys = self.get_disk_keys()
+        try:
+            self.folder.mkdir(parents=True, exist_ok=True)
+            self.get_file_path(key).write_text(json.dumps(symbols_to_records(symbols), ensure_ascii=False))
+        except OSError as e:
+            log.warning('Failed to save decode result to cache: {}', e)
+            return
+        disk_keys[key] = None
+        disk_keys.move_to_end(key)
+        while len(disk_keys) > self.disk_capacity:
+            old_key, _v = disk_keys.popitem(last=False)
+            self.get_file_path(old_key).unlink(missing_ok=True)
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+import zbar  # zuban: ignore[import-not-found]
+from gi.repository import GLib, Gst  # pyright: ignore[reportMissingModuleSource]
+from logbook import Logger
+
+from .change_gate import ChangeGate
+from .decoding import DecodedSymbol, create_scanner
+from .frame_access import get_timestamp, mapped_sample
+from .governor import DecodeRateGovernor
+from .pyramid import FULL_RESOLUTION, DecodePyramid
+from .scanner_profiles import ScannerProfile
+
+
+log = Logger(__name__)
+
+
+@dataclass
+class WebcamFrame:
+    """A GRAY8 (Y800) sample pulled from the appsink.
+
+    We keep the Gst.Sample (and so its buffer) alive instead of copying the pixels out.
+    The buffer is only mapped by the worker, for the duration of the scan.
+    """
+
+    sample: Gst.Sample
+
+
+@dataclass
+class DecodeResult:
+    symbols: list[DecodedSymbol]
+    # The pyramid level which produced the symbols.
+    level: int
+    # Stream time of the frame, in seconds, if known.
+    timestamp: float | None = None
+
+
+class DecodeWorkerPool:
+    """Decode webcam frames with ZBar in worker threads.
+
+    Frames wait in a bounded queue. When the queue is full, the oldest frame is dropped,
+    because for a live camera the newest frame is always the most interesting one.
+    For a video file, `lossless` makes the submitter wait for room instead, so every frame is decoded.
+    Each worker owns its zbar.ImageScanner, which is not safe to share between threads.
+    Results are delivered to the GLib main loop via GLib.idle_add().
+    """
+
+    def __init__(
+        self,
+        on_result: Callable[[DecodeResult], object],
+        n_workers: int = 1,
+        queue_depth: int = 2,
+        pyramid_levels: Sequence[int] = (FULL_RESOLUTION,),
+        escalate_after: int = 10,
+        governor: DecodeRateGovernor | None = None,
+        change_gate: ChangeGate | None = None,
+        profile: ScannerProfile | None = None,
+        on_frame_decoded: Callable[[], object] | None = None,
+        lossless: bool = False,
+    ):
+        self.on_result = on_result
+        # Called in the worker thread after each decoded frame, with or without result.
+        self.on_frame_decoded = on_frame_decoded
+        self.pyramid_levels = tuple(pyramid_levels)
+        self.escalate_after = escalate_after
+        self.governor = governor
+        self.change_gate = change_gate
+        # Can be replaced while running, the workers pick up the new one at the next frame.
+        self.profile = profile
+        self.n_workers = max(1, n_workers)
+        self.queue: deque[WebcamFrame] = deque(maxlen=max(1, queue_depth))
+        self.cond = threading.Condition()
+        self.threads: list[threading.Thread] = []
+        self.stopping = False
+        self.lossless = lossless
+        # Workers exit when the queue is empty.
+        self.draining = False
+        self.frames_submitted = 0
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self.threads)
+
+    def start(self):
+        if self.threads:
+            return
+        self.stopping = False
+        self.draining = False
+        for i in range(self.n_workers):
+            t = threading.Thread(target=self.run_worker, name=f'cobang-decoder-{i}', daemon=True)
+            t.start()
+            self.threads.append(t)
+        log.info('Started {} decode workers, queue depth {}', self.n_workers, self.queue.maxlen)
+
+    def stop(self):
+        with self.cond:
+            self.stopping = True
+            self.queue.clear()
+            self.cond.notify_all()
+        for t in self.threads:
+            t.join()
+        self.threads.clear()
+        log.info('Stopped decode workers. {}', self.stats_text())
+
+    def drain(self):
+        """Decode the frames which are waiting, then stop the workers. Block until they are done."""
+        with self.cond:
+            self.draining = True
+            self.cond.notify_all()
+        for t in self.threads:
+            t.join()
+        self.threads.clear()
+        log.info('Drained decode workers. {}', self.stats_text())
+
+    def submit(self, frame: WebcamFrame):
+        """Queue a frame for decoding. Can be called from any thread, e.g. the GStreamer streaming thread."""
+        with self.cond:
+            if self.lossless:
+                while len(self.queue) == self.queue.maxlen and not self.stopping:
+                    self.cond.wait()
+            self.frames_submitted += 1
+            if len(self.queue) == self.queue.maxlen:
+                # deque with maxlen discards the item at the other end on append.
+                self.frames_dropped += 1
+            self.queue.append(frame)
+            self.cond.notify()
+
+    def flush(self):
+        """Drop the frames which are waiting, e.g. when the video is paused."""
+        with self.cond:
+            self.frames_dropped += len(self.queue)
+            self.queue.clear()
+
+    def stats_text(self) -> str:
+        return (
+            f'Frames submitted: {self.frames_submitted}, decoded: {self.frames_decoded}, dropped: {self.frames_dropped}'
+        )
+
+    def run_worker(self):
+        profile = self.profile
+        scanner = create_scanner(profile)
+        zimg = zbar.Image()
+        pyramid = DecodePyramid(self.pyramid_levels, self.escalate_after)
+        while True:
+            with self.cond:
+                while not self.queue and not self.stopping and not self.draining:
+                    self.cond.wait()
+                if self.stopping or not self.queue:
+                    return
+                frame = self.queue.popleft()
+                if self.lossless:
+                    # Wake up the submitter waiting for room.
+                    self.cond.notify_all()
+            if profile is not self.profile:
+                profile = self.profile
+                scanner = create_scanner(profile)
+            started = time.thread_time()
+            timestamp = get_timestamp(frame.sample)
+            with mapped_sample(frame.sample) as mapped:
+                if not mapped or (self.change_gate and not self.change_gate.should_scan(mapped)):
+                    hit = None
+                else:
+                    hit = pyramid.scan(scanner, zimg, mapped)
+            # Frames skipped by the change gate cost nearly nothing, they must not lower the governor's average.
+            # The gate counts them itself.
+            if self.governor and hit:
+                self.governor.record_decode(time.thread_time() - started, hit.evidence)
+            # Release our reference to the sample, so that GStreamer can recycle the buffer.
+            del frame
+            if not hit:
+                continue
+            with self.cond:
+                self.frames_decoded += 1
+            if self.on_frame_decoded:
+                self.on_frame_decoded()
+            if hit.symbols:
+                GLib.idle_add(self.on_result, DecodeResult(hit.symbols, hit.level, timestamp))
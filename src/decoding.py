@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Self, cast
+
+import zbar  # zuban: ignore[import-not-found]
+from logbook import Logger
+
+
+if TYPE_CHECKING:
+    from .frame_access import MappedFrame
+    from .scanner_profiles import ScannerProfile
+
+
+log = Logger(__name__)
+
+
+@dataclass(frozen=True)
+class DecodedSymbol:
+    """A plain copy of zbar.Symbol, safe to pass between threads.
+
+    zbar.Symbol objects belong to the zbar.Image they were found in, so we copy out
+    what we need before handing the result to the main loop.
+    """
+
+    type_name: str
+    data: str
+    quality: int = 0
+    location: tuple[tuple[int, int], ...] = ()
+
+    @classmethod
+    def from_zbar(cls, sym: zbar.Symbol) -> Self:
+        # We expect ZBar to return bytes, but it returns str.
+        return cls(
+            type_name=str(sym.type),
+            data=cast(str, sym.data),
+            quality=sym.quality,
+            location=tuple((int(x), int(y)) for x, y in sym.location),
+        )
+
+    def mapped_back(self, scale: float, offset_x: int = 0, offset_y: int = 0) -> Self:
+        """Map the location from a scaled or cropped image back to the original one."""
+        location = tuple((round(x * scale) + offset_x, round(y * scale) + offset_y) for x, y in self.location)
+        return replace(self, location=location)
+
+
+def create_scanner(profile: ScannerProfile | None = None) -> zbar.ImageScanner:
+    scanner = zbar.ImageScanner()
+    if profile:
+        profile.apply(scanner)
+    return scanner
+
+
+def symbols_from_image(zimg: zbar.Image) -> list[DecodedSymbol]:
+    return [DecodedSymbol.from_zbar(s) for s in zimg.symbols]
+
+
+def get_zbar_data(frame: MappedFrame) -> bytes:
+    """Get the pixels of a mapped frame as ZBar takes them.
+
+    The zbar.Image.data setter of python-zbar only accepts bytes, so a frame mapped as memoryview
+    is copied once here. Padded rows are dropped in the same copy.
+    """
+    data = frame.packed_data()
+    return data if isinstance(data, bytes) else data.tobytes()
+
+
+def scan_mapped_frame(scanner: zbar.ImageScanner, zimg: zbar.Image, frame: MappedFrame) -> list[DecodedSymbol]:
+    """Scan a mapped frame, reusing the given zbar.Image.
+
+    The frame is copied once for ZBar, see get_zbar_data(). The image data is detached before return,
+    so that the zbar.Image doesn't keep the copy alive until the next frame.
+    """
+    zimg.format = 'Y800'
+    zimg.size = (frame.width, frame.height)
+    zimg.data = get_zbar_data(frame)
+    try:
+        n = scanner.scan(zimg)
+        return symbols_from_image(zimg) if n else []
+    finally:
+        zimg.data = b''
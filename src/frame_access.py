@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from gi.repository import Gst, GstVideo  # pyright: ignore[reportMissingModuleSource]
+from logbook import Logger
+from PIL import Image
+
+
+log = Logger(__name__)
+
+
+@dataclass
+class MappedFrame:
+    """Read-only view of a GRAY8 frame, valid only inside the mapped_sample() block."""
+
+    width: int
+    height: int
+    # memoryview or bytes, depending on PyGObject version. No copy is made.
+    data: memoryview | bytes
+    # Bytes from the start of a row to the start of the next one, 0 means the same as width.
+    # GStreamer pads GRAY8 rows to a multiple of 4 bytes, so it differs when the width is not.
+    stride: int = 0
+
+    @property
+    def row_stride(self) -> int:
+        return self.stride or self.width
+
+    def to_image(self) -> Image.Image:
+        """Wrap the data in a Pillow image, without copying. The padding at the end of the rows is skipped."""
+        return Image.frombuffer('L', (self.width, self.height), self.data, 'raw', 'L', self.row_stride, 1)
+
+    def packed_data(self) -> memoryview | bytes:
+        """Get the data without row padding, as ZBar wants it. It is only copied if the rows are padded."""
+        if self.row_stride == self.width:
+            return self.data
+        return self.to_image().tobytes()
+
+
+def get_frame_layout(sample: Gst.Sample, buffer: Gst.Buffer) -> tuple[int, int, int, int] | None:
+    """Get width, height, row stride and offset of the first (only) plane of a GRAY8 frame.
+
+    The buffer's video meta, if any, wins over the caps, because the producer may use a different stride
+    than the default one computed from the caps.
+    """
+    if meta := GstVideo.buffer_get_video_meta(buffer):
+        return meta.width, meta.height, meta.stride[0], meta.offset[0]
+    if not (caps := sample.get_caps()):
+        return None
+    if not (info := GstVideo.VideoInfo.new_from_caps(caps)):
+        log.error('Failed to get video info from caps {}', caps.to_string())
+        return None
+    return info.width, info.height, info.stride[0], info.offset[0]
+
+
+def get_timestamp(sample: Gst.Sample) -> float | None:
+    """Presentation time of the sample's buffer, in seconds."""
+    if not (buffer := sample.get_buffer()) or buffer.pts == Gst.CLOCK_TIME_NONE:
+        return None
+    return buffer.pts / Gst.SECOND
+
+
+@contextmanager
+def mapped_sample(sample: Gst.Sample) -> Iterator[MappedFrame | None]:
+    """Map the sample's buffer for reading and always unmap it when the block exits.
+
+    Yield None if the sample has no buffer or its size is unknown.
+    The yielded data must not be used after the block.
+    """
+    if not (buffer := sample.get_buffer()) or not (layout := get_frame_layout(sample, buffer)):
+        yield None
+        return
+    width, height, stride, offset = layout
+    # The documentation https://lazka.github.io/pgi-docs/#Gst-1.0/classes/MapInfo.html says that
+    # the .data is a bytes, but in Ubuntu, it is a memoryview.
+    if not (mapinfo := buffer.map(Gst.MapFlags.READ)):
+        log.error('Failed to map buffer {}', buffer)
+        yield None
+        return
+    try:
+        data = mapinfo.data[offset:] if offset else mapinfo.data
+        yield MappedFrame(width, height, data, stride)
+    finally:
+        buffer.unmap(mapinfo)
@@ -0,0 +1,144 @@
+"""Lazy iteration over the frames of multi-frame images (TIFF, GIF, WebP...) and the pages of PDFs.
+
+Each frame is converted to grayscale when it is reached, so only one is in memory at a time.
+"""
+
+from __future__ import annotations
+
+import io
+from collections.abc import Iterator
+from functools import cache
+from types import ModuleType
+from typing import TYPE_CHECKING
+
+import numpy as np
+from logbook import Logger
+from PIL import Image
+
+from .preprocess import flatten_to_gray, to_color_array
+
+
+if TYPE_CHECKING:
+    from gi.repository import Poppler  # pyright: ignore[reportMissingModuleSource]
+
+
+log = Logger(__name__)
+
+PDF_MAGIC = b'%PDF-'
+PDF_CONTENT_TYPE = 'application/pdf'
+# Enough for the barcodes on a printed page, without making huge images.
+PDF_DPI = 150
+POINTS_PER_INCH = 72
+
+
+class UnsupportedDocumentError(ValueError):
+    pass
+
+
+@cache
+def load_poppler() -> ModuleType | None:
+    """Import Poppler, or return None if PDF rendering is not available.
+
+    PDF rendering is optional, it needs Poppler and the Cairo binding of PyGObject. They are only imported
+    when a PDF is met, so that the command line tool doesn't load PyGObject for images.
+    """
+    try:
+        import gi
+
+        gi.require_version('Poppler', '0.18')
+        import cairo  # noqa: F401
+        from gi.repository import Poppler
+    except (ImportError, ValueError):
+        return None
+    return Poppler
+
+
+def is_pdf(head: bytes) -> bool:
+    return head.startswith(PDF_MAGIC)
+
+
+def frame_to_gray(img: Image.Image) -> Image.Image:
+    if img.mode == 'L':
+        return img.copy()
+    return Image.fromarray(flatten_to_gray(to_color_array(img)))
+
+
+def count_frames(img: Image.Image) -> int:
+    return getattr(img, 'n_frames', 1)
+
+
+def iter_image_frames(img: Image.Image, start: int = 0) -> Iterator[Image.Image]:
+    """Yield the frames of an opened PIL image, in grayscale. The image must stay open during the iteration."""
+    for i in range(start, count_frames(img)):
+        img.seek(i)
+        yield frame_to_gray(img)
+
+
+def open_next_frames(data: bytes) -> Iterator[Image.Image] | None:
+    """Open the frames after the first one, if the image has more than one. The others are already decoded by GTK."""
+    try:
+        img = Image.open(io.BytesIO(data))
+    except (OSError, ValueError):
+        # Formats which GTK can load but Pillow can't, like SVG.
+        return None
+    try:
+        n_frames = count_frames(img)
+    except (OSError, ValueError, EOFError):
+        n_frames = 1
+    if n_frames < 2:
+        img.close()
+        return None
+    log.info('Image has {} frames', n_frames)
+    return iter_image_frames_then_close(img, start=1)
+
+
+def iter_image_frames_then_close(img: Image.Image, start: int = 0) -> Iterator[Image.Image]:
+    with img:
+        yield from iter_image_frames(img, start)
+
+
+def render_pdf_page(page: Poppler.Page, dpi: int = PDF_DPI) -> Image.Image:
+    import cairo
+
+    scale = dpi / POINTS_PER_INCH
+    page_width, page_height = page.get_size()
+    width, height = max(1, round(page_width * scale)), max(1, round(page_height * scale))
+    surface = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
+    context = cairo.Context(surface)
+    context.set_source_rgb(1, 1, 1)
+    context.paint()
+    context.scale(scale, scale)
+    page.render_for_printing(context)
+    surface.flush()
+    # Each pixel is a native-endian 32-bit xRGB, i.e. B, G, R, x bytes on little-endian machines.
+    pixels = np.ndarray((height, surface.get_stride() // 4, 4), np.uint8, surface.get_data())[:, :width]
+    rgb = pixels[..., 2::-1] if np.little_endian else pixels[..., 1:]
+    return Image.fromarray(flatten_to_gray(rgb))
+
+
+def iter_pdf_pages(data: bytes, dpi: int = PDF_DPI) -> Iterator[Image.Image]:
+    """Render the pages of a PDF document one by one, in grayscale."""
+    if not (Poppler := load_poppler()):
+        raise UnsupportedDocumentError('PDF support needs Poppler GObject introspection and PyCairo')
+    from gi.repository import GLib
+
+    try:
+        document = Poppler.Document.new_from_bytes(GLib.Bytes.new(data), None)
+    except GLib.Error as e:
+        raise UnsupportedDocumentError(e.message) from e
+    for i in range(document.get_n_pages()):
+        yield render_pdf_page(document.get_page(i), dpi)
+
+
+def iter_file_frames(path: str) -> Iterator[Image.Image]:
+    """Yield the frames or pages of an image or PDF file, in grayscale. PDF files are read whole."""
+    with open(path, 'rb') as f:
+        if is_pdf(f.read(len(PDF_MAGIC))):
+            f.seek(0)
+            yield from iter_pdf_pages(f.read())
+            return
+    with Image.open(path) as img:
+        if img.format == 'JPEG':
+            # Let the JPEG decoder skip the color conversion, it is much faster.
+            img.draft('L', img.size)
+        yield from iter_image_frames(img)
@@ -0,0 +1,185 @@
+# generate_cli.py
+#
+# Copyright 2025 Nguyễn Hồng Quân
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Headless `cobang generate LIST -o OUTPUT` command, to make many QR codes at once.
+
+Like `cobang decode`, it must not touch GTK, Adw or NetworkManager.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import threading
+from collections.abc import Sequence
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import TextIO
+
+import logbook
+from PIL import ImageColor
+
+from .bulk_generate import (
+    BulkOutput,
+    BulkProgress,
+    BulkResult,
+    ZipOutput,
+    generate_codes,
+    open_bulk_output,
+    read_bulk_file,
+    read_bulk_items,
+)
+from .consts import ErrorCorrectionLevel
+from .qr_export import QRExportFormat, QRStyle
+
+
+COMMAND = 'generate'
+# Seconds between two progress lines on stderr.
+PROGRESS_INTERVAL = 0.5
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1, not {number}')
+    return number
+
+
+def non_negative_int(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f'must not be negative, not {number}')
+    return number
+
+
+def color(value: str) -> str:
+    try:
+        ImageColor.getrgb(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'unknown color: {value}') from None
+    return value
+
+
+def build_parser() -> argparse.ArgumentParser:
+    default = QRStyle()
+    parser = argparse.ArgumentParser(
+        prog=f'cobang {COMMAND}',
+        description=(
+            'Make a QR code for each line of a text file, or each row of a CSV file. In a CSV file, the content is '
+            'taken from the "text", "data", "content", "url" or "value" column, and the file name from the "name", '
+            '"filename", "file", "id" or "tag" column. Without such a header, they are the first and second columns.'
+        ),
+    )
+    parser.add_argument('list', metavar='LIST', help='text or CSV (.csv) file, "-" for a text list from stdin')
+    parser.add_argument(
+        '-o',
+        '--output',
+        required=True,
+        help='folder to write the images to, or ZIP file if it ends with ".zip", "-" for a ZIP stream to stdout',
+    )
+    parser.add_argument('-f', '--format', choices=[f.value for f in QRExportFormat], default=QRExportFormat.PNG.value)
+    parser.add_argument(
+        '--csv', action='store_true', help='read the list as CSV even if the file name does not end with ".csv"'
+    )
+    parser.add_argument(
+        '-e',
+        '--error-correction',
+        choices=[e.value for e in ErrorCorrectionLevel],
+        default=default.error_correction.value,
+        help=f'error correction level (default: {default.error_correction.value})',
+    )
+    parser.add_argument(
+        '-s',
+        '--pixel-size',
+        type=positive_int,
+        default=default.box_size,
+        help=f'pixels per module (default: {default.box_size})',
+    )
+    parser.add_argument(
+        '-b',
+        '--border',
+        type=non_negative_int,
+        default=default.border,
+        help=f'quiet zone, in modules (default: {default.border})',
+    )
+    parser.add_argument(
+        '--foreground', type=color, default=default.fill_color, metavar='COLOR', help='color of dark modules'
+    )
+    parser.add_argument(
+        '--background', type=color, default=default.back_color, metavar='COLOR', help='background color'
+    )
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=0, help='number of worker processes (default: number of CPU cores)'
+    )
+    parser.add_argument('-v', '--verbose', action='store_true', help='print log messages to stderr')
+    return parser
+
+
+def open_output(name: str) -> BulkOutput:
+    if name == '-':
+        return ZipOutput(sys.stdout.buffer)
+    return open_bulk_output(Path(name))
+
+
+def report_progress(progress: BulkProgress, done: threading.Event, stream: TextIO):
+    """Print progress to stderr until done, in place if it is a terminal."""
+    end = '\r' if stream.isatty() else '\n'
+    while not done.wait(PROGRESS_INTERVAL):
+        stream.write(f'{progress.done}/{progress.total} codes, {progress.throughput:.0f} codes/s{end}')
+        stream.flush()
+
+
+def print_error(result: BulkResult):
+    if result.error:
+        print(f'{result.item.name}: {result.error}', file=sys.stderr)
+
+
+def main(argv: Sequence[str]) -> int:
+    """Entry point of `cobang generate`. Exit code is 0 if all codes are made, 1 otherwise."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    level = logbook.DEBUG if args.verbose else logbook.WARNING
+    logbook.StderrHandler(level=level, bubble=False).push_application()
+    try:
+        if args.list == '-':
+            items = read_bulk_items(sys.stdin, args.csv)
+        else:
+            items = read_bulk_file(args.list, args.csv or None)
+        output = open_output(args.output)
+    except OSError as e:
+        parser.error(str(e))
+    style = QRStyle(
+        ErrorCorrectionLevel(args.error_correction), args.pixel_size, args.border, args.foreground, args.background
+    )
+    progress = BulkProgress()
+    done = threading.Event()
+    reporter = threading.Thread(target=report_progress, args=(progress, done, sys.stderr), daemon=True)
+    reporter.start()
+    n_processes = args.jobs or os.cpu_count() or 1
+    try:
+        generate_codes(items, style, QRExportFormat(args.format), output, n_processes, progress, print_error)
+    except (OSError, BrokenProcessPool) as e:
+        print(f'Failed: {e}', file=sys.stderr)
+        return 1
+    finally:
+        done.set()
+        reporter.join()
+    print(progress.summary_text(), file=sys.stderr)
+    return 1 if progress.failed else 0
@@ -0,0 +1,74 @@
+import threading
+import time
+from dataclasses import dataclass, field
+
+from logbook import Logger
+
+
+log = Logger(__name__)
+
+
+@dataclass
+class DecodeRateGovernor:
+    """Decide how many webcam frames per second are sent to the decoder.
+
+    The interval between decoded frames is the largest of:
+    - 1 / target_fps,
+    - the recent CPU time of one decode, divided by the CPU budget (fraction of one core).
+    So with slow decoding (big frames, weak CPU), frames are spaced out to keep CPU use within budget.
+    When the decoder reports code-like evidence, the limits are lifted for `boost_seconds`, so that
+    the code is picked up quickly while the user is holding it in front of the camera.
+
+    should_decode() is called from the streaming thread, record_decode() from the decode workers.
+    """
+
+    # Maximum frames per second to decode. 0 means no limit.
+    target_fps: float = 15.0
+    # Percentage of one CPU core to spend on decoding. 0 means no limit.
+    cpu_budget: float = 50.0
+    boost_seconds: float = 3.0
+    # Weight of the newest sample in the moving average of decode cost.
+    smoothing: float = 0.2
+    avg_cost: float = field(default=0.0, init=False)
+    boost_until: float = field(default=0.0, init=False)
+    last_decode_at: float = field(default=0.0, init=False)
+    frames_passed: int = field(default=0, init=False)
+    frames_skipped: int = field(default=0, init=False)
+    lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    @property
+    def interval(self) -> float:
+        """Current minimum interval, in seconds, between two decoded frames."""
+        by_fps = 1 / self.target_fps if self.target_fps > 0 else 0
+        by_cpu = self.avg_cost * 100 / self.cpu_budget if self.cpu_budget > 0 else 0
+        return max(by_fps, by_cpu)
+
+    def is_boosted(self, now: float) -> bool:
+        return now < self.boost_until
+
+    def should_decode(self, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if not self.is_boosted(now) and now - self.last_decode_at < self.interval:
+                self.frames_skipped += 1
+                return False
+            self.last_decode_at = now
+            self.frames_passed += 1
+            return True
+
+    def record_decode(self, cost: float, evidence: bool, now: float | None = None):
+        """Feed the CPU time spent on one frame, and whether the frame looked like containing a code."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.avg_cost = cost if not self.avg_cost else self.avg_cost + self.smoothing * (cost - self.avg_cost)
+            if evidence:
+                if not self.is_boosted(now):
+                    log.debug('Code-like evidence found, boosting decode rate')
+                self.boost_until = now + self.boost_seconds
+
+    def stats_text(self) -> str:
+        rate = 1 / self.interval if self.interval else float('inf')
+        return (
+            f'Governor passed {self.frames_passed} frames, skipped {self.frames_skipped}. '
+            f'Decode cost {self.avg_cost * 1000:.1f}ms, rate limit {rate:.1f}fps'
+        )
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable
+from enum import IntEnum
+from typing import Generic, TypeVar
+
+from gi.repository import Gio, GLib  # pyright: ignore[reportMissingModuleSource]
+from logbook import Logger
+
+
+log = Logger(__name__)
+
+T = TypeVar('T')
+# Besides images. The decode function is responsible for rendering them.
+DOCUMENT_CONTENT_TYPES = frozenset(('application/pdf',))
+
+
+class IngestStage(IntEnum):
+    QUERYING = 0
+    READING = 1
+    DECODING = 2
+    DONE = 3
+
+
+class ImageIngest(Generic[T]):
+    """Load an image file, which can be remote (sftp://, http://), without blocking the main loop.
+
+    The stages are:
+
+    - Query the content type, unless it is already known, and reject non-images (PDF is accepted).
+    - Stream the file into memory with Gio async API.
+    - Decode the bytes with the `decode` function, in a worker thread.
+
+    `on_stage` is called when a stage starts, `on_loaded` with the decoded value, `on_failed` with an error message.
+    All callbacks are called in the main thread.
+    Loading a new file cancels the previous one, whose callbacks are not called anymore.
+    """
+
+    def __init__(
+        self,
+        decode: Callable[[GLib.Bytes], T],
+        on_loaded: Callable[[T], object],
+        on_failed: Callable[[str], object] | None = None,
+        on_stage: Callable[[IngestStage], object] | None = None,
+    ):
+        self.decode = decode
+        self.on_loaded = on_loaded
+        self.on_failed = on_failed
+        self.on_stage = on_stage
+        self.cancellable: Gio.Cancellable | None = None
+
+    @property
+    def is_busy(self) -> bool:
+        return bool(self.cancellable)
+
+    def load(self, file: Gio.File, content_type: str | None = None):
+        self.cancel()
+        cancellable = self.cancellable = Gio.Cancellable()
+        if content_type:
+            self.start_reading(file, content_type, cancellable)
+            return
+        self.enter_stage(IngestStage.QUERYING)
+        # For remote files, sniffing the content would need to download it, we guess from the file name instead.
+        attr = (
+            Gio.FILE_ATTRIBUTE_STANDARD_CONTENT_TYPE
+            if file.is_native()
+            else Gio.FILE_ATTRIBUTE_STANDARD_FAST_CONTENT_TYPE
+        )
+        file.query_info_async(
+            attr, Gio.FileQueryInfoFlags.NONE, GLib.PRIORITY_DEFAULT, cancellable, self.cb_info_queried, cancellable
+        )
+
+    def cancel(self):
+        if self.cancellable:
+            self.cancellable.cancel()
+            self.cancellable = None
+
+    def is_current(self, cancellable: Gio.Cancellable) -> bool:
+        return cancellable is self.cancellable and not cancellable.is_cancelled()
+
+    def enter_stage(self, stage: IngestStage):
+        log.debug('Image ingest stage: {}', stage.name)
+        if self.on_stage:
+            self.on_stage(stage)
+
+    def fail(self, cancellable: Gio.Cancellable, message: str):
+        if not self.is_current(cancellable):
+            return
+        log.info('Failed to load image: {}', message)
+        self.cancellable = None
+        if self.on_failed:
+            self.on_failed(message)
+
+    def cb_info_queried(self, file: Gio.File, result: Gio.AsyncResult, cancellable: Gio.Cancellable):
+        try:
+            info = file.query_info_finish(result)
+        except GLib.Error as e:
+            self.fail(cancellable, e.message)
+            return
+        if not self.is_current(cancellable):
+            return
+        content_type = (
+            info.get_attribute_string(Gio.FILE_ATTRIBUTE_STANDARD_CONTENT_TYPE)
+            or info.get_attribute_string(Gio.FILE_ATTRIBUTE_STANDARD_FAST_CONTENT_TYPE)
+            or ''
+        )
+        self.start_reading(file, content_type, cancellable)
+
+    def start_reading(self, file: Gio.File, content_type: str, cancellable: Gio.Cancellable):
+        log.info('MIME type: {}', content_type)
+        if not content_type.startswith('image/') and content_type not in DOCUMENT_CONTENT_TYPES:
+            self.fail(cancellable, f'Not an image: {content_type}')
+            return
+        self.enter_stage(IngestStage.READING)
+        file.read_async(GLib.PRIORITY_DEFAULT, cancellable, self.cb_file_opened, cancellable)
+
+    def cb_file_opened(self, file: Gio.File, result: Gio.AsyncResult, cancellable: Gio.Cancellable):
+        try:
+            stream = file.read_finish(result)
+        except GLib.Error as e:
+            self.fail(cancellable, e.message)
+            return
+        buffer = Gio.MemoryOutputStream.new_resizable()
+        flags = Gio.OutputStreamSpliceFlags.CLOSE_SOURCE | Gio.OutputStreamSpliceFlags.CLOSE_TARGET
+        buffer.splice_async(stream, flags, GLib.PRIORITY_DEFAULT, cancellable, self.cb_file_read, cancellable)
+
+    def cb_file_read(self, buffer: Gio.MemoryOutputStream, result: Gio.AsyncResult, cancellable: Gio.Cancellable):
+        try:
+            size = buffer.splice_finish(result)
+        except GLib.Error as e:
+            self.fail(cancellable, e.message)
+            return
+        if not self.is_current(cancellable):
+            return
+        log.debug('Read {} bytes', size)
+        self.enter_stage(IngestStage.DECODING)
+        data = buffer.steal_as_bytes()
+        thread = threading.Thread(
+            target=self.run_decode, args=(data, cancellable), name='cobang-image-decoder', daemon=True
+        )
+        thread.start()
+
+    def run_decode(self, data: GLib.Bytes, cancellable: Gio.Cancellable):
+        # Runs in worker thread.
+        try:
+            value = self.decode(data)
+        except (GLib.Error, OSError, ValueError) as e:
+            GLib.idle_add(self.fail, cancellable, str(e))
+            return
+        GLib.idle_add(self.deliver, value, cancellable)
+
+    def deliver(self, value: T, cancellable: Gio.Cancellable) -> bool:
+        if not self.is_current(cancellable):
+            return False
+        self.cancellable = None
+        self.enter_stage(IngestStage.DONE)
+        self.on_loaded(value)
+        return False
@@ -0,0 +1,76 @@
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from gi.repository import GLib  # pyright: ignore[reportMissingModuleSource]
+from logbook import Logger
+
+from .consts import SHORT_NAME
+
+
+log = Logger(__name__)
+
+# Start-up milestones, in the order they are expected to happen.
+WINDOW_SHOWN = 'window-shown'
+DEVICES_DISCOVERED = 'devices-discovered'
+FIRST_FRAME = 'first-frame'
+FIRST_DECODE = 'first-decode'
+METRICS_FILE_NAME = 'startup-metrics.jsonl'
+
+
+def get_metrics_path() -> Path:
+    return Path(GLib.get_user_cache_dir()) / SHORT_NAME / METRICS_FILE_NAME
+
+
+@dataclass
+class StartupMetrics:
+    """Time to reach start-up milestones, in milliseconds since the application started.
+
+    Each run appends one JSON line to the metrics file, so that releases can be compared with
+    a plain `jq` over the file.
+    """
+
+    started_at: float = field(default_factory=time.monotonic)
+    marks: dict[str, float] = field(default_factory=dict)
+
+    def restart(self):
+        self.started_at = time.monotonic()
+        self.marks.clear()
+
+    def mark(self, name: str):
+        """Record the first time a milestone is reached. Later calls are ignored.
+
+        Can be called from any thread (e.g. GStreamer streaming thread), the worst case of a race
+        is that the milestone is recorded twice with nearly the same time.
+        """
+        if name in self.marks:
+            return
+        elapsed = round((time.monotonic() - self.started_at) * 1000, 1)
+        self.marks[name] = elapsed
+        log.info('Start-up milestone {} reached after {}ms', name, elapsed)
+
+    def to_record(self, version: str) -> dict:
+        return {
+            'version': version,
+            'time': datetime.now().astimezone().isoformat(timespec='seconds'),
+            'marks': dict(self.marks),
+        }
+
+    def save(self, version: str, path: Path | None = None):
+        if not self.marks:
+            return
+        path = path or get_metrics_path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open('a') as f:
+                f.write(json.dumps(self.to_record(version)) + '\n')
+        except OSError as e:
+            log.warning('Failed to save start-up metrics to {}: {}', path, e)
+            return
+        log.debug('Saved start-up metrics to {}', path)
+
+
+# Shared by the whole application, the milestones are reached in different modules.
+startup_metrics = StartupMetrics()
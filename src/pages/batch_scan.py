@@ -0,0 +1,217 @@
+# batch_scan.py
+#
+# Copyright 2025 Nguyễn Hồng Quân
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import annotations
+
+import io
+from collections.abc import Sequence
+from functools import partial
+from locale import gettext as _
+from typing import Any, Self
+
+from gi.repository import (  # pyright: ignore[reportMissingModuleSource]
+    Adw,  # pyright: ignore[reportMissingModuleSource]
+    Gio,  # pyright: ignore[reportMissingModuleSource]
+    GLib,  # pyright: ignore[reportMissingModuleSource]
+    GObject,  # pyright: ignore[reportMissingModuleSource]
+    Gtk,  # pyright: ignore[reportMissingModuleSource]
+)
+from logbook import Logger
+
+from ..batch import BatchResult, BatchStatus, write_csv, write_jsonl
+from ..batch_scanner import BatchScanner
+from ..custom_types import BatchResultItem
+from ..scanner_profiles import ScannerProfile
+
+
+log = Logger(__name__)
+
+# How often the progress bar is refreshed, in milliseconds.
+PROGRESS_INTERVAL = 250
+# Writer and default file name for each export format.
+EXPORT_FORMATS = {
+    'csv': (write_csv, 'cobang-results.csv'),
+    'jsonl': (write_jsonl, 'cobang-results.jsonl'),
+}
+
+
+def get_status_text(status: BatchStatus) -> str:
+    match status:
+        case BatchStatus.FOUND:
+            return _('Found')
+        case BatchStatus.NOT_FOUND:
+            return _('No code')
+    return _('Error')
+
+
+@Gtk.Template.from_resource('/vn/hoabinh/quan/CoBang/gtk/batch-scan-dialog.ui')
+class BatchScanDialog(Adw.Dialog):
+    """Scan many image files and folders at once, showing the results in a table."""
+
+    __gtype_name__ = 'BatchScanDialog'
+
+    running = GObject.Property(type=bool, default=False)
+    progress_text = GObject.Property(type=str, default='', nick='progress-text')
+    progress_fraction = GObject.Property(type=float, default=0, nick='progress-fraction')
+
+    batch_results_store: Gio.ListStore = Gtk.Template.Child()
+    results_view: Gtk.ColumnView = Gtk.Template.Child()
+
+    def __init__(self, profile: ScannerProfile | None = None, **kwargs):
+        super().__init__(**kwargs)
+        # Kept for exporting, the list store only has the display strings.
+        self.results: list[BatchResult] = []
+        self.scanner = BatchScanner(
+            partial(GLib.idle_add, self.on_result),
+            partial(GLib.idle_add, self.on_finished),
+            profile=profile,
+        )
+        self.progress_source_id = 0
+        group = Gio.SimpleActionGroup()
+        action = Gio.SimpleAction.new('export', GLib.VariantType.new('s'))
+        action.connect('activate', self.on_export_activated)
+        group.add_action(action)
+        self.insert_action_group('batch', group)
+        self.connect('closed', self.on_closed)
+
+    def add_files(self, files: Sequence[Gio.File]):
+        """Add files or folders to scan. Only local ones are supported."""
+        paths = [p for f in files if (p := f.get_path())]
+        if len(paths) < len(files):
+            log.warning('Skipped {} non-local files', len(files) - len(paths))
+        if not paths:
+            return
+        log.info('Batch scanning {} files / folders', len(paths))
+        self.scanner.add(paths)
+        self.running = True
+        if not self.progress_source_id:
+            self.progress_source_id = GLib.timeout_add(PROGRESS_INTERVAL, self.on_progress_tick)
+        self.update_progress()
+
+    @Gtk.Template.Callback()
+    def has_some(self, wd: Self, value: Any) -> bool:
+        return bool(value)
+
+    @Gtk.Template.Callback()
+    def on_btn_add_files_clicked(self, button: Gtk.Button):
+        dlg = Gtk.FileDialog(modal=True)
+        dlg.open_multiple(self.get_root(), None, self.cb_files_chosen)
+
+    @Gtk.Template.Callback()
+    def on_btn_add_folder_clicked(self, button: Gtk.Button):
+        dlg = Gtk.FileDialog(modal=True)
+        dlg.select_multiple_folders(self.get_root(), None, self.cb_folders_chosen)
+
+    @Gtk.Template.Callback()
+    def on_btn_stop_clicked(self, button: Gtk.Button):
+        self.scanner.stop()
+
+    def cb_files_chosen(self, dialog: Gtk.FileDialog, result: Gio.AsyncResult):
+        try:
+            files = dialog.open_multiple_finish(result)
+        except GLib.Error as e:
+            log.info('Failed to choose files: {}', e)
+            return
+        if files:
+            self.add_files(list(files))
+
+    def cb_folders_chosen(self, dialog: Gtk.FileDialog, result: Gio.AsyncResult):
+        try:
+            folders = dialog.select_multiple_folders_finish(result)
+        except GLib.Error as e:
+            log.info('Failed to choose folders: {}', e)
+            return
+        if folders:
+            self.add_files(list(folders))
+
+    def on_result(self, result: BatchResult) -> bool:
+        self.results.append(result)
+        status_text = get_status_text(result.status)
+        if not result.symbols:
+            item = BatchResultItem(result.path, status_text, '', result.error, result.strategy, result.elapsed)
+            self.batch_results_store.append(item)
+            return False
+        items = [
+            BatchResultItem(result.path, status_text, s.type_name, s.data, result.strategy, result.elapsed)
+            for s in result.symbols
+        ]
+        self.batch_results_store.splice(self.batch_results_store.get_n_items(), 0, items)
+        return False
+
+    def on_finished(self) -> bool:
+        self.running = False
+        self.update_progress()
+        return False
+
+    def on_progress_tick(self) -> bool:
+        self.update_progress()
+        if self.running:
+            return True
+        self.progress_source_id = 0
+        return False
+
+    def update_progress(self):
+        progress = self.scanner.progress
+        self.progress_fraction = progress.fraction
+        total = str(progress.total) if progress.is_total_known else f'{progress.total}+'
+        self.progress_text = _(
+            '%(done)d / %(total)s files, %(found)d with code, %(failed)d errors, %(speed).1f files/s'
+        ) % {
+            'done': progress.done,
+            'total': total,
+            'found': progress.found,
+            'failed': progress.failed,
+            'speed': progress.throughput,
+        }
+
+    def on_export_activated(self, action: Gio.SimpleAction, param: GLib.Variant):
+        fmt = param.get_string()
+        _writer, default_name = EXPORT_FORMATS[fmt]
+        dlg = Gtk.FileDialog(modal=True, initial_name=default_name)
+        dlg.save(self.get_root(), None, self.cb_export_file_chosen, fmt)
+
+    def cb_export_file_chosen(self, dialog: Gtk.FileDialog, result: Gio.AsyncResult, fmt: str):
+        try:
+            file = dialog.save_finish(result)
+        except GLib.Error as e:
+            log.info('Failed to choose file: {}', e)
+            return
+        if not file:
+            return
+        writer, _default_name = EXPORT_FORMATS[fmt]
+        buffer = io.StringIO()
+        writer(self.results, buffer)
+        data = GLib.Bytes.new(buffer.getvalue().encode())
+        file.replace_contents_bytes_async(
+            data, None, False, Gio.FileCreateFlags.REPLACE_DESTINATION, None, self.cb_exported
+        )
+
+    def cb_exported(self, file: Gio.File, result: Gio.AsyncResult):
+        try:
+            file.replace_contents_finish(result)
+        except GLib.Error as e:
+            log.error('Failed to export results to {}: {}', file.get_uri(), e)
+            return
+        log.info('Exported {} results to {}', len(self.results), file.get_uri())
+
+    def on_closed(self, dialog: Self):
+        if self.progress_source_id:
+            GLib.source_remove(self.progress_source_id)
+            self.progress_source_id = 0
+        self.scanner.shutdown()
@@ -19,20 +19,23 @@
 
 from __future__ import annotations
 
-import io
 from datetime import datetime
 from locale import gettext as _
 from typing import TYPE_CHECKING, Self
 
 import gi
-import qrcode
 from logbook import Logger
 
 
 if TYPE_CHECKING:
     from ..custom_types import WifiNetworkInfo
 
+from ..async_writer import ChunkedFileWriter
 from ..consts import ErrorCorrectionLevel, WifiAuthMethod
+from ..qr_export import QRExportFormat, QRStyle
+from ..qr_render import QRModulePaintable, QRRenderRequest, iter_qr_export_chunks, render_qr_png, render_qr_texture
+from ..render_scheduler import RenderScheduler
+from .generator_bulk import GeneratorBulkDialog
 from .generator_form import GeneratorForm
 from .generator_qr_preview_pane import GeneratorQRPreviewPane
 
@@ -77,8 +80,13 @@ class GeneratorPage(Adw.Bin):
     def __init__(self, **kwargs) -> None:
         """Initialize the generator page."""
         super().__init__(**kwargs)
-        self.current_paintable: Gdk.Texture | None = None
+        self.current_paintable: Gdk.Paintable | None = None
+        # What the current paintable shows, to export it at full size.
+        self.current_request: QRRenderRequest | None = None
+        self.export_writer: ChunkedFileWriter | None = None
         self.current_text: str = ''
+        # Typing makes many changes in a row, only the latest is rendered, in a worker thread.
+        self.render_scheduler = RenderScheduler(render_qr_texture, self.on_qr_rendered, self.on_qr_render_failed)
         # React to form changes by regenerating the QR code.
         self.form.connect('content-changed', self.on_form_content_changed)
         # The form asks the window to fetch saved WiFi networks when the picker is opened.
@@ -89,6 +97,7 @@ class GeneratorPage(Adw.Bin):
         self.qr_preview_widget.connect('download-clicked', self.on_btn_download_clicked)
         self.qr_preview_widget.connect('copy-clicked', self.on_btn_copy_clicked)
         self.qr_preview_widget.connect('new-clicked', self.on_btn_new_clicked)
+        self.qr_preview_widget.connect('bulk-clicked', self.on_btn_bulk_clicked)
 
     def on_form_content_changed(self, *args):
         """Regenerate QR code when any form field changes."""
@@ -128,69 +137,71 @@ class GeneratorPage(Adw.Bin):
         return ''
 
     def regenerate_qr_code(self):
-        """Generate a QR code from the current form content and display it."""
+        """Schedule generating a QR code from the current form content. It is displayed when ready."""
         text = self.build_qr_text()
         if not text:
+            self.render_scheduler.cancel()
             self.clear_preview()
             return
+        request = QRRenderRequest(text, self.get_style())
+        self.render_scheduler.request(request)
 
-        self.current_text = text
-        error_correction = self.error_correction_for_level(self.qr_preview_widget.error_correction)
-        try:
-            qr = qrcode.QRCode(
-                version=None,
-                error_correction=error_correction,
-                box_size=int(self.qr_preview_widget.qr_pixel_size),
-                border=int(self.qr_preview_widget.qr_border_size),
-            )
-            qr.add_data(text)
-            qr.make(fit=True)
-            img = qr.make_image(
-                fill_color=self.rgba_to_hex(self.qr_preview_widget.foreground_color),
-                back_color=self.rgba_to_hex(self.qr_preview_widget.background_color),
-            )
-            buf = io.BytesIO()
-            img.save(buf)
-            texture = Gdk.Texture.new_from_bytes(GLib.Bytes.new(buf.getvalue()))
-        except GLib.Error as e:
-            log.error('Failed to generate QR code image: {}', e)
-            self.clear_preview()
-            return
+    def on_qr_rendered(self, request: QRRenderRequest, texture: Gdk.Texture):
+        self.current_text = request.text
+        self.current_request = request
+        self.current_paintable = QRModulePaintable(texture, request.style.box_size)
+        self.qr_preview_widget.set_paintable(self.current_paintable)
 
-        self.current_paintable = texture
-        self.qr_preview_widget.set_paintable(texture)
+    def on_qr_render_failed(self, request: QRRenderRequest, error: Exception):
+        log.error('Failed to generate QR code image: {}', error)
+        self.clear_preview()
 
     def clear_preview(self):
         """Clear the preview picture and current paintable."""
         self.current_paintable = None
+        self.current_request = None
         self.current_text = ''
         self.qr_preview_widget.set_paintable(None)
 
-    def error_correction_for_level(self, level: str) -> int:
-        """Map the form error-correction value (L/M/Q/H) to a qrcode error constant."""
+    def get_style(self) -> QRStyle:
+        """Appearance and quality settings from the preview pane."""
+        return QRStyle(
+            self.get_error_correction_level(self.qr_preview_widget.error_correction),
+            int(self.qr_preview_widget.qr_pixel_size),
+            int(self.qr_preview_widget.qr_border_size),
+            self.rgba_to_hex(self.qr_preview_widget.foreground_color),
+            self.rgba_to_hex(self.qr_preview_widget.background_color),
+        )
+
+    def get_error_correction_level(self, level: str) -> ErrorCorrectionLevel:
+        """Parse the form error-correction value (L/M/Q/H)."""
         try:
-            return {
-                ErrorCorrectionLevel.LOWEST: qrcode.constants.ERROR_CORRECT_L,
-                ErrorCorrectionLevel.LOW: qrcode.constants.ERROR_CORRECT_M,
-                ErrorCorrectionLevel.MEDIUM: qrcode.constants.ERROR_CORRECT_Q,
-                ErrorCorrectionLevel.HIGH: qrcode.constants.ERROR_CORRECT_H,
-            }[ErrorCorrectionLevel(level)]
-        except (ValueError, KeyError):
+            return ErrorCorrectionLevel(level)
+        except ValueError:
             log.warning('Unknown error_correction value: {}, falling back to LOW', level)
-            return qrcode.constants.ERROR_CORRECT_M
+            return ErrorCorrectionLevel.LOW
 
     def rgba_to_hex(self, rgba: Gdk.RGBA) -> str:
         """Convert a Gdk.RGBA to a CSS-style hex string."""
         return f'#{int(rgba.red * 255):02x}{int(rgba.green * 255):02x}{int(rgba.blue * 255):02x}'
 
     def on_btn_download_clicked(self, _src: GeneratorQRPreviewPane, _btn: Gtk.Button):
-        """Save the generated QR code to a PNG file."""
-        if not isinstance(self.current_paintable, Gdk.Texture):
+        """Save the generated QR code to a PNG, SVG, PDF or EPS file, by the chosen file name."""
+        if not self.current_request:
             log.warning('No QR code to save')
             return
 
-        filter_png = Gtk.FileFilter(mime_types=['image/png'], name=_('PNG Image'))
-        file_dialog = Gtk.FileDialog(title=_('Save QR Code'), modal=True, default_filter=filter_png)
+        filters = Gio.ListStore.new(Gtk.FileFilter)
+        for fmt, name in (
+            (QRExportFormat.PNG, _('PNG Image')),
+            (QRExportFormat.SVG, _('SVG Image')),
+            (QRExportFormat.PDF, _('PDF Document')),
+            (QRExportFormat.EPS, _('EPS Image')),
+        ):
+            filters.append(Gtk.FileFilter(mime_types=[fmt.content_type], suffixes=[fmt.value], name=name))
+        file_dialog = Gtk.FileDialog(
+            title=_('Save QR Code'), modal=True, filters=filters, default_filter=filters.get_item(0)
+        )
         now = datetime.now()
         default_filename = f'qrcode_{now:%Y%m%d_%H%M%S}.png'
         file = Gio.File.new_for_path(default_filename)
@@ -199,39 +210,31 @@ class GeneratorPage(Adw.Bin):
         if not isinstance(root := self.get_root(), Gtk.Window):
             log.warning('Generator page is not inside a window, cannot show save dialog')
             return
-        file_dialog.save(root, None, self.on_save_dialog_response, self.current_paintable)
+        file_dialog.save(root, None, self.on_save_dialog_response, self.current_request)
 
-    def on_save_dialog_response(self, dialog: Gtk.FileDialog, result: Gio.AsyncResult, paintable: Gdk.Texture):
+    def on_save_dialog_response(self, dialog: Gtk.FileDialog, result: Gio.AsyncResult, request: QRRenderRequest):
         if not (file := dialog.save_finish(result)):
             return
-        try:
-            bytes_data = paintable.save_to_png_bytes()
-            file.replace_contents_bytes_async(
-                bytes_data,
-                etag=None,
-                make_backup=False,
-                flags=Gio.FileCreateFlags.NONE,
-                cancellable=None,
-                callback=self.on_file_write_finished,
-            )
-        except GLib.Error as e:
-            log.error('Failed to save QR code: {}', e)
-        except OSError as e:
-            log.error('Failed to save QR code due to file system error: {}', e)
+        fmt = QRExportFormat.from_filename(file.get_basename() or '') or QRExportFormat.PNG
+        log.info('Exporting QR code as {} to {}', fmt.name, file.get_parse_name())
+        # The preview is only one pixel per module, the file gets the full size image, or the vector one.
+        self.export_writer = ChunkedFileWriter(file, iter_qr_export_chunks(request, fmt), self.on_file_write_finished)
+        self.export_writer.start()
 
-    def on_file_write_finished(self, file: Gio.File, result: Gio.AsyncResult):
-        try:
-            file.replace_contents_finish(result)
-        except GLib.Error as e:
-            log.error('Failed to write QR code to file: {}', e)
+    def on_file_write_finished(self, file: Gio.File, error: GLib.Error | None):
+        self.export_writer = None
+        if error:
+            log.error('Failed to write QR code to file: {}', error)
 
     def on_btn_copy_clicked(self, _src: GeneratorQRPreviewPane, button: Gtk.Button):
         """Copy the generated QR code image to the clipboard."""
-        if not isinstance(self.current_paintable, Gdk.Texture):
+        if not self.current_request:
             log.warning('No QR code to copy')
             return
 
-        content_provider = Gdk.ContentProvider.new_for_bytes('image/png', self.current_paintable.save_to_png_bytes())
+        content_provider = Gdk.ContentProvider.new_for_bytes(
+            'image/png', GLib.Bytes.new(render_qr_png(self.current_request))
+        )
         if not isinstance(display := Gdk.Display.get_default(), Gdk.Display):
             log.warning('No default display available')
             return
@@ -249,6 +252,10 @@ class GeneratorPage(Adw.Bin):
         self.form.reset()
         self.qr_preview_widget.reset()
 
+    def on_btn_bulk_clicked(self, _src: GeneratorQRPreviewPane):
+        """Open the dialog to make many QR codes, with the current appearance settings."""
+        GeneratorBulkDialog(self.get_style()).present(self.get_root())
+
     def populate_wifi_networks(self, wifi_networks: list[WifiNetworkInfo]):
         """Populate saved WiFi networks in the form."""
         self.form.populate_wifi_networks(wifi_networks)
@@ -0,0 +1,218 @@
+# generator_bulk.py
+#
+# Copyright 2025 Nguyễn Hồng Quân
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import annotations
+
+import io
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from locale import gettext as _
+from pathlib import Path
+from typing import Any, Self
+
+from gi.repository import (  # pyright: ignore[reportMissingModuleSource]
+    Adw,  # pyright: ignore[reportMissingModuleSource]
+    Gio,  # pyright: ignore[reportMissingModuleSource]
+    GLib,  # pyright: ignore[reportMissingModuleSource]
+    GObject,  # pyright: ignore[reportMissingModuleSource]
+    Gtk,  # pyright: ignore[reportMissingModuleSource]
+)
+from logbook import Logger
+
+from ..bulk_generate import (
+    BulkItem,
+    BulkOutput,
+    BulkProgress,
+    generate_codes,
+    is_csv_file,
+    open_bulk_output,
+    read_bulk_items,
+)
+from ..qr_export import QRExportFormat, QRStyle
+
+
+log = Logger(__name__)
+
+# How often the progress bar is refreshed, in milliseconds.
+PROGRESS_INTERVAL = 250
+# In the order of the format row.
+FORMATS = (QRExportFormat.PNG, QRExportFormat.SVG, QRExportFormat.PDF, QRExportFormat.EPS)
+
+
+@Gtk.Template.from_resource('/vn/hoabinh/quan/CoBang/gtk/generator/bulk-generate-dialog.ui')
+class GeneratorBulkDialog(Adw.Dialog):
+    """Make a QR code for each line of a text file or row of a CSV file, with the style of the preview pane."""
+
+    __gtype_name__ = 'GeneratorBulkDialog'
+
+    running = GObject.Property(type=bool, default=False)
+    item_count = GObject.Property(type=int, default=0, nick='item-count')
+    list_summary = GObject.Property(type=str, default='', nick='list-summary')
+    style_summary = GObject.Property(type=str, default='', nick='style-summary')
+    progress_text = GObject.Property(type=str, default='', nick='progress-text')
+    progress_fraction = GObject.Property(type=float, default=0, nick='progress-fraction')
+
+    format_row: Adw.ComboRow = Gtk.Template.Child()
+    zip_row: Adw.SwitchRow = Gtk.Template.Child()
+
+    def __init__(self, style: QRStyle, **kwargs):
+        super().__init__(**kwargs)
+        self.style = style
+        self.items: list[BulkItem] = []
+        self.progress = BulkProgress()
+        self.stop_event = threading.Event()
+        self.progress_source_id = 0
+        self.list_summary = _('No list chosen')
+        self.style_summary = _('%(size)d px per module, border %(border)d, error correction %(level)s') % {
+            'size': style.box_size,
+            'border': style.border,
+            'level': style.error_correction.label(),
+        }
+        self.connect('closed', self.on_closed)
+
+    @property
+    def export_format(self) -> QRExportFormat:
+        return FORMATS[self.format_row.get_selected()]
+
+    @Gtk.Template.Callback()
+    def has_some(self, wd: Self, value: Any) -> bool:
+        return bool(value)
+
+    @Gtk.Template.Callback()
+    def can_generate(self, wd: Self, item_count: int, running: bool) -> bool:
+        return item_count > 0 and not running
+
+    @Gtk.Template.Callback()
+    def on_btn_choose_list_clicked(self, button: Gtk.Button):
+        filters = Gio.ListStore.new(Gtk.FileFilter)
+        filters.append(Gtk.FileFilter(name=_('CSV or text files'), mime_types=['text/csv', 'text/plain']))
+        dlg = Gtk.FileDialog(modal=True, filters=filters)
+        dlg.open(self.get_root(), None, self.cb_list_chosen)
+
+    @Gtk.Template.Callback()
+    def on_btn_generate_clicked(self, button: Gtk.Button):
+        dlg = Gtk.FileDialog(modal=True)
+        if self.zip_row.get_active():
+            dlg.set_initial_name('qrcodes.zip')
+            dlg.save(self.get_root(), None, self.cb_output_chosen)
+        else:
+            dlg.select_folder(self.get_root(), None, self.cb_output_chosen)
+
+    @Gtk.Template.Callback()
+    def on_btn_stop_clicked(self, button: Gtk.Button):
+        self.stop_event.set()
+
+    def cb_list_chosen(self, dialog: Gtk.FileDialog, result: Gio.AsyncResult):
+        try:
+            file = dialog.open_finish(result)
+        except GLib.Error as e:
+            log.info('Failed to choose file: {}', e)
+            return
+        if file:
+            file.load_contents_async(None, self.cb_list_loaded)
+
+    def cb_list_loaded(self, file: Gio.File, result: Gio.AsyncResult):
+        name = file.get_basename() or ''
+        try:
+            _ok, contents, _etag = file.load_contents_finish(result)
+        except GLib.Error as e:
+            log.error('Failed to read {}: {}', file.get_uri(), e)
+            self.list_summary = e.message
+            return
+        text = contents.decode('utf-8-sig', errors='replace')
+        self.items = read_bulk_items(io.StringIO(text, newline=''), is_csv_file(name))
+        log.info('Read {} items from {}', len(self.items), name)
+        self.item_count = len(self.items)
+        self.list_summary = _('%(name)s: %(count)d codes') % {'name': name, 'count': len(self.items)}
+        self.progress_text = ''
+
+    def cb_output_chosen(self, dialog: Gtk.FileDialog, result: Gio.AsyncResult):
+        try:
+            file = dialog.save_finish(result) if self.zip_row.get_active() else dialog.select_folder_finish(result)
+        except GLib.Error as e:
+            log.info('Failed to choose output: {}', e)
+            return
+        if not file or not (path := file.get_path()):
+            log.warning('Only local output is supported')
+            return
+        try:
+            output = open_bulk_output(Path(path))
+        except OSError as e:
+            log.error('Failed to open {}: {}', path, e)
+            self.progress_text = str(e)
+            return
+        self.start(output)
+
+    def start(self, output: BulkOutput):
+        self.stop_event.clear()
+        self.progress = BulkProgress(total=len(self.items))
+        self.running = True
+        thread = threading.Thread(
+            target=self.run,
+            args=(list(self.items), self.export_format, output),
+            name='cobang-bulk-generate',
+            daemon=True,
+        )
+        thread.start()
+        if not self.progress_source_id:
+            self.progress_source_id = GLib.timeout_add(PROGRESS_INTERVAL, self.on_progress_tick)
+        self.update_progress()
+
+    def run(self, items: list[BulkItem], fmt: QRExportFormat, output: BulkOutput):
+        # In a worker thread. The codes are made in processes, and the files are written from here.
+        n_processes = os.cpu_count() or 1
+        error = ''
+        try:
+            generate_codes(items, self.style, fmt, output, n_processes, self.progress, stop=self.stop_event)
+        # Writing the end of the ZIP file, or the worker processes died.
+        except (OSError, BrokenProcessPool) as e:
+            log.error('Bulk generation failed: {}', e)
+            error = str(e) or type(e).__name__
+        GLib.idle_add(self.on_finished, error)
+
+    def on_finished(self, error: str) -> bool:
+        self.running = False
+        self.update_progress()
+        if error:
+            self.progress_text = _('Failed: %s') % error
+        return False
+
+    def on_progress_tick(self) -> bool:
+        self.update_progress()
+        if self.running:
+            return True
+        self.progress_source_id = 0
+        return False
+
+    def update_progress(self):
+        progress = self.progress
+        self.progress_fraction = progress.fraction
+        self.progress_text = _('%(done)d / %(total)d codes, %(failed)d errors, %(speed).0f codes/s') % {
+            'done': progress.done,
+            'total': progress.total,
+            'failed': progress.failed,
+            'speed': progress.throughput,
+        }
+
+    def on_closed(self, dialog: Self):
+        if self.progress_source_id:
+            GLib.source_remove(self.progress_source_id)
+            self.progress_source_id = 0
+        self.stop_event.set()
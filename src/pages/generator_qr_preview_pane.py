@@ -69,6 +69,7 @@ class GeneratorQRPreviewPane(Gtk.Box):
         'download-clicked': (GObject.SignalFlags.RUN_FIRST, None, (Gtk.Button,)),
         'copy-clicked': (GObject.SignalFlags.RUN_FIRST, None, (Gtk.Button,)),
         'new-clicked': (GObject.SignalFlags.RUN_FIRST, None, ()),
+        'bulk-clicked': (GObject.SignalFlags.RUN_FIRST, None, ()),
         'qr-property-changed': (GObject.SignalFlags.RUN_FIRST, None, ()),
     }
 
@@ -139,3 +140,8 @@ class GeneratorQRPreviewPane(Gtk.Box):
     def on_btn_new_clicked(self, btn: Gtk.Button):
         """Emit signal when the new button is clicked."""
         self.emit('new-clicked')
+
+    @Gtk.Template.Callback()
+    def on_btn_bulk_clicked(self, btn: Gtk.Button):
+        """Emit signal when the bulk generation button is clicked."""
+        self.emit('bulk-clicked')
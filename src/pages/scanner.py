@@ -19,13 +19,17 @@
 
 from __future__ import annotations
 
-import io
+import itertools
 import os
+import threading
+import time
+from collections.abc import Callable, Iterator, Sequence
+from functools import partial
 from locale import gettext as _
+from pathlib import Path
 from typing import Any, Self, cast
 from urllib.parse import SplitResult, urlsplit
 
-import zbar  # zuban: ignore[import-not-found]
 from gi.repository import (  # pyright: ignore[reportMissingModuleSource]
     Adw,  # pyright: ignore[reportMissingModuleSource]
     Gdk,  # pyright: ignore[reportMissingModuleSource]
@@ -39,26 +43,39 @@ from gi.repository import (  # pyright: ignore[reportMissingModuleSource]
 from logbook import Logger
 from PIL import Image
 
+from ..camera_caps import CapsCandidate, build_caps_filter_desc, build_caps_ladder, build_generic_caps_ladder
+from ..cascade import DEFAULT_PROCESS_COUNT, CascadeReport, StillImageDecoder
+from ..change_gate import ChangeGate
 from ..consts import (
-    GST_APP_SINK_NAME,
-    GST_FLIP_FILTER_NAME,
+    DECODE_CACHE_FOLDER_NAME,
     GST_SINK_NAME,
     GST_SOURCE_NAME,
+    SHORT_NAME,
     DeviceSourceType,
     ScannerState,
     ScanSourceName,
     WebcamPageLayoutName,
 )
-from ..custom_types import WebcamDeviceInfo
+from ..custom_types import ScanResultItem, WebcamDeviceInfo
+from ..decode_cache import DecodeCache, get_image_key
+from ..decode_worker import DecodeResult, DecodeWorkerPool, WebcamFrame
+from ..decoding import DecodedSymbol
+from ..governor import DecodeRateGovernor
+from ..ingest import ImageIngest, IngestStage
 from ..messages import WifiInfoMessage, parse_wifi_message
+from ..metrics import DEVICES_DISCOVERED, FIRST_DECODE, FIRST_FRAME, startup_metrics
 from ..prep import (
+    LoadedImage,
+    decode_image_bytes,
+    get_device_caps_string,
     get_device_path,
-    guess_mimetype,
-    invert_and_make_grayscale,
-    is_image_almost_black_white,
-    make_grayscale,
+    is_directory,
+    texture_to_grayscale,
 )
+from ..settings import ScannerSettings, get_settings, load_scanner_profile
+from ..ttl_cache import TTLCache
 from ..ui import build_url_display, build_wifi_info_display
+from ..webcam_pipeline import WebcamPipeline
 
 
 log = Logger(__name__)
@@ -75,6 +92,25 @@ def build_display_sink_desc() -> str:
     return f'videoconvert ! gtk4paintablesink name={GST_SINK_NAME}'
 
 
+def build_source_desc(src_type: DeviceSourceType, video_path: str, caps: CapsCandidate | None = None) -> str:
+    """Build the source part of the pipeline, to access webcam directly, when running outside sandbox."""
+    device_prop = f'device={video_path}' if src_type == DeviceSourceType.V4L2 else f'target-object={video_path}'
+    return f'{src_type} name={GST_SOURCE_NAME} {device_prop}{build_caps_filter_desc(caps)}'
+
+
+def build_sandbox_source_desc(video_fd: int, caps: CapsCandidate | None = None) -> str:
+    return f'pipewiresrc name={GST_SOURCE_NAME} fd={video_fd}{build_caps_filter_desc(caps)}'
+
+
+def is_negotiation_error(error: GLib.Error, debug: str | None) -> bool:
+    """Tell if the pipeline failed because the camera didn't accept the format we asked for."""
+    if 'not-negotiated' in (debug or ''):
+        return True
+    return error.matches(Gst.StreamError.quark(), Gst.StreamError.FORMAT) or error.matches(
+        Gst.ResourceError.quark(), Gst.ResourceError.SETTINGS
+    )
+
+
 @Gtk.Template.from_resource('/vn/hoabinh/quan/CoBang/gtk/scanner-page.ui')
 class ScannerPage(Adw.Bin):
     __gtype_name__ = 'ScannerPage'
@@ -82,8 +118,11 @@ class ScannerPage(Adw.Bin):
     scanner_state = GObject.Property(type=int, default=0, nick='scanner-state')
     in_mobile_screen = GObject.Property(type=bool, default=False, nick='in-mobile-screen')
     is_outside_sandbox = GObject.Property(type=bool, default=False, nick='is-outside-sandbox')
+    # The image file being scanned, if it comes from a file.
+    passed_file = GObject.Property(type=Gio.File, nick='passed-file')
 
     webcam_store: Gio.ListStore = Gtk.Template.Child()
+    scan_results_store: Gio.ListStore = Gtk.Template.Child()
     file_filter: Gtk.FileFilter = Gtk.Template.Child()
 
     scanner_page_multilayout: Adw.MultiLayoutView = Gtk.Template.Child()
@@ -93,6 +132,7 @@ class ScannerPage(Adw.Bin):
     box_playpause: Gtk.Box = Gtk.Template.Child()
     btn_pause: Gtk.ToggleButton = Gtk.Template.Child()
     mirror_switch: Gtk.Switch = Gtk.Template.Child()
+    continuous_switch: Gtk.Switch = Gtk.Template.Child()
     frame_image: Gtk.AspectFrame = Gtk.Template.Child()
 
     pasted_image: Gtk.Picture = Gtk.Template.Child()
@@ -106,8 +146,12 @@ class ScannerPage(Adw.Bin):
     raw_result_expander: Gtk.Expander = Gtk.Template.Child()
     webcam_dropdown: Gtk.DropDown = Gtk.Template.Child()
 
-    gst_pipeline: Gst.Pipeline | None = None
+    webcam_pipeline: WebcamPipeline | None = None
     dev_monitor: Gst.DeviceMonitor | None = None
+    # Camera formats to try, from the best. We go down one rung when the camera refuses a format.
+    caps_ladder: list[CapsCandidate | None] = []
+    caps_rung: int = 0
+    build_source_desc: Callable[[CapsCandidate | None], str] | None = None
 
     @GObject.Signal('request-camera-access', flags=GObject.SignalFlags.RUN_LAST)
     def signal_request_camera_access(self):
@@ -121,18 +165,76 @@ class ScannerPage(Adw.Bin):
     def signal_request_connect_wifi(self, wifi_info: WifiInfoMessage):
         pass
 
+    # Many files or folders were dropped, they are for the batch scanning dialog.
+    @GObject.Signal('request-batch-scan', flags=GObject.SignalFlags.RUN_LAST, arg_types=(object,))
+    def signal_request_batch_scan(self, files: list[Gio.File]):
+        pass
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
         self.webcam_multilayout.set_layout_name(WebcamPageLayoutName.REQUESTING)
 
-        # Initialize zbar scanner
-        self.zbar_scanner = zbar.ImageScanner()
+        self.settings = get_settings()
+        settings = ScannerSettings.load(self.settings)
+        if self.settings:
+            self.settings.bind('continuous-scan', self.continuous_switch, 'active', Gio.SettingsBindFlags.DEFAULT)
+            self.settings.connect('changed::scanner-profile', self.on_scanner_profile_changed)
+            self.settings.connect('changed::scanner-profiles', self.on_scanner_profile_changed)
+        log.info('Scanner profile: {}', settings.scanner_profile)
+        self.camera_target = (settings.camera_target_width, settings.camera_target_height, settings.camera_target_fps)
+        # Static images are tried with several preprocessing strategies, in worker processes.
+        self.still_decoder = StillImageDecoder(
+            n_processes=settings.still_decode_process_count or DEFAULT_PROCESS_COUNT,
+            profile=settings.scanner_profile,
+            memory_limit=settings.still_decode_memory_limit * 1024 * 1024,
+        )
+        # The same image, pasted or opened again, gets its result without decoding.
+        cache_folder = (
+            Path(GLib.get_user_cache_dir()) / SHORT_NAME / DECODE_CACHE_FOLDER_NAME
+            if settings.decode_cache_persistent
+            else None
+        )
+        self.decode_cache = DecodeCache(settings.decode_cache_size, cache_folder, settings.decode_cache_disk_size)
+        # Image files are read and decoded without blocking the UI, they can be remote.
+        self.image_ingest = ImageIngest(
+            decode_image_bytes, self.on_image_ingested, self.on_image_ingest_failed, self.on_image_ingest_stage
+        )
+        # In continuous mode, drop repeated scans of the same code within a TTL window.
+        self.dedup_cache = TTLCache(ttl=settings.dedup_ttl, capacity=settings.dedup_capacity)
+        self.governor = DecodeRateGovernor(
+            target_fps=settings.decode_target_fps,
+            cpu_budget=settings.decode_cpu_budget,
+        )
+        self.change_gate = ChangeGate(
+            threshold=settings.change_gate_threshold,
+            force_interval=settings.change_gate_force_interval,
+        )
+        self.decode_pool = DecodeWorkerPool(
+            self.on_webcam_frame_decoded,
+            n_workers=settings.decode_worker_count,
+            queue_depth=settings.decode_queue_depth,
+            pyramid_levels=settings.pyramid_levels,
+            escalate_after=settings.pyramid_escalate_after,
+            governor=self.governor,
+            change_gate=self.change_gate,
+            profile=settings.scanner_profile,
+            on_frame_decoded=partial(startup_metrics.mark, FIRST_DECODE),
+        )
+
+    def on_scanner_profile_changed(self, settings: Gio.Settings, key: str):
+        profile = load_scanner_profile(settings)
+        log.info('Scanner profile changed to: {}', profile)
+        self.still_decoder.profile = profile
+        self.decode_pool.profile = profile
 
     @property
     def is_at_scanning(self) -> bool:
-        """Check if the scanner is currently scanning."""
-        return self.scanner_state == ScannerState.SCANNING
+        """Check if the scanner is currently scanning from webcam."""
+        return (
+            self.scanner_state == ScannerState.SCANNING
+            and self.scan_source_viewstack.get_visible_child_name() == ScanSourceName.WEBCAM
+        )
 
     def switch_to_webcam_source(self):
         """Switch to webcam source view"""
@@ -154,14 +256,9 @@ class ScannerPage(Adw.Bin):
 
     def setup_camera_for_sandbox(self, video_fd: int):
         """Setup camera pipeline for sandboxed environments (e.g., Flatpak)"""
-        pipeline = self.build_gstreamer_pipeline_in_sandbox(video_fd)
-        if not pipeline:
-            return
-        self.attach_gstreamer_sink_to_window(pipeline)
-        if not self.btn_pause.get_active():
-            self.play_webcam()
-            self.scanner_state = ScannerState.SCANNING
-        self.enable_webcam_consumption(pipeline)
+        # The portal gives us a PipeWire fd, not a Gst.Device, so we don't know the formats in advance.
+        ladder = build_generic_caps_ladder(*self.camera_target)
+        self.switch_webcam_source(partial(build_sandbox_source_desc, video_fd), ladder)
 
     def set_webcam_availability(self, available: bool):
         """Set webcam availability status"""
@@ -173,13 +270,14 @@ class ScannerPage(Adw.Bin):
         self.reset_result()
         visible_child_name = viewstack.get_visible_child_name()
         if visible_child_name == ScanSourceName.WEBCAM:
-            if not self.gst_pipeline:
+            if not self.webcam_pipeline:
                 self.request_camera_access()
                 return
             if not self.btn_pause.get_active():
                 self.play_webcam()
             return
         self.stop_webcam()
+        self.still_decoder.warm_up()
 
     @Gtk.Template.Callback()
     def is_empty(self, wd: Self, value: Any) -> bool:
@@ -235,24 +333,28 @@ class ScannerPage(Adw.Bin):
             return _('Found unrecognized text.')
         return _('Unknown')
 
+    @Gtk.Template.Callback()
+    def scan_results_count_text(self, wd: Self, count: int) -> str:
+        return _('Codes found: %d') % count
+
     @Gtk.Template.Callback()
     def passed_image_name(self, wd: Self, file: Gio.File | None) -> str:
         return file.get_basename() or '' if file else ''
 
     @Gtk.Template.Callback()
     def on_mirror_switch_toggled(self, switch: Gtk.Switch, *args):
-        if not self.gst_pipeline:
-            return
-        if source := self.gst_pipeline.get_by_name(GST_SOURCE_NAME):
-            source.set_state(Gst.State.NULL)
-        self.gst_pipeline.set_state(Gst.State.NULL)
-        if flip_filter := self.gst_pipeline.get_by_name(GST_FLIP_FILTER_NAME):
-            new_method = 'none' if switch.get_active() else 'horizontal-flip'
-            flip_filter.set_property('method', new_method)
-        if self.btn_pause.get_active():
-            self.gst_pipeline.set_state(Gst.State.PAUSED)
-        else:
-            self.gst_pipeline.set_state(Gst.State.PLAYING)
+        if self.webcam_pipeline:
+            self.webcam_pipeline.set_mirror(switch.get_active())
+
+    @Gtk.Template.Callback()
+    def on_continuous_switch_toggled(self, switch: Gtk.Switch, *args):
+        log.info('Continuous scanning: {}', switch.get_active())
+        self.dedup_cache.clear()
+
+    @Gtk.Template.Callback()
+    def on_btn_clear_scan_results_clicked(self, button: Gtk.Button):
+        self.scan_results_store.remove_all()
+        self.dedup_cache.clear()
 
     def activate_pause_button(self):
         """Activate the Pause button."""
@@ -262,23 +364,16 @@ class ScannerPage(Adw.Bin):
     def on_btn_pause_toggled(self, button: Gtk.ToggleButton):
         to_pause = button.get_active()
         self.scanner_state = ScannerState.IDLE if to_pause else ScannerState.SCANNING
-        if not self.gst_pipeline:
+        if not self.webcam_pipeline:
             return
         if to_pause:
-            if app_sink := cast(GstApp.AppSink | None, self.gst_pipeline.get_by_name(GST_APP_SINK_NAME)):
-                app_sink.set_emit_signals(False)
-            if source := self.gst_pipeline.get_by_name(GST_SOURCE_NAME):
-                source.set_state(Gst.State.PAUSED)
+            self.decode_pool.flush()
+            self.webcam_pipeline.app_sink.set_emit_signals(False)
+            # Keep the camera running, so that resuming is instant.
+            self.webcam_pipeline.set_frozen(True)
             return
-        # There is issue with the pipewiresrc when changing from PAUSED to PLAYING, an error is thrown:
-        # "gst_caps_intersect_full: assertion 'GST_IS_CAPS (caps2)' failed".
-        # So we stop the video and play again.
-        source = self.gst_pipeline.get_by_name(GST_SOURCE_NAME)
-        if source and source.__class__.__name__ == 'GstPipeWireSrc':
-            self.stop_webcam()
         self.play_webcam()
-        if app_sink := cast(GstApp.AppSink | None, self.gst_pipeline.get_by_name(GST_APP_SINK_NAME)):
-            app_sink.set_emit_signals(True)
+        self.webcam_pipeline.app_sink.set_emit_signals(True)
 
     @Gtk.Template.Callback()
     def on_btn_show_result_clicked(self, button: Gtk.Button):
@@ -314,34 +409,27 @@ class ScannerPage(Adw.Bin):
             return
         assert isinstance(item, WebcamDeviceInfo)
         log.info('Selected device: {}', item)
+        if self.settings:
+            self.settings.set_string('last-webcam', item.path)
         if self.scan_source_viewstack.get_visible_child_name() != ScanSourceName.WEBCAM:
             return
-        # Destroy the old pipeline if any.
-        if self.gst_pipeline:
-            self.gst_pipeline.set_state(Gst.State.NULL)
-            self.detach_gstreamer_sink()
-            self.gst_pipeline = None
-        # Build a new pipeline.
-        pipeline = self.build_gstreamer_pipeline(item.source_type, item.path)
-        if not pipeline:
-            return
-        self.attach_gstreamer_sink_to_window(pipeline)
-        # Let GTK prepare the UI fully for painting video. Without this, the video from pipewiresrc may not be displayed.
-        if item.source_type == DeviceSourceType.PIPEWIRE:
-            GLib.idle_add(self.play_webcam_and_enable_consumption, pipeline)
+        if item.caps:
+            ladder = build_caps_ladder(item.caps, *self.camera_target)
         else:
-            self.play_webcam_and_enable_consumption(pipeline)
+            ladder = build_generic_caps_ladder(*self.camera_target)
+        self.switch_webcam_source(partial(build_source_desc, item.source_type, item.path), ladder)
 
     @Gtk.Template.Callback()
     def on_image_drop_target_accept(self, target: Gtk.DropTargetAsync, drop: Gdk.Drop):
         fmt = drop.get_formats()
         log.info('Drop formats: {}', fmt.to_string())
-        return fmt.contain_gtype(Gio.File)
+        return fmt.contain_gtype(Gdk.FileList) or fmt.contain_gtype(Gio.File)
 
     @Gtk.Template.Callback()
     def on_image_dropped(self, target: Gtk.DropTargetAsync, drop: Gdk.Drop, x: float, y: float):
+        gtype = Gdk.FileList if drop.get_formats().contain_gtype(Gdk.FileList) else Gio.File
         drop.read_value_async(
-            Gio.File,
+            gtype,
             GObject.PRIORITY_DEFAULT_IDLE,
             None,
             self.cb_file_read_from_drag_n_drop,
@@ -363,141 +451,160 @@ class ScannerPage(Adw.Bin):
     def request_camera_access(self):
         """Request camera access - emits signal for sandboxed, discovers devices otherwise."""
         log.info('Is outside sandbox: {}', self.get_property('is-outside-sandbox'))
-        if self.is_outside_sandbox:
-            self.discover_webcam()
-        else:
+        if not self.is_outside_sandbox:
             self.emit('request-camera-access')
-
-    def discover_webcam(self):
-        """Discover webcam devices using GStreamer device monitor."""
-        # Initialize device monitor if not already done
-        if not self.dev_monitor:
-            self.dev_monitor = Gst.DeviceMonitor.new()
-            self.dev_monitor.add_filter('Video/Source', Gst.Caps.from_string('video/x-raw'))
-            log.debug('Device monitor: {}', self.dev_monitor)
-
-        devices = self.dev_monitor.get_devices() or []
-        for d in devices:
-            log.debug('Found device {}', d.get_path_string())
-            device_path, src_type = get_device_path(d)
-            device_name = d.get_display_name()
-            if not device_name or not device_path:
-                log.info('Unsupported device: {}', d.get_path_string())
-                continue
-            self.webcam_store.append(WebcamDeviceInfo(source_type=src_type, path=device_path, name=device_name))
-            log.debug(
-                'Added {} ({}) to webcam_store. Total items: {}', src_type, device_path, self.webcam_store.get_n_items()
-            )
-        # If found any device, set the first one as selected.
-        if next(iter(self.webcam_store), None):
-            self.webcam_multilayout.set_layout_name(WebcamPageLayoutName.AVAILABLE)
-            self.webcam_dropdown.set_selected(0)
-        # Continue to monitor for new devices.
+        elif not self.dev_monitor:
+            self.start_device_discovery()
+        elif self.webcam_store.get_n_items() and not (self.webcam_pipeline and self.webcam_pipeline.source_bin):
+            # Devices were discovered while the webcam view was hidden, start the selected one now.
+            self.on_webcam_device_selected(self.webcam_dropdown)
+
+    def start_device_discovery(self):
+        """Discover webcam devices using GStreamer device monitor, without blocking the main thread.
+
+        Can be called before the window is shown, so that the camera is ready when the user sees the page.
+        """
+        if self.dev_monitor:
+            return
+        self.dev_monitor = Gst.DeviceMonitor.new()
+        self.dev_monitor.add_filter('Video/Source', Gst.Caps.from_string('video/x-raw'))
+        log.debug('Device monitor: {}', self.dev_monitor)
+        # Monitor for new devices, the bus watch is dispatched in the main thread.
         bus = self.dev_monitor.get_bus()
         bus.add_watch(GLib.PRIORITY_DEFAULT, self.on_device_monitor_message, None)
-        log.debug('Start device monitoring...')
-        self.dev_monitor.start()
-
-    def build_gstreamer_pipeline_in_sandbox(self, video_fd: int) -> Gst.Pipeline | None:
-        flip_method = 'horizontal-flip' if self.mirror_switch.get_active() else 'none'
-        # leaky=2 on the display queue prevents a stalled GL sink from back-pressuring the tee
-        # and blocking the scan branch.
-        cmd = (
-            f'pipewiresrc name={GST_SOURCE_NAME} fd={video_fd} ! '
-            f'videoflip name={GST_FLIP_FILTER_NAME} method={flip_method} ! videoconvert ! tee name=t ! '
-            f'queue leaky=2 ! videoscale ! {build_display_sink_desc()} '
-            't. ! queue leaky=2 max-size-buffers=2 ! videoconvert ! video/x-raw,format=GRAY8 ! '
-            f'appsink name={GST_APP_SINK_NAME} max_buffers=2 drop=1'
+        thread = threading.Thread(
+            target=self.run_device_discovery, args=(self.dev_monitor,), name='cobang-device-discovery', daemon=True
         )
-        log.info('To build pipeline: {}', cmd)
-        try:
-            pipeline = cast(Gst.Pipeline, Gst.parse_launch(cmd))
-        except GLib.Error as e:
-            log.error('Failed to build pipeline: {}', e)
-            # TODO: Print error message to user.
-            self.gst_pipeline = None
+        thread.start()
+
+    def run_device_discovery(self, monitor: Gst.DeviceMonitor):
+        # Starting the providers (connecting to PipeWire, probing V4L2 nodes) can take hundreds of milliseconds.
+        log.debug('Start device monitoring...')
+        monitor.start()
+        devices = monitor.get_devices() or []
+        GLib.idle_add(self.add_discovered_devices, devices)
+
+    def add_discovered_devices(self, devices: Sequence[Gst.Device]) -> bool:
+        startup_metrics.mark(DEVICES_DISCOVERED)
+        for d in devices:
+            self.add_webcam_device(d)
+        if not self.webcam_store.get_n_items():
+            return GLib.SOURCE_REMOVE
+        self.webcam_multilayout.set_layout_name(WebcamPageLayoutName.AVAILABLE)
+        # Start the camera used last time, or the first one.
+        last_path = self.settings.get_string('last-webcam') if self.settings else ''
+        position = next((i for i, d in enumerate(self.webcam_store) if d.path == last_path), 0)
+        self.webcam_dropdown.set_selected(position)
+        return GLib.SOURCE_REMOVE
+
+    def add_webcam_device(self, device: Gst.Device) -> WebcamDeviceInfo | None:
+        """Add the device to webcam_store, if it is supported and not there yet."""
+        log.debug('Found device {}', device.get_path_string())
+        device_path, src_type = get_device_path(device)
+        device_name = device.get_display_name()
+        if not device_name or not device_path or src_type not in DeviceSourceType:
+            log.info('Unsupported device: {} {}', src_type, device.get_path_string())
+            return None
+        if any(d.path == device_path for d in self.webcam_store):
             return None
-        log.debug('Pipeline built: {}', pipeline)
-        return pipeline
-
-    def build_gstreamer_pipeline(self, src_type: DeviceSourceType, video_path: str) -> Gst.Pipeline | None:
-        """Build GStreamer Pipeline to access webcam directly (via V4L2), when running outside sandbox."""
-        flip_method = 'horizontal-flip' if self.mirror_switch.get_active() else 'none'
-        source_desc_parts = (
-            src_type,
-            f'name={GST_SOURCE_NAME} ',
-            f'device={video_path}' if src_type == DeviceSourceType.V4L2 else f'target-object={video_path}',
+        item = WebcamDeviceInfo(
+            source_type=src_type, path=device_path, name=device_name, caps=get_device_caps_string(device)
         )
-        source_desc = ' '.join(source_desc_parts)
-        # leaky=2 on the display queue prevents a stalled GL sink from back-pressuring the tee
-        # and blocking the scan branch.
-        cmd = (
-            f'{source_desc} ! videoflip name={GST_FLIP_FILTER_NAME} method={flip_method} ! videoconvert ! tee name=t ! '
-            f'queue leaky=2 ! videoscale ! {build_display_sink_desc()} '
-            't. ! queue leaky=2 max-size-buffers=2 ! videoconvert ! video/x-raw,format=GRAY8 ! '
-            f'appsink name={GST_APP_SINK_NAME} max_buffers=2 drop=1'
+        self.webcam_store.append(item)
+        log.debug(
+            'Added {} ({}) to webcam_store. Total items: {}', src_type, device_path, self.webcam_store.get_n_items()
         )
-        log.info('To build pipeline: {}', cmd)
+        return item
+
+    def ensure_webcam_pipeline(self) -> WebcamPipeline | None:
+        """Build the webcam pipeline on first use. It then lives as long as the page."""
+        if self.webcam_pipeline:
+            return self.webcam_pipeline
         try:
-            pipeline = cast(Gst.Pipeline, Gst.parse_launch(cmd))
+            webcam_pipeline = WebcamPipeline(build_display_sink_desc(), self.mirror_switch.get_active())
         except GLib.Error as e:
             log.error('Failed to build pipeline: {}', e)
-            self.gst_pipeline = None
+            # TODO: Print error message to user.
             return None
-        log.debug('Pipeline built: {}', pipeline)
-        return pipeline
-
-    def attach_gstreamer_sink_to_window(self, pipeline: Gst.Pipeline):
-        gtk4_sink = pipeline.get_by_name(GST_SINK_NAME)
-        if not gtk4_sink:
-            # When glsinkbin wraps gtk4paintablesink, the inner element's name is not
-            # discoverable via get_by_name() — retrieve it via the bin's "sink" property.
-            if sink_bin := pipeline.get_by_name('sink_bin'):
-                gtk4_sink = sink_bin.get_property('sink')
-        if not gtk4_sink:
-            log.error('Failed to get gtk4paintablesink element')
+        self.webcam_display.set_paintable(webcam_pipeline.get_paintable())
+        webcam_pipeline.add_bus_watch(self.on_pipeline_message)
+        webcam_pipeline.app_sink.connect('new-sample', self.on_new_webcam_sample)
+        self.webcam_pipeline = webcam_pipeline
+        return webcam_pipeline
+
+    def switch_webcam_source(
+        self, make_source_desc: Callable[[CapsCandidate | None], str], ladder: list[CapsCandidate | None]
+    ):
+        """Show the webcam from a new source, trying the formats of the caps ladder from the top."""
+        is_new = not self.webcam_pipeline
+        if not self.ensure_webcam_pipeline():
             return
-        log.info('Gtk4 sink: {}', gtk4_sink)
-        paintable = gtk4_sink.get_property('paintable')
-        self.webcam_display.set_paintable(paintable)
-        self.gst_pipeline = pipeline
-
-    def detach_gstreamer_sink(self):
-        self.webcam_display.set_paintable(None)
+        self.build_source_desc = make_source_desc
+        self.caps_ladder = ladder
+        if not self.set_source_at_rung(0) or not is_new:
+            return
+        # Let GTK prepare the UI fully for painting video. Without this, the video from pipewiresrc may not be displayed.
+        GLib.idle_add(self.play_webcam_and_enable_consumption)
+
+    def set_source_at_rung(self, rung: int) -> bool:
+        """Set the source with the format at the given rung of the caps ladder, or the ones below if that fails."""
+        if not self.webcam_pipeline or not self.build_source_desc:
+            return False
+        for i in range(rung, len(self.caps_ladder)):
+            self.caps_rung = i
+            caps = self.caps_ladder[i]
+            log.info('Requesting camera format: {}', caps.to_caps_string() if caps else 'any')
+            try:
+                self.webcam_pipeline.set_source(self.build_source_desc(caps))
+                return True
+            except GLib.Error as e:
+                log.error('Failed to build webcam source: {}', e)
+        return False
+
+    def on_pipeline_message(self, bus: Gst.Bus, message: Gst.Message) -> bool:
+        if message.type != Gst.MessageType.ERROR:
+            return GLib.SOURCE_CONTINUE
+        error, debug = message.parse_error()
+        log.error('Pipeline error: {} ({})', error.message, debug)
+        # Errors from a source which was already swapped out don't matter.
+        if not self.webcam_pipeline or not self.webcam_pipeline.is_from_source(message):
+            return GLib.SOURCE_CONTINUE
+        if is_negotiation_error(error, debug) and self.caps_rung + 1 < len(self.caps_ladder):
+            log.warning('Camera refused the format, falling back to the next one')
+            self.set_source_at_rung(self.caps_rung + 1)
+        return GLib.SOURCE_CONTINUE
 
     def play_webcam(self):
         log.info('Playing webcam')
-        if self.gst_pipeline:
-            self.gst_pipeline.set_state(Gst.State.PLAYING)
+        self.change_gate.reset()
+        if self.webcam_pipeline:
+            self.webcam_pipeline.play()
             self.scanner_state = ScannerState.SCANNING
 
     def stop_webcam(self):
         log.info('Stopping webcam')
         self.scanner_state = ScannerState.IDLE
-        if self.gst_pipeline:
-            self.gst_pipeline.set_state(Gst.State.NULL)
-
-    def enable_webcam_consumption(self, pipeline: Gst.Pipeline):
-        if app_sink := cast(GstApp.AppSink | None, pipeline.get_by_name(GST_APP_SINK_NAME)):
-            log.debug('Appsink: {}', app_sink)
-            app_sink.set_emit_signals(True)
-            app_sink.connect('new-sample', self.on_new_webcam_sample)
-        else:
-            log.warning('Appsink not found in pipeline')
-
-    def disable_webcam_consumption(self, pipeline: Gst.Pipeline):
-        if app_sink := cast(GstApp.AppSink | None, pipeline.get_by_name(GST_APP_SINK_NAME)):
-            log.debug('Appsink: {}', app_sink)
-            app_sink.set_emit_signals(False)
-            app_sink.disconnect_by_func(self.on_new_webcam_sample)
-        else:
-            log.warning('Appsink not found in pipeline')
-
-    def play_webcam_and_enable_consumption(self, gst_pipeline: Gst.Pipeline):
+        self.decode_pool.flush()
+        log.info('Webcam decoding: {}', self.decode_pool.stats_text())
+        log.info('{}', self.governor.stats_text())
+        log.info('{}', self.change_gate.stats_text())
+        if self.webcam_pipeline:
+            self.webcam_pipeline.stop()
+
+    def enable_webcam_consumption(self):
+        self.decode_pool.start()
+        if self.webcam_pipeline:
+            self.webcam_pipeline.app_sink.set_emit_signals(True)
+
+    def disable_webcam_consumption(self):
+        if self.webcam_pipeline:
+            self.webcam_pipeline.app_sink.set_emit_signals(False)
+
+    def play_webcam_and_enable_consumption(self):
         if not self.btn_pause.get_active():
             self.play_webcam()
             self.scanner_state = ScannerState.SCANNING
-        self.enable_webcam_consumption(gst_pipeline)
+        self.enable_webcam_consumption()
 
     def update_webcam_activity(self, is_visible: bool):
         if not is_visible:
@@ -507,7 +614,7 @@ class ScannerPage(Adw.Bin):
         if self.scan_source_viewstack.get_visible_child_name() != ScanSourceName.WEBCAM:
             return
 
-        if not self.gst_pipeline:
+        if not self.webcam_pipeline:
             self.request_camera_access()
         elif not self.btn_pause.get_active():
             self.play_webcam()
@@ -517,49 +624,51 @@ class ScannerPage(Adw.Bin):
             return Gst.FlowReturn.OK
         if not (sample := cast(Gst.Sample | None, appsink.try_pull_sample(1))):
             return Gst.FlowReturn.OK
-        if not (buffer := sample.get_buffer()):
-            return Gst.FlowReturn.OK
-        if not (caps := sample.get_caps()):
-            return Gst.FlowReturn.OK
-        struct = caps.get_structure(0)
-        exist, width = struct.get_int('width')
-        if not exist:
-            log.error('Failed to get width from caps')
-            return Gst.FlowReturn.ERROR
-        exist, height = struct.get_int('height')
-        if not exist:
-            log.error('Failed to get height from caps')
-            return Gst.FlowReturn.ERROR
-        mapinfo = buffer.map(Gst.MapFlags.READ)
-        # The documentation https://lazka.github.io/pgi-docs/#Gst-1.0/classes/MapInfo.html says that
-        # the .data is a bytes, but in Ubuntu, it is a memoryview.
-        image_data = mapinfo.data.tobytes() if isinstance(mapinfo.data, memoryview) else mapinfo.data
-        img = zbar.Image(width, height, 'Y800', image_data)
-        n = self.zbar_scanner.scan(img)
-        log.info('Scanned {} symbols', n)
-        if not n:
+        startup_metrics.mark(FIRST_FRAME)
+        # Don't let ZBar eat all the CPU on an empty scene.
+        if not self.governor.should_decode():
             return Gst.FlowReturn.OK
+        # This callback runs in the GStreamer streaming thread. Hand the sample over to
+        # the decode workers so that the scan branch is not stalled by ZBar.
+        # The pixels are not copied here, the worker maps the buffer while scanning.
+        self.decode_pool.submit(WebcamFrame(sample))
+        return Gst.FlowReturn.OK
+
+    def on_webcam_frame_decoded(self, result: DecodeResult) -> bool:
+        # Called in main thread. Other workers may have found QR code in earlier frames
+        # after we already paused, ignore them.
+        if self.btn_pause.get_active():
+            return GLib.SOURCE_REMOVE
+        log.info('Scanned {} symbols at pyramid level {}', len(result.symbols), result.level or 'full')
+        if self.continuous_switch.get_active():
+            self.collect_scan_results(result.symbols)
+            return GLib.SOURCE_REMOVE
         # Found QR code in webcam screenshot
         # Pause video to prevent further processing.
         self.btn_pause.set_active(True)
-        GLib.idle_add(self.display_result, img.symbols)
-        return Gst.FlowReturn.OK
+        self.display_result(result.symbols)
+        return GLib.SOURCE_REMOVE
+
+    def collect_scan_results(self, symbols: Sequence[DecodedSymbol]):
+        """Add all found codes to the results list, except the ones seen recently."""
+        now = time.time()
+        for sym in symbols:
+            if self.dedup_cache.check_and_add((sym.type_name, sym.data)):
+                continue
+            log.info('Collected {} code: {}', sym.type_name, sym.data)
+            self.scan_results_store.insert(0, ScanResultItem(sym.data, sym.type_name, now))
 
     def on_device_monitor_message(self, bus: Gst.Bus, message: Gst.Message, user_data: Any) -> bool:
         # A private GstV4l2Device or GstPipeWireDevice type
         if message.type == Gst.MessageType.DEVICE_ADDED:
             added_dev = message.parse_device_added()
             log.debug('Detected device: {}', added_dev)
-            cam_path, src_type = get_device_path(added_dev)
-            cam_name = added_dev.get_display_name()
-            if not cam_path or src_type not in DeviceSourceType:
-                log.info('Unsupported device: {} {}', src_type, added_dev.get_path_string())
-                return True
-            # Check if this cam already in the list, add to list if not.
-            found = any(True for d in self.webcam_store if d.path == cam_path)
-            if not found:
-                self.webcam_store.append(WebcamDeviceInfo(source_type=src_type, path=cam_path, name=cam_name))
-                log.debug('{} was not in the store. Added.', cam_path)
+            item = self.add_webcam_device(added_dev)
+            # The last used camera is plugged in while we show nothing, switch to it.
+            has_source = self.webcam_pipeline and self.webcam_pipeline.source_bin
+            if item and not has_source and self.settings and item.path == self.settings.get_string('last-webcam'):
+                self.webcam_multilayout.set_layout_name(WebcamPageLayoutName.AVAILABLE)
+                self.webcam_dropdown.set_selected(self.webcam_store.get_n_items() - 1)
             return True
         elif message.type == Gst.MessageType.DEVICE_REMOVED:
             removed_dev = message.parse_device_removed()
@@ -568,11 +677,11 @@ class ScannerPage(Adw.Bin):
             if not cam_path or src_type not in DeviceSourceType:
                 log.info('Unsupported device: {} {}', src_type, removed_dev.get_path_string())
                 return True
-            if self.gst_pipeline and (ppl_source := self.gst_pipeline.get_by_name(GST_SOURCE_NAME)):
+            if self.webcam_pipeline and (ppl_source := self.webcam_pipeline.get_source_element()):
                 if cam_path == ppl_source.get_property('device') or cam_path == ppl_source.get_property(
                     'target-object'
                 ):
-                    self.gst_pipeline.set_state(Gst.State.NULL)
+                    self.webcam_pipeline.remove_source()
             # Find the entry of just-removed in the list and remove it.
             try:
                 pos = next(i for i, d in enumerate(self.webcam_store) if d.path == cam_path)
@@ -606,12 +715,7 @@ class ScannerPage(Adw.Bin):
         try:
             image = cast(Gio.File, clipboard.read_value_finish(result))
             log.info('File: {}', image)
-            mime_type = guess_mimetype(image)
-            log.info('MIME type: {}', mime_type)
-            if not mime_type or not mime_type.startswith('image/'):
-                log.info('Not an image. Ignore.')
-                return
-            self.process_passed_image_file(image, mime_type)
+            self.process_passed_image_file(image)
         except GLib.Error:
             log.debug('No file in clipboard')
 
@@ -626,12 +730,14 @@ class ScannerPage(Adw.Bin):
         if not file:
             log.info('No file chosen.')
             return
-        mime_type = guess_mimetype(file)
-        log.info('MIME type: {}', mime_type)
-        if not mime_type or not mime_type.startswith('image/'):
-            log.info('Not an image. Ignore.')
+        files = file.get_files() if isinstance(file, Gdk.FileList) else [file]
+        if not files:
+            log.info('No file dropped.')
             return
-        self.process_passed_image_file(file, mime_type)
+        if len(files) > 1 or is_directory(files[0]):
+            self.emit('request-batch-scan', files)
+            return
+        self.process_passed_image_file(files[0])
 
     def cb_file_dialog(self, dialog: Gtk.FileDialog, result: Gio.AsyncResult):
         try:
@@ -642,61 +748,81 @@ class ScannerPage(Adw.Bin):
         if not file:
             log.info('No file chosen.')
             return
-        mime_type = guess_mimetype(file)
-        log.info('MIME type: {}', mime_type)
-        if not mime_type or not mime_type.startswith('image/'):
-            log.info('Not an image. Ignore.')
-            return
-        self.process_passed_image_file(file, mime_type)
+        self.process_passed_image_file(file)
 
-    def process_passed_image_file(self, chosen_file: Gio.File, content_type: str):
+    def process_passed_image_file(self, chosen_file: Gio.File, content_type: str | None = None):
         self.reset_result()
-        # The file can be remote, so we should read asynchronously
-        self.pasted_image.set_file(chosen_file)
-        GLib.main_context_default().iteration(False)
+        self.passed_file = chosen_file
+        # The file can be remote, so we read it asynchronously. A file which is still loading is cancelled.
+        self.image_ingest.load(chosen_file, content_type)
+
+    def on_image_ingest_stage(self, stage: IngestStage):
+        if stage in (IngestStage.READING, IngestStage.DECODING):
+            self.scanner_state = ScannerState.SCANNING
+
+    def on_image_ingested(self, loaded: LoadedImage):
+        log.info('Texture: {}', loaded.texture)
+        self.pasted_image.set_paintable(loaded.texture)
         self.pasted_image.set_visible(True)
-        paintable = cast(Gdk.Texture | None, self.pasted_image.get_paintable())
-        log.info('Paintable: {}', paintable)
-        if not paintable:
-            log.debug('No paintable. Ignore.')
+        if loaded.next_frames:
+            self.decode_frames(itertools.chain((loaded.grayscale,), loaded.next_frames))
             return
-        self.decode_from_texture(paintable)
+        self.decode_grayscale(loaded.grayscale)
+
+    def on_image_ingest_failed(self, message: str):
+        self.scanner_state = ScannerState.IDLE
+        self.passed_file = None
 
     def decode_from_texture(self, texture: Gdk.Texture):
         w = texture.get_width()
         h = texture.get_height()
         log.info('Texture size: {}x{}', w, h)
-        if not (img_bytes := texture.save_to_png_bytes().get_data()):
-            log.debug('No image data in texture. Ignore.')
+        # ZBar needs grayscale image, with transparency replaced by white.
+        self.decode_grayscale(texture_to_grayscale(texture))
+
+    def decode_grayscale(self, grayscale: Image.Image):
+        key = get_image_key(grayscale, self.still_decoder.profile)
+        if (symbols := self.decode_cache.get(key)) is not None:
+            log.info('Decode result is cached ({})', self.decode_cache.stats_text())
+            # An image which is still being decoded must not override this result.
+            self.still_decoder.cancel()
+            self.show_still_image_result(symbols)
             return
-        img_file = io.BytesIO(img_bytes)
-        rgba_img = Image.open(img_file)
-        # ZBar needs grayscale image, the Gdk.Paintable is RGBA,
-        # we need to convert it to grayscale, replacing transparency with white.
-        # Because the source image can have alpha channel, we need to convert it to LA.
-        grayscale = make_grayscale(rgba_img, w, h)
-        zimg = zbar.Image(w, h, 'Y800', grayscale.tobytes())
-        n = self.zbar_scanner.scan(zimg)
-        log.debug('Any QR code?: {}', n)
-        if not n and is_image_almost_black_white(rgba_img):
-            # Invert and try again
-            grayscale = invert_and_make_grayscale(rgba_img, w, h)
-            zimg = zbar.Image(w, h, 'Y800', grayscale.tobytes())
-            n = self.zbar_scanner.scan(zimg)
-        if not n:
+        self.scanner_state = ScannerState.SCANNING
+        # The result comes back in a worker-managing thread, hand it to the main thread.
+        self.still_decoder.submit(grayscale, partial(GLib.idle_add, self.on_still_image_decoded, key))
+
+    def decode_frames(self, frames: Iterator[Image.Image]):
+        # Frames of multi-page TIFF, animated GIF or PDF, read one by one, until one has a code.
+        # They are not cached, the key would need all of them to be read.
+        self.scanner_state = ScannerState.SCANNING
+        self.still_decoder.submit_frames(frames, partial(GLib.idle_add, self.on_still_image_decoded, None))
+
+    def on_still_image_decoded(self, key: str | None, report: CascadeReport) -> bool:
+        log.info('Still image decoding {}', report.summary_text())
+        if report.job_id != self.still_decoder.last_job_id:
+            # Another image has been passed in the meantime.
+            return False
+        # An empty result is only cached if all strategies really ran, not if a worker died or raised.
+        if key and not report.failed:
+            self.decode_cache.put(key, report.symbols)
+        self.show_still_image_result(report.symbols)
+        return False
+
+    def show_still_image_result(self, symbols: Sequence[DecodedSymbol]):
+        if not symbols:
             log.info('No QR code found in texture.')
             self.scanner_state = ScannerState.NO_RESULT
             return
-        GLib.idle_add(self.display_result, zimg.symbols)
+        self.display_result(symbols)
 
-    def display_result(self, symbols: zbar.SymbolSet):
+    def display_result(self, symbols: Sequence[DecodedSymbol]):
         # There can be more than one QR code in the image. We just pick the first.
-        # No need to to handle StopIteration exception, because this function is called
+        # No need to to handle IndexError exception, because this function is called
         # only when QR code is detected from the image.
-        sym: zbar.Symbol = next(iter(symbols))
-        log.info('QR type: {}', sym.type)
-        # We expect ZBar to return bytes, but it returns str.
-        raw_data = cast(str, sym.data)
+        sym = symbols[0]
+        log.info('QR type: {}', sym.type_name)
+        raw_data = sym.data
         log.info('Decoded string: {}', raw_data)
         log.debug('Set text for raw_result_buffer')
         buffer = self.raw_result_display.get_buffer()
@@ -737,12 +863,15 @@ class ScannerPage(Adw.Bin):
 
     def reset_result(self):
         log.info('Reset result display')
+        self.image_ingest.cancel()
+        self.still_decoder.cancel()
         self.scanner_state = ScannerState.IDLE
         buffer = self.raw_result_display.get_buffer()
         buffer.set_text('')
         self.result_bin.set_child(None)
         self.pasted_image.set_visible(False)
-        self.pasted_image.set_file(None)
+        self.pasted_image.set_paintable(None)
+        self.passed_file = None
 
     def on_wifi_connect_button_clicked(self, button: Gtk.Button, wifi_info: WifiInfoMessage):
         log.info('Connect button clicked for wifi: {}', wifi_info)
@@ -1,12 +1,41 @@
-from gi.repository import Gio, Gst  # pyright: ignore[reportMissingModuleSource]
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+import numpy as np
+from gi.repository import Gdk, Gio, GLib, Gst  # pyright: ignore[reportMissingModuleSource]
 from logbook import Logger
-from PIL import Image, ImageOps
+from PIL import Image
 
 from .consts import DeviceSourceType
+from .frames import PDF_MAGIC, is_pdf, iter_pdf_pages, open_next_frames
+from .preprocess import (
+    flatten_premultiplied_gray,
+    flatten_to_gray,
+    invert,
+    is_gray_almost_black_white,
+    is_histogram_almost_black_white,
+    to_color_array,
+)
 
 
 log = Logger(__name__)
 
+# Gdk.MemoryFormat members without alpha channel. Looked up by name because some of them
+# only exist in newer GTK versions.
+OPAQUE_MEMORY_FORMAT_NAMES = (
+    'R8G8B8',
+    'B8G8R8',
+    'B8G8R8X8',
+    'X8R8G8B8',
+    'R8G8B8X8',
+    'X8B8G8R8',
+    'R16G16B16',
+    'R16G16B16_FLOAT',
+    'R32G32B32_FLOAT',
+    'G8',
+    'G16',
+)
+
 
 def guess_mimetype(file: Gio.File) -> str:
     # If file is local, we check magic bytes to determine the content type, otherwise we guess from file extension.
@@ -18,6 +47,10 @@ def guess_mimetype(file: Gio.File) -> str:
     return info.get_attribute_string(attr) or 'application/octet-stream'
 
 
+def is_directory(file: Gio.File) -> bool:
+    return file.query_file_type(Gio.FileQueryInfoFlags.NONE, None) == Gio.FileType.DIRECTORY
+
+
 def get_device_path(device: Gst.Device) -> tuple[str, DeviceSourceType]:
     """
     Retrieve the device path and source type from a Gst.Device object.
@@ -52,31 +85,80 @@ def get_device_path(device: Gst.Device) -> tuple[str, DeviceSourceType]:
     return '', DeviceSourceType.V4L2
 
 
+def get_device_caps_string(device: Gst.Device) -> str:
+    """Return the caps supported by the device, as a string, or empty string if unknown."""
+    caps = device.get_caps()
+    return caps.to_string() if caps else ''
+
+
 def make_grayscale(rgba_img: Image.Image, width: int, height: int) -> Image.Image:
     """Convert RGBA image to grayscale image which is ready to pass to ZBar."""
     # ZBar doesn't accept transparency, so we need to convert alpha channel to white.
-    grayscale = rgba_img.convert('LA')
-    # Create an all-white image as background.
-    canvas = Image.new('LA', (width, height), (255, 255))
-    canvas.paste(grayscale, mask=grayscale)
-    return canvas.convert('L')
+    return Image.fromarray(flatten_to_gray(to_color_array(rgba_img)))
+
+
+def is_opaque_memory_format(fmt: Gdk.MemoryFormat) -> bool:
+    return any(fmt == getattr(Gdk.MemoryFormat, name, None) for name in OPAQUE_MEMORY_FORMAT_NAMES)
+
+
+def texture_to_grayscale(texture: Gdk.Texture) -> Image.Image:
+    """Get the pixels of a texture as grayscale image, ready to pass to ZBar.
+
+    GTK converts the pixels to gray while downloading them, so we don't need to encode and decode PNG.
+    Transparent areas are composited onto white, see flatten_premultiplied_gray().
+    """
+    width, height = texture.get_width(), texture.get_height()
+    downloader = Gdk.TextureDownloader.new(texture)
+    if is_opaque_memory_format(texture.get_format()):
+        downloader.set_format(Gdk.MemoryFormat.G8)
+        data, stride = downloader.download_bytes()
+        return Image.frombuffer('L', (width, height), data.get_data(), 'raw', 'L', stride, 1)
+    downloader.set_format(Gdk.MemoryFormat.G8A8_PREMULTIPLIED)
+    data, stride = downloader.download_bytes()
+    rows = np.frombuffer(data.get_data(), dtype=np.uint8).reshape(height, stride)
+    return Image.fromarray(flatten_premultiplied_gray(rows[:, : width * 2].reshape(height, width, 2)))
+
+
+def grayscale_to_texture(gray: Image.Image) -> Gdk.Texture:
+    return Gdk.MemoryTexture.new(
+        gray.width, gray.height, Gdk.MemoryFormat.G8, GLib.Bytes.new(gray.tobytes()), gray.width
+    )
+
+
+@dataclass
+class LoadedImage:
+    texture: Gdk.Texture
+    # The first frame, ready to pass to ZBar.
+    grayscale: Image.Image
+    # The other frames of a multi-frame image or PDF, read when iterated.
+    next_frames: Iterator[Image.Image] | None = None
+
+
+def decode_image_bytes(data: GLib.Bytes) -> LoadedImage:
+    """Load the content of an image or PDF file as texture, plus its grayscale version for ZBar.
+
+    It is safe to call in a worker thread, so that big images don't block the UI.
+    """
+    raw = data.get_data() or b''
+    if is_pdf(raw[: len(PDF_MAGIC)]):
+        pages = iter_pdf_pages(raw)
+        if not (first := next(pages, None)):
+            raise ValueError('The PDF document has no page')
+        return LoadedImage(grayscale_to_texture(first), first, pages)
+    texture = Gdk.Texture.new_from_bytes(data)
+    return LoadedImage(texture, texture_to_grayscale(texture), open_next_frames(raw))
+
+
+def is_grayscale_almost_black_white(gray_img: Image.Image) -> bool:
+    return is_gray_almost_black_white(np.asarray(gray_img))
 
 
-def is_image_almost_black_white(rgba_img: Image.Image):
-    total_pixel = rgba_img.width * rgba_img.height
-    # Get histogram
-    htg = rgba_img.histogram()
-    # Count pixels at the left most and right most of each RGB channel
-    polar_red = sum(htg[:10] + htg[256 - 10 : 256])
-    polar_green = sum(htg[256 : 256 + 10] + htg[512 - 10 : 512])
-    polar_blue = sum(htg[512 : 512 + 10] + htg[768 - 10 : 768])
-    # Image is almost black-white if most of the pixels gather at the two ends of histogram.
-    return (polar_red / total_pixel > 0.9) and (polar_green / total_pixel > 0.9) and (polar_blue / total_pixel > 0.9)
+def is_image_almost_black_white(rgba_img: Image.Image) -> bool:
+    if rgba_img.mode not in ('RGB', 'RGBA'):
+        rgba_img = rgba_img.convert('RGBA')
+    return is_histogram_almost_black_white(np.asarray(rgba_img.histogram()), rgba_img.width * rgba_img.height)
 
 
 def invert_and_make_grayscale(rgba_img: Image.Image, width: int, height: int) -> Image.Image:
     """Invert and convert RGBA image to grayscale image which is ready to pass to ZBar."""
-    gray_scale = make_grayscale(rgba_img, width, height)
-    # invert() only accepts RGB
-    iv_image = ImageOps.invert(gray_scale.convert('RGB'))
-    return iv_image.convert('L')
+    return Image.fromarray(invert(flatten_to_gray(to_color_array(rgba_img))))
@@ -0,0 +1,171 @@
+"""Image preprocessing for ZBar, on NumPy arrays.
+
+Each function works in a few vectorized passes over the pixels, without intermediate PIL images.
+Arrays are uint8, of shape (height, width) for gray and (height, width, channels) for color.
+"""
+
+import numpy as np
+from numpy.typing import NDArray
+from PIL import Image
+
+
+# ITU-R 601-2 luma weights, scaled by 2^8 so that the whole computation fits in uint16.
+LUMA_WEIGHTS = (77, 150, 29)
+# Pixels darker than this, or brighter than 255 minus this, count as black or white.
+POLAR_MARGIN = 10
+POLAR_RATIO = 0.9
+# adaptive_threshold() works on bands of about this many pixels.
+THRESHOLD_BAND_PIXELS = 1 << 20
+# Bytes of temporary arrays per pixel of a band, in adaptive_threshold().
+THRESHOLD_BYTES_PER_BAND_PIXEL = 18
+
+GrayArray = NDArray[np.uint8]
+ColorArray = NDArray[np.uint8]
+
+
+def to_color_array(img: Image.Image) -> ColorArray:
+    """Get the pixels of a PIL image as RGB or RGBA array, converting other modes to RGBA."""
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA')
+    return np.asarray(img)
+
+
+def luminance(rgb: ColorArray) -> NDArray[np.uint16]:
+    """Luminance of RGB(A) pixels, 0-255, in a uint16 array to be reused by the next computation."""
+    # The products are computed in uint16. With NumPy 1.x value-based casting, a uint8 array times a scalar
+    # stays uint8 and wraps around.
+    y = np.multiply(rgb[..., 0], LUMA_WEIGHTS[0], dtype=np.uint16)
+    y += np.multiply(rgb[..., 1], LUMA_WEIGHTS[1], dtype=np.uint16)
+    y += np.multiply(rgb[..., 2], LUMA_WEIGHTS[2], dtype=np.uint16)
+    y += 1 << 7
+    y >>= 8
+    return y
+
+
+def div255(x: NDArray[np.uint16]) -> NDArray[np.uint16]:
+    """Divide by 255 with rounding, in place, for x <= 255 * 255."""
+    x += 1 << 7
+    x += x >> 8
+    x >>= 8
+    return x
+
+
+def flatten_to_gray(rgb: ColorArray) -> GrayArray:
+    """Convert RGB(A) pixels to gray, composited onto white background.
+
+    Y = L * a / 255 + 255 * (255 - a) / 255, computed as 255 - (255 - L) * a / 255 to stay within uint16.
+    The result may differ from PIL's convert('LA') + paste() by one level.
+    """
+    y = luminance(rgb)
+    if rgb.shape[-1] > 3:
+        np.subtract(255, y, out=y)
+        y *= rgb[..., 3]
+        np.subtract(255, div255(y), out=y)
+    return y.astype(np.uint8)
+
+
+def flatten_premultiplied_gray(la: GrayArray) -> GrayArray:
+    """Composite gray with premultiplied alpha, of shape (height, width, 2), onto white.
+
+    With premultiplied alpha, Y = g' + 255 - a. g' <= a, so it never overflows uint8.
+    """
+    return la[..., 0] + (255 - la[..., 1])
+
+
+def invert(gray: GrayArray) -> GrayArray:
+    return 255 - gray
+
+
+def count_polar(channel: GrayArray) -> int:
+    """Count the values near 0 or 255."""
+    # Subtracting the margin, with uint8 wrap-around, moves both ends of the range to the top.
+    # So a single comparison is enough.
+    return int(np.count_nonzero(channel - np.uint8(POLAR_MARGIN) >= 256 - 2 * POLAR_MARGIN))
+
+
+def is_almost_black_white(rgb: ColorArray) -> bool:
+    """Tell if most of the pixels, in each of R, G and B channels, are near the two ends of the range."""
+    threshold = POLAR_RATIO * rgb.shape[0] * rgb.shape[1]
+    # Stop at the first channel which is not polar, which is the first one for most photos.
+    return all(count_polar(rgb[..., c]) > threshold for c in range(3))
+
+
+def is_histogram_almost_black_white(histogram: NDArray[np.integer], n_pixels: int) -> bool:
+    """Same test as is_almost_black_white(), on the concatenated 256-bin histograms of R, G, B (and A).
+
+    For PIL images, Image.histogram() is cheaper than exporting the pixels to NumPy.
+    """
+    bins = histogram.reshape(-1, 256)[:3]
+    polar = bins[:, :POLAR_MARGIN].sum(axis=1) + bins[:, 256 - POLAR_MARGIN :].sum(axis=1)
+    return bool(np.all(polar > POLAR_RATIO * n_pixels))
+
+
+def is_gray_almost_black_white(gray: GrayArray) -> bool:
+    return bool(count_polar(gray) > POLAR_RATIO * gray.size)
+
+
+def get_band_height(width: int) -> int:
+    return max(1, THRESHOLD_BAND_PIXELS // max(1, width))
+
+
+def adaptive_threshold_memory(width: int, height: int) -> int:
+    """Peak memory (in bytes) of adaptive_threshold(), besides its input: the result and the work on one band."""
+    band_pixels = min(height, get_band_height(width)) * width
+    return width * height + THRESHOLD_BYTES_PER_BAND_PIXEL * band_pixels
+
+
+def box_sums(cumsum: NDArray[np.int32], size: int, r: int, axis: int) -> NDArray[np.int32]:
+    """Turn a cumulative sum along the axis, padded with r + 1 leading zeros and r trailing copies of the total,
+    into sums over windows of 2r + 1, using only slices.
+    """
+    upper = [slice(None)] * cumsum.ndim
+    lower = [slice(None)] * cumsum.ndim
+    upper[axis] = slice(2 * r + 1, 2 * r + 1 + size)
+    lower[axis] = slice(0, size)
+    return cumsum[tuple(upper)] - cumsum[tuple(lower)]
+
+
+def window_counts(start: int, stop: int, length: int, r: int) -> NDArray[np.int32]:
+    """Number of pixels in the windows of 2r + 1 centered on [start, stop), clipped to [0, length)."""
+    centers = np.arange(start, stop, dtype=np.int32)
+    return np.minimum(centers + r + 1, length) - np.maximum(centers - r, 0)
+
+
+def adaptive_threshold(gray: GrayArray, block_size: int = 31, offset: int = 7) -> GrayArray:
+    """Binarize each pixel against the mean of its block_size x block_size neighbourhood.
+
+    Unlike a global threshold, this keeps the modules of a code which is unevenly lit or has low contrast.
+    Pixels brighter than the local mean minus offset become white. The local sums come from running sums,
+    so the cost doesn't depend on the block size.
+
+    The image is processed in horizontal bands, in int32, so that the temporary arrays stay small
+    (see THRESHOLD_BAND_PIXELS) whatever the image size.
+    """
+    height, width = gray.shape
+    r = block_size // 2
+    band_height = get_band_height(width)
+    binary = np.empty_like(gray)
+    col_counts = window_counts(0, width, width, r)
+    for top in range(0, height, band_height):
+        bottom = min(height, top + band_height)
+        # Vertical sums, over the rows of the band and r rows above and below.
+        start, stop = max(0, top - r), min(height, bottom + r)
+        lead = start - (top - r)
+        vertical = np.zeros((bottom - top + 2 * r + 1, width), dtype=np.int32)
+        np.cumsum(gray[start:stop], axis=0, dtype=np.int32, out=vertical[lead + 1 : lead + 1 + stop - start])
+        vertical[lead + 1 + stop - start :] = vertical[lead + stop - start]
+        column_sums = box_sums(vertical, bottom - top, r, axis=0)
+        del vertical
+        # Then horizontal sums of those.
+        horizontal = np.zeros((bottom - top, width + 2 * r + 1), dtype=np.int32)
+        np.cumsum(column_sums, axis=1, out=horizontal[:, r + 1 : r + 1 + width])
+        horizontal[:, r + 1 + width :] = horizontal[:, r + width : r + 1 + width]
+        del column_sums
+        sums = box_sums(horizontal, width, r, axis=1)
+        del horizontal
+        counts = window_counts(top, bottom, height, r)[:, None] * col_counts[None, :]
+        # Compare gray > sums / counts - offset without division.
+        sums -= offset * counts
+        counts *= gray[top:bottom]
+        np.multiply(counts > sums, np.uint8(255), out=binary[top:bottom])
+    return binary
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+import zbar  # zuban: ignore[import-not-found]
+from logbook import Logger
+from PIL import Image, ImageFilter
+
+from .decoding import DecodedSymbol, scan_mapped_frame
+from .frame_access import MappedFrame
+
+
+log = Logger(__name__)
+
+# Pyramid level value which means the frame as it comes from the camera.
+FULL_RESOLUTION = 0
+# Edge pixels are counted in blocks of this size (in the low-res image) to find code-like areas.
+EVIDENCE_BLOCK_SIZE = 8
+# A block is code-like if this fraction of its pixels are strong edges.
+EVIDENCE_BLOCK_DENSITY = 0.3
+# Margin (relative to the candidate size) added around a candidate area before cropping.
+CANDIDATE_MARGIN = 0.25
+
+
+@dataclass
+class PyramidHit:
+    symbols: list[DecodedSymbol]
+    # The level which produced the symbols: width of the downscaled frame, or FULL_RESOLUTION.
+    level: int
+    # Whether the scanned frames looked like containing a code, even if nothing was decoded.
+    evidence: bool = False
+
+
+@dataclass
+class DecodePyramid:
+    """Scan a downscaled copy of the frame first, only go up to higher resolution when needed.
+
+    Each level is the width to downscale the frame to, FULL_RESOLUTION is the original frame.
+    Levels are tried from the first to the last. Higher levels are only tried when the first level
+    finds code-like evidence (then only the area around the evidence is cropped and scanned),
+    or when the first level has failed for `escalate_after` frames in a row.
+
+    The object is stateful and not thread-safe, each decode worker has its own.
+    """
+
+    levels: Sequence[int] = (640, FULL_RESOLUTION)
+    escalate_after: int = 10
+    misses: int = field(default=0, init=False)
+
+    def scan(self, scanner: zbar.ImageScanner, zimg: zbar.Image, frame: MappedFrame) -> PyramidHit:
+        levels = self.levels or (FULL_RESOLUTION,)
+        full = frame.to_image()
+        first_level, *higher_levels = levels
+        factor = self.get_reduce_factor(frame.width, first_level)
+        if factor == 1:
+            # The camera resolution is already at or below this level.
+            symbols = scan_mapped_frame(scanner, zimg, frame)
+            low = full
+        else:
+            low = full.reduce(factor)
+            symbols = self.scan_image(scanner, zimg, low, factor)
+        if symbols:
+            self.misses = 0
+            return PyramidHit(symbols, first_level, evidence=True)
+        self.misses += 1
+        if not higher_levels:
+            return PyramidHit([], first_level)
+        box = find_candidate_box(low)
+        if box:
+            left, top, right, bottom = box
+            box = (left * factor, top * factor, min(frame.width, right * factor), min(frame.height, bottom * factor))
+        elif self.misses >= self.escalate_after:
+            self.misses = 0
+        else:
+            return PyramidHit([], first_level)
+        for level in higher_levels:
+            level_factor = self.get_reduce_factor(frame.width, level)
+            if level_factor >= factor:
+                continue
+            if box:
+                cropped = full.crop(box)
+                image = cropped.reduce(level_factor) if level_factor > 1 else cropped
+                symbols = self.scan_image(scanner, zimg, image, level_factor, box[0], box[1])
+            elif level_factor == 1:
+                symbols = scan_mapped_frame(scanner, zimg, frame)
+            else:
+                symbols = self.scan_image(scanner, zimg, full.reduce(level_factor), level_factor)
+            if symbols:
+                log.debug('Escalated to pyramid level {}, crop {}', level, box)
+                self.misses = 0
+                return PyramidHit(symbols, level, evidence=True)
+        return PyramidHit([], first_level, evidence=bool(box))
+
+    def get_reduce_factor(self, width: int, level: int) -> int:
+        if level == FULL_RESOLUTION or width <= level:
+            return 1
+        return max(1, round(width / level))
+
+    def scan_image(
+        self,
+        scanner: zbar.ImageScanner,
+        zimg: zbar.Image,
+        image: Image.Image,
+        factor: int,
+        offset_x: int = 0,
+        offset_y: int = 0,
+    ) -> list[DecodedSymbol]:
+        small = MappedFrame(image.width, image.height, image.tobytes())
+        symbols = scan_mapped_frame(scanner, zimg, small)
+        return [s.mapped_back(factor, offset_x, offset_y) for s in symbols]
+
+
+def find_candidate_box(image: Image.Image) -> tuple[int, int, int, int] | None:
+    """Find the area which looks like containing a barcode, in a grayscale image.
+
+    Barcodes have many strong edges packed together. We threshold the edge map, then count the edge
+    pixels in small blocks. The bounding box of dense blocks is the candidate.
+    Return None if no block is dense enough, or if they spread over (nearly) the whole image,
+    which is the case of a textured scene, not of a code.
+    """
+    edges = image.filter(ImageFilter.FIND_EDGES).point(lambda v: 255 if v > 64 else 0)
+    if edges.width < EVIDENCE_BLOCK_SIZE or edges.height < EVIDENCE_BLOCK_SIZE:
+        return None
+    density = edges.reduce(EVIDENCE_BLOCK_SIZE)
+    threshold = int(255 * EVIDENCE_BLOCK_DENSITY)
+    dense = density.point(lambda v: 255 if v > threshold else 0)
+    if not (bbox := dense.getbbox()):
+        return None
+    left, top, right, bottom = (v * EVIDENCE_BLOCK_SIZE for v in bbox)
+    if (right - left) * (bottom - top) > 0.8 * image.width * image.height:
+        return None
+    margin_x = int((right - left) * CANDIDATE_MARGIN)
+    margin_y = int((bottom - top) * CANDIDATE_MARGIN)
+    return (
+        max(0, left - margin_x),
+        max(0, top - margin_y),
+        min(image.width, right + margin_x),
+        min(image.height, bottom + margin_y),
+    )
@@ -0,0 +1,193 @@
+"""Export of generated QR codes as PNG and as vector images (SVG, PDF, EPS). No GTK here.
+
+The vector formats are produced as a stream of chunks, row by row, so the file can be written while it is
+being made. Adjacent dark modules of a row are merged into one rectangle, which keeps the files small.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+from enum import StrEnum
+
+import numpy as np
+from PIL import ImageColor
+
+from .consts import ErrorCorrectionLevel
+from .qr_matrix import QRMatrix, make_qr_png
+
+
+# Approximate number of bytes to gather before handing a chunk to the writer.
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class QRStyle:
+    """Settings of the generator preview pane, which apply to every generated code."""
+
+    error_correction: ErrorCorrectionLevel = ErrorCorrectionLevel.LOWEST
+    # Pixels, or points for PDF and EPS, per module.
+    box_size: int = 8
+    # Quiet zone, in modules.
+    border: int = 3
+    # CSS-style hex colors.
+    fill_color: str = '#000000'
+    back_color: str = '#ffffff'
+
+
+class QRExportFormat(StrEnum):
+    PNG = 'png'
+    SVG = 'svg'
+    PDF = 'pdf'
+    EPS = 'eps'
+
+    @property
+    def content_type(self) -> str:
+        return {
+            QRExportFormat.PNG: 'image/png',
+            QRExportFormat.SVG: 'image/svg+xml',
+            QRExportFormat.PDF: 'application/pdf',
+            QRExportFormat.EPS: 'image/x-eps',
+        }[self]
+
+    @classmethod
+    def from_filename(cls, name: str) -> QRExportFormat | None:
+        suffix = name.rpartition('.')[2].lower()
+        try:
+            return cls(suffix)
+        except ValueError:
+            return None
+
+
+def iter_module_runs(matrix: QRMatrix) -> Iterator[tuple[int, Iterator[tuple[int, int]]]]:
+    """Yield (row, runs) for each row, where runs are (column, length) of adjacent dark modules."""
+    # Padding with light modules makes each run start at a rising edge and end at a falling edge.
+    edges = np.diff(np.pad(matrix.modules, ((0, 0), (1, 1))).view(np.int8), axis=1)
+    for y, row in enumerate(edges):
+        starts = np.flatnonzero(row == 1)
+        ends = np.flatnonzero(row == -1)
+        yield y, zip(starts.tolist(), (ends - starts).tolist(), strict=True)
+
+
+def format_rgb(color: str) -> str:
+    """Color components for the PostScript and PDF operators, from 0 to 1."""
+    return ' '.join(f'{c / 255:.4f}' for c in ImageColor.getrgb(color)[:3])
+
+
+def batch_chunks(parts: Iterator[str], size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    buf: list[str] = []
+    length = 0
+    for part in parts:
+        buf.append(part)
+        length += len(part)
+        if length >= size:
+            yield ''.join(buf).encode()
+            buf.clear()
+            length = 0
+    if buf:
+        yield ''.join(buf).encode()
+
+
+def iter_svg_parts(matrix: QRMatrix, box_size: int, border: int, fill_color: str, back_color: str) -> Iterator[str]:
+    # Drawn in module units, the viewBox maps them to `box_size` pixels.
+    n = matrix.size + 2 * border
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{n * box_size}" height="{n * box_size}" '
+        f'viewBox="0 0 {n} {n}" shape-rendering="crispEdges">\n'
+        f'<rect width="{n}" height="{n}" fill="{back_color}"/>\n'
+        f'<path fill="{fill_color}" d="'
+    )
+    for y, runs in iter_module_runs(matrix):
+        yield ''.join(f'M{x + border} {y + border}h{length}v1h-{length}z' for x, length in runs)
+        yield '\n'
+    yield '"/>\n</svg>\n'
+
+
+def iter_eps_parts(matrix: QRMatrix, box_size: int, border: int, fill_color: str, back_color: str) -> Iterator[str]:
+    # One point per pixel of the PNG export.
+    n = matrix.size + 2 * border
+    side = n * box_size
+    yield (
+        '%!PS-Adobe-3.0 EPSF-3.0\n'
+        f'%%BoundingBox: 0 0 {side} {side}\n'
+        '%%Creator: CoBang\n'
+        '%%EndComments\n'
+        '/R { 1 rectfill } bind def\n'
+        f'{format_rgb(back_color)} setrgbcolor 0 0 {side} {side} rectfill\n'
+        # From here, module units, with the origin at the top left corner.
+        f'0 {side} translate {box_size} -{box_size} scale\n'
+        f'{format_rgb(fill_color)} setrgbcolor\n'
+    )
+    for y, runs in iter_module_runs(matrix):
+        yield ''.join(f'{x + border} {y + border} {length} R\n' for x, length in runs)
+    yield 'showpage\n%%EOF\n'
+
+
+class PDFStreamWriter:
+    """Yield the bytes of a one-page PDF while remembering the object offsets for the cross-reference table.
+
+    The length of the content stream is written as an object after the stream, so that the stream doesn't
+    have to be made in advance.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.object_offsets: dict[int, int] = {}
+
+    def emit(self, text: str) -> str:
+        self.offset += len(text.encode())
+        return text
+
+    def begin_object(self, number: int) -> str:
+        self.object_offsets[number] = self.offset
+        return self.emit(f'{number} 0 obj\n')
+
+    def iter_parts(
+        self, matrix: QRMatrix, box_size: int, border: int, fill_color: str, back_color: str
+    ) -> Iterator[str]:
+        n = matrix.size + 2 * border
+        side = n * box_size
+        yield self.emit('%PDF-1.4\n')
+        yield self.begin_object(1) + self.emit('<< /Type /Catalog /Pages 2 0 R >>\nendobj\n')
+        yield self.begin_object(2) + self.emit('<< /Type /Pages /Kids [3 0 R] /Count 1 >>\nendobj\n')
+        yield self.begin_object(3) + self.emit(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {side} {side}] /Contents 4 0 R /Resources << >> >>\nendobj\n'
+        )
+        yield self.begin_object(4) + self.emit('<< /Length 5 0 R >>\nstream\n')
+        stream_start = self.offset
+        yield self.emit(
+            f'{format_rgb(back_color)} rg 0 0 {side} {side} re f\n'
+            # Module units, with the origin at the top left corner.
+            f'{box_size} 0 0 -{box_size} 0 {side} cm\n'
+            f'{format_rgb(fill_color)} rg\n'
+        )
+        for y, runs in iter_module_runs(matrix):
+            yield self.emit(''.join(f'{x + border} {y + border} {length} 1 re\n' for x, length in runs))
+        yield self.emit('f')
+        stream_length = self.offset - stream_start
+        # The end-of-line before "endstream" is not part of the stream.
+        yield self.emit('\nendstream\nendobj\n')
+        yield self.begin_object(5) + self.emit(f'{stream_length}\nendobj\n')
+        xref_offset = self.offset
+        count = len(self.object_offsets) + 1
+        yield self.emit(
+            f'xref\n0 {count}\n0000000000 65535 f \n'
+            + ''.join(f'{self.object_offsets[i]:010d} 00000 n \n' for i in range(1, count))
+            + f'trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n'
+        )
+
+
+def iter_export_chunks(fmt: QRExportFormat, matrix: QRMatrix, style: QRStyle) -> Iterator[bytes]:
+    """Yield the content of the exported file, chunk by chunk."""
+    args = (matrix, style.box_size, style.border, style.fill_color, style.back_color)
+    if fmt == QRExportFormat.PNG:
+        yield make_qr_png(*args)
+        return
+    if fmt == QRExportFormat.SVG:
+        parts = iter_svg_parts(*args)
+    elif fmt == QRExportFormat.EPS:
+        parts = iter_eps_parts(*args)
+    else:
+        parts = PDFStreamWriter().iter_parts(*args)
+    yield from batch_chunks(parts)
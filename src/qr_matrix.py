@@ -0,0 +1,121 @@
+"""The two stages of making a QR code image, without GTK.
+
+Encoding (text, error correction) into a module matrix is the slow part: qrcode tries the 8 masks and scores
+each of them. Its result doesn't depend on colors and sizes, so it is cached, and only the cheap raster stage
+is run again when the appearance changes.
+"""
+
+from __future__ import annotations
+
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import qrcode
+from PIL import Image, ImageColor
+
+from .consts import ErrorCorrectionLevel
+
+
+# Matrices kept by the encode stage. Going back and forth while typing, or between styles, hits them.
+DEFAULT_MATRIX_CACHE_CAPACITY = 32
+
+
+@dataclass(frozen=True, eq=False)
+class QRMatrix:
+    # True for dark modules, without the quiet zone. Read-only.
+    modules: np.ndarray
+    version: int
+
+    @property
+    def size(self) -> int:
+        return self.modules.shape[0]
+
+
+def get_qrcode_error_correction(level: ErrorCorrectionLevel) -> int:
+    return {
+        ErrorCorrectionLevel.LOWEST: qrcode.constants.ERROR_CORRECT_L,
+        ErrorCorrectionLevel.LOW: qrcode.constants.ERROR_CORRECT_M,
+        ErrorCorrectionLevel.MEDIUM: qrcode.constants.ERROR_CORRECT_Q,
+        ErrorCorrectionLevel.HIGH: qrcode.constants.ERROR_CORRECT_H,
+    }[level]
+
+
+def make_qr_matrix(text: str, error_correction: ErrorCorrectionLevel) -> QRMatrix:
+    """Encode stage, uncached. Raise qrcode.exceptions.DataOverflowError if the text is too long."""
+    qr = qrcode.QRCode(version=None, error_correction=get_qrcode_error_correction(error_correction), border=0)
+    qr.add_data(text)
+    qr.make(fit=True)
+    modules = np.array(qr.modules, dtype=bool)
+    modules.flags.writeable = False
+    return QRMatrix(modules, qr.version)
+
+
+class QRMatrixCache:
+    """LRU cache of encoded matrices, by (text, error correction). Can be used from several threads."""
+
+    def __init__(self, capacity: int = DEFAULT_MATRIX_CACHE_CAPACITY):
+        self.capacity = capacity
+        self.entries: OrderedDict[tuple[str, ErrorCorrectionLevel], QRMatrix] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get_matrix(self, text: str, error_correction: ErrorCorrectionLevel) -> QRMatrix:
+        key = (text, error_correction)
+        with self.lock:
+            if (matrix := self.entries.get(key)) is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return matrix
+            self.misses += 1
+        # Encoded outside the lock. Two threads may encode the same text, it's harmless.
+        matrix = make_qr_matrix(text, error_correction)
+        with self.lock:
+            self.entries[key] = matrix
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        return matrix
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+    def stats_text(self) -> str:
+        return f'{self.hits} hits, {self.misses} misses, {len(self.entries)} entries'
+
+
+matrix_cache = QRMatrixCache()
+
+
+def encode_qr_matrix(text: str, error_correction: ErrorCorrectionLevel) -> QRMatrix:
+    """Encode stage, through the shared cache."""
+    return matrix_cache.get_matrix(text, error_correction)
+
+
+def rasterize_qr_modules(matrix: QRMatrix, border: int, fill_color: str, back_color: str) -> np.ndarray:
+    """Raster stage, one pixel per module: RGB array of the matrix with a quiet zone of `border` modules.
+
+    The preview scales it up on the GPU, bigger images are only made for exporting.
+    """
+    palette = np.array([ImageColor.getrgb(back_color)[:3], ImageColor.getrgb(fill_color)[:3]], dtype=np.uint8)
+    return palette[np.pad(matrix.modules, border).view(np.uint8)]
+
+
+def rasterize_qr_matrix(matrix: QRMatrix, box_size: int, border: int, fill_color: str, back_color: str) -> Image.Image:
+    """Raster stage: paint each module as a `box_size` square, with a quiet zone of `border` modules."""
+    pixels = rasterize_qr_modules(matrix, border, fill_color, back_color)
+    return Image.fromarray(pixels.repeat(box_size, axis=0).repeat(box_size, axis=1), 'RGB')
+
+
+def make_qr_png(matrix: QRMatrix, box_size: int, border: int, fill_color: str, back_color: str) -> bytes:
+    """Full size PNG image, for saving and copying."""
+    buf = io.BytesIO()
+    rasterize_qr_matrix(matrix, box_size, border, fill_color, back_color).save(buf, 'PNG')
+    return buf.getvalue()
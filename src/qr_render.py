@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from gi.repository import Gdk, GLib, GObject, Graphene, Gsk, Gtk  # pyright: ignore[reportMissingModuleSource]
+
+from .qr_export import QRExportFormat, QRStyle, iter_export_chunks
+from .qr_matrix import encode_qr_matrix, rasterize_qr_modules
+
+
+@dataclass(frozen=True)
+class QRRenderRequest:
+    """Everything which the generated QR code image depends on. Taken from the widgets in the main thread."""
+
+    text: str
+    style: QRStyle = QRStyle()
+
+
+def render_qr_texture(request: QRRenderRequest) -> Gdk.Texture:
+    """Make the QR code image, one pixel per module. Safe to call in a worker thread.
+
+    Changes of colors and sizes only redo the raster stage, the matrix comes from the cache.
+    The pixels are handed to GDK as they are, no PNG encoding and decoding.
+    """
+    style = request.style
+    matrix = encode_qr_matrix(request.text, style.error_correction)
+    pixels = rasterize_qr_modules(matrix, style.border, style.fill_color, style.back_color)
+    height, width = pixels.shape[:2]
+    return Gdk.MemoryTexture.new(width, height, Gdk.MemoryFormat.R8G8B8, GLib.Bytes.new(pixels.tobytes()), width * 3)
+
+
+def render_qr_png(request: QRRenderRequest) -> bytes:
+    """Make the full size PNG image, for saving and copying."""
+    return b''.join(iter_qr_export_chunks(request, QRExportFormat.PNG))
+
+
+def iter_qr_export_chunks(request: QRRenderRequest, fmt: QRExportFormat) -> Iterator[bytes]:
+    """Content of the file to save, chunk by chunk."""
+    matrix = encode_qr_matrix(request.text, request.style.error_correction)
+    return iter_export_chunks(fmt, matrix, request.style)
+
+
+class QRModulePaintable(GObject.Object, Gdk.Paintable):
+    """Show a one-pixel-per-module texture at `box_size` pixels per module, scaled without blurring the edges."""
+
+    def __init__(self, texture: Gdk.Texture, box_size: int):
+        super().__init__()
+        self.texture = texture
+        self.box_size = box_size
+
+    def do_get_intrinsic_width(self) -> int:
+        return self.texture.get_width() * self.box_size
+
+    def do_get_intrinsic_height(self) -> int:
+        return self.texture.get_height() * self.box_size
+
+    def do_get_flags(self) -> Gdk.PaintableFlags:
+        return Gdk.PaintableFlags.STATIC_SIZE | Gdk.PaintableFlags.STATIC_CONTENTS
+
+    def do_snapshot(self, snapshot: Gtk.Snapshot, width: float, height: float):
+        bounds = Graphene.Rect().init(0, 0, width, height)
+        snapshot.append_scaled_texture(self.texture, Gsk.ScalingFilter.NEAREST, bounds)
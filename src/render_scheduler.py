@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Generic, TypeVar
+
+from gi.repository import GLib  # pyright: ignore[reportMissingModuleSource]
+from logbook import Logger
+
+
+log = Logger(__name__)
+
+P = TypeVar('P')
+R = TypeVar('R')
+
+# Milliseconds to wait for more input before rendering. Shorter than the gap between keystrokes of fast typing.
+DEFAULT_DEBOUNCE_DELAY = 80
+
+
+class RenderScheduler(Generic[P, R]):
+    """Run `render(params)` in a worker thread, for the latest requested params only.
+
+    Requests are debounced: a burst of them (typing, or resetting several properties at once) makes one render,
+    after `delay` milliseconds without new request. Only one render runs at a time. If new params are requested
+    while a render is running, its result is dropped when it comes, and the newest params are rendered next.
+    Requesting the same params as the ones already shown does nothing.
+
+    `render` must not touch widgets. `on_rendered` and `on_failed` are called in the main thread.
+    """
+
+    def __init__(
+        self,
+        render: Callable[[P], R],
+        on_rendered: Callable[[P, R], object],
+        on_failed: Callable[[P, Exception], object] | None = None,
+        delay: int = DEFAULT_DEBOUNCE_DELAY,
+    ):
+        self.render = render
+        self.on_rendered = on_rendered
+        self.on_failed = on_failed
+        self.delay = delay
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='cobang-render')
+        self.timer_id = 0
+        # Requested, not started yet.
+        self.pending: P | None = None
+        # Bumped at each request, so that the result of an older one can be recognized.
+        self.generation = 0
+        self.is_rendering = False
+        self.last_rendered: P | None = None
+        self.n_requested = 0
+        self.n_rendered = 0
+        self.n_dropped = 0
+
+    def request(self, params: P):
+        self.n_requested += 1
+        self.generation += 1
+        self.pending = params
+        if self.timer_id:
+            GLib.source_remove(self.timer_id)
+        self.timer_id = GLib.timeout_add(self.delay, self.on_timeout)
+
+    def cancel(self):
+        """Forget the pending request, and drop the result of the running render, if any."""
+        self.generation += 1
+        self.pending = None
+        self.last_rendered = None
+        if self.timer_id:
+            GLib.source_remove(self.timer_id)
+            self.timer_id = 0
+
+    def on_timeout(self) -> bool:
+        self.timer_id = 0
+        self.start_pending()
+        return GLib.SOURCE_REMOVE
+
+    def start_pending(self):
+        # If a render is running, the pending one is started when it is done.
+        if self.is_rendering or self.pending is None:
+            return
+        params, self.pending = self.pending, None
+        if params == self.last_rendered:
+            return
+        self.is_rendering = True
+        generation = self.generation
+        future = self.executor.submit(self.render, params)
+        future.add_done_callback(lambda f: GLib.idle_add(self.on_render_done, params, generation, f))
+
+    def on_render_done(self, params: P, generation: int, future: Future[R]) -> bool:
+        self.is_rendering = False
+        if generation != self.generation:
+            # Newer input came while rendering.
+            self.n_dropped += 1
+        elif e := future.exception():
+            log.error('Failed to render: {}', e)
+            if self.on_failed and isinstance(e, Exception):
+                self.on_failed(params, e)
+        else:
+            self.n_rendered += 1
+            self.last_rendered = params
+            self.on_rendered(params, future.result())
+        # Still debouncing, the timer will start it.
+        if not self.timer_id:
+            self.start_pending()
+        return GLib.SOURCE_REMOVE
+
+    def stats_text(self) -> str:
+        return f'Render requested: {self.n_requested}, rendered: {self.n_rendered}, dropped: {self.n_dropped}'
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Self
+
+from logbook import Logger
+
+
+if TYPE_CHECKING:
+    import zbar  # zuban: ignore[import-not-found]
+
+
+log = Logger(__name__)
+
+DEFAULT_PROFILE_NAME = 'all'
+
+
+@dataclass(frozen=True)
+class ScannerProfile:
+    """A set of ZBar scanner options.
+
+    Limiting the symbologies makes ZBar faster, because it doesn't need to look for
+    every kind of barcode in every frame.
+    """
+
+    name: str
+    # ZBar symbology names, like 'qrcode', 'ean13'. Empty means all symbologies are enabled.
+    symbologies: tuple[str, ...] = ()
+    # Scan every n-th line. Higher values are faster but can miss small codes.
+    x_density: int = 1
+    y_density: int = 1
+    # Other ZBar config strings, in the form accepted by zbarimg --set, e.g. 'qrcode.binary'.
+    extra_config: tuple[str, ...] = ()
+
+    @classmethod
+    def from_variant_value(cls, name: str, value: Sequence) -> Self:
+        """Build from an unpacked GSettings value of type (asiias)."""
+        symbologies, x_density, y_density, extra_config = value
+        return cls(name, tuple(symbologies), x_density, y_density, tuple(extra_config))
+
+    def to_config_strings(self) -> list[str]:
+        configs = []
+        if self.symbologies:
+            configs.append('disable')
+            configs.extend(f'{s}.enable' for s in self.symbologies)
+        configs.append(f'x-density={self.x_density}')
+        configs.append(f'y-density={self.y_density}')
+        configs.extend(self.extra_config)
+        return configs
+
+    def apply(self, scanner: zbar.ImageScanner):
+        for config in self.to_config_strings():
+            scanner.parse_config(config)
+
+    def check(self):
+        """Apply to a throwaway scanner. Raise ValueError if ZBar refuses one of the options."""
+        import zbar  # zuban: ignore[import-not-found]
+
+        self.apply(zbar.ImageScanner())
+
+
+def load_profiles(value: Mapping[str, Sequence]) -> dict[str, ScannerProfile]:
+    """Build profiles from the unpacked value of the "scanner-profiles" setting."""
+    return {name: ScannerProfile.from_variant_value(name, v) for name, v in value.items()}
+
+
+def pick_profile(profiles: Mapping[str, ScannerProfile], name: str) -> ScannerProfile:
+    if profile := profiles.get(name):
+        return profile
+    return profiles.get(DEFAULT_PROFILE_NAME) or ScannerProfile(DEFAULT_PROFILE_NAME)
+
+
+def pick_valid_profile(profiles: Mapping[str, ScannerProfile], name: str) -> ScannerProfile:
+    """Like pick_profile(), but fall back to the default profile if ZBar refuses the options of the picked one.
+
+    The profiles are editable by the user, a typo in the extra config would otherwise break every scan.
+    """
+    for profile in (pick_profile(profiles, name), pick_profile(profiles, DEFAULT_PROFILE_NAME)):
+        try:
+            profile.check()
+            return profile
+        except ValueError as e:
+            log.warning('Scanner profile {} is invalid, not using it: {}', profile.name, e)
+    return ScannerProfile(DEFAULT_PROFILE_NAME)
@@ -0,0 +1,78 @@
+from dataclasses import dataclass, field
+from typing import Self
+
+from gi.repository import Gio  # pyright: ignore[reportMissingModuleSource]
+from logbook import Logger
+
+from .consts import APP_ID
+from .scanner_profiles import DEFAULT_PROFILE_NAME, ScannerProfile, load_profiles, pick_valid_profile
+
+
+log = Logger(__name__)
+
+
+def get_settings() -> Gio.Settings | None:
+    """Return the application's GSettings, or None if the schema is not installed (e.g. running from source)."""
+    source = Gio.SettingsSchemaSource.get_default()
+    if not source or not source.lookup(APP_ID, True):
+        log.warning('GSettings schema {} is not installed, using default values', APP_ID)
+        return None
+    return Gio.Settings.new(APP_ID)
+
+
+# The default values here must match the ones in vn.hoabinh.quan.CoBang.gschema.xml.
+@dataclass
+class ScannerSettings:
+    decode_worker_count: int = 1
+    decode_queue_depth: int = 2
+    # 0 means automatic.
+    still_decode_process_count: int = 0
+    # MiB
+    still_decode_memory_limit: int = 512
+    decode_cache_size: int = 64
+    decode_cache_persistent: bool = False
+    decode_cache_disk_size: int = 1024
+    pyramid_levels: list[int] = field(default_factory=lambda: [640, 0])
+    pyramid_escalate_after: int = 10
+    decode_target_fps: float = 15.0
+    decode_cpu_budget: float = 50.0
+    change_gate_threshold: float = 2.0
+    change_gate_force_interval: float = 2.0
+    dedup_ttl: float = 5.0
+    dedup_capacity: int = 256
+    scanner_profile: ScannerProfile = field(default_factory=lambda: ScannerProfile(DEFAULT_PROFILE_NAME))
+    camera_target_width: int = 1280
+    camera_target_height: int = 720
+    camera_target_fps: float = 30.0
+
+    @classmethod
+    def load(cls, settings: Gio.Settings | None = None) -> Self:
+        if not (settings := settings or get_settings()):
+            return cls()
+        camera_target_width, camera_target_height = settings.get_value('camera-target-size').unpack()
+        return cls(
+            decode_worker_count=settings.get_int('decode-worker-count'),
+            decode_queue_depth=settings.get_int('decode-queue-depth'),
+            still_decode_process_count=settings.get_int('still-decode-process-count'),
+            still_decode_memory_limit=settings.get_int('still-decode-memory-limit'),
+            decode_cache_size=settings.get_int('decode-cache-size'),
+            decode_cache_persistent=settings.get_boolean('decode-cache-persistent'),
+            decode_cache_disk_size=settings.get_int('decode-cache-disk-size'),
+            pyramid_levels=list(settings.get_value('pyramid-levels').unpack()),
+            pyramid_escalate_after=settings.get_int('pyramid-escalate-after'),
+            decode_target_fps=settings.get_double('decode-target-fps'),
+            decode_cpu_budget=settings.get_double('decode-cpu-budget'),
+            change_gate_threshold=settings.get_double('change-gate-threshold'),
+            change_gate_force_interval=settings.get_double('change-gate-force-interval'),
+            dedup_ttl=settings.get_double('dedup-ttl'),
+            dedup_capacity=settings.get_int('dedup-capacity'),
+            scanner_profile=load_scanner_profile(settings),
+            camera_target_width=camera_target_width,
+            camera_target_height=camera_target_height,
+            camera_target_fps=settings.get_double('camera-target-fps'),
+        )
+
+
+def load_scanner_profile(settings: Gio.Settings) -> ScannerProfile:
+    profiles = load_profiles(settings.get_value('scanner-profiles').unpack())
+    return pick_valid_profile(profiles, settings.get_string('scanner-profile'))
@@ -0,0 +1,150 @@
+"""Preprocessing strategies for decoding still images.
+
+A photo can hold a code which ZBar misses as-is: too small, blurred, skewed, low-contrast or inverted.
+Each strategy transforms the grayscale image in one way, and knows how to map the found locations
+back to the original image. They are plain frozen dataclasses, so they can be sent to worker processes.
+"""
+
+from __future__ import annotations
+
+import math
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+
+from .preprocess import adaptive_threshold, adaptive_threshold_memory
+
+
+# Only upscale images whose longest side is at most this. Above that, codes are rarely too small for ZBar,
+# and the upscaled copy would be huge.
+UPSCALE_MAX_SIDE = 1600
+# Only downscale images whose longest side is at least this.
+DOWNSCALE_MIN_SIDE = 1200
+# Rough number of prepared-image-sized buffers alive while a strategy runs: the prepared image,
+# the bytes passed to ZBar and ZBar's own working copy.
+PREPARED_MEMORY_FACTOR = 3
+
+
+@dataclass(frozen=True)
+class DecodeStrategy:
+    """One way to prepare a grayscale image before giving it to ZBar.
+
+    The steps are applied in this order: scale, sharpen, threshold, rotate, invert.
+    """
+
+    name: str
+    scale: float = 1.0
+    sharpen: bool = False
+    threshold: bool = False
+    # Degrees, counter-clockwise.
+    rotation: int = 0
+    invert: bool = False
+    # The strategy is skipped for images whose longest side is out of this range. 0 means no limit.
+    min_side: int = 0
+    max_side: int = 0
+
+    def applies_to(self, width: int, height: int) -> bool:
+        side = max(width, height)
+        return side >= self.min_side and (not self.max_side or side <= self.max_side)
+
+    def get_scaled_size(self, width: int, height: int) -> tuple[int, int]:
+        if self.scale == 1:
+            return width, height
+        return max(1, round(width * self.scale)), max(1, round(height * self.scale))
+
+    def get_prepared_size(self, width: int, height: int) -> tuple[int, int]:
+        width, height = self.get_scaled_size(width, height)
+        if not self.rotation:
+            return width, height
+        rad = math.radians(self.rotation)
+        c, s = abs(math.cos(rad)), abs(math.sin(rad))
+        return math.ceil(width * c + height * s), math.ceil(width * s + height * c)
+
+    def estimate_memory(self, width: int, height: int) -> int:
+        """Rough peak memory (in bytes) of a worker running the strategy on a grayscale image of this size.
+
+        The worker's copy of the image is counted, not the shared one.
+        """
+        prepared_width, prepared_height = self.get_prepared_size(width, height)
+        memory = width * height + PREPARED_MEMORY_FACTOR * prepared_width * prepared_height
+        if self.threshold:
+            memory += adaptive_threshold_memory(*self.get_scaled_size(width, height))
+        return memory
+
+    def prepare(self, gray: Image.Image) -> Image.Image:
+        img = gray
+        if self.scale != 1:
+            # Upscaled codes need sharp module edges, downscaled ones need to be smoothed.
+            resample = Image.Resampling.NEAREST if self.scale > 1 else Image.Resampling.BOX
+            img = img.resize(self.get_scaled_size(img.width, img.height), resample)
+        if self.sharpen:
+            img = img.filter(ImageFilter.UnsharpMask(radius=2, percent=150, threshold=3))
+        if self.threshold:
+            img = Image.fromarray(adaptive_threshold(np.asarray(img)))
+        if self.rotation:
+            img = img.rotate(self.rotation, Image.Resampling.BILINEAR, expand=True, fillcolor=255)
+        if self.invert:
+            img = ImageOps.invert(img)
+        return img
+
+    def map_back(
+        self, point: tuple[int, int], prepared_size: tuple[int, int], original_size: tuple[int, int]
+    ) -> tuple[int, int]:
+        """Map a point in the prepared image back to the original image."""
+        x, y = point
+        if self.rotation:
+            x, y = unrotate_point(x, y, self.rotation, prepared_size, self.get_scaled_size(*original_size))
+        return round(x / self.scale), round(y / self.scale)
+
+
+def unrotate_point(
+    x: float, y: float, angle: float, rotated_size: tuple[int, int], source_size: tuple[int, int]
+) -> tuple[float, float]:
+    """Map a point of an image rotated with Image.rotate(angle, expand=True) back to the source image."""
+    rad = math.radians(angle)
+    c, s = math.cos(rad), math.sin(rad)
+    dx, dy = x - rotated_size[0] / 2, y - rotated_size[1] / 2
+    # Rotating counter-clockwise on screen, where y goes down, maps (dx, dy) to (dx c + dy s, -dx s + dy c).
+    # This is the reverse.
+    return dx * c - dy * s + source_size[0] / 2, dx * s + dy * c + source_size[1] / 2
+
+
+# Ordered from the cheapest and most likely to succeed to the more exotic ones,
+# because that's the order the workers pick them.
+DEFAULT_STRATEGIES: tuple[DecodeStrategy, ...] = (
+    DecodeStrategy('plain'),
+    DecodeStrategy('inverted', invert=True),
+    DecodeStrategy('adaptive-threshold', threshold=True),
+    DecodeStrategy('downscaled', scale=0.5, min_side=DOWNSCALE_MIN_SIDE),
+    DecodeStrategy('upscaled', scale=2, max_side=UPSCALE_MAX_SIDE),
+    DecodeStrategy('sharpened', sharpen=True),
+    DecodeStrategy('inverted-threshold', threshold=True, invert=True),
+    DecodeStrategy('rotated-15', rotation=15),
+    DecodeStrategy('rotated-minus-15', rotation=-15),
+    DecodeStrategy('rotated-45', rotation=45),
+)
+
+
+def pick_strategies(strategies: Sequence[DecodeStrategy], width: int, height: int) -> list[DecodeStrategy]:
+    return [s for s in strategies if s.applies_to(width, height)]
+
+
+def count_strategies_in_flight(
+    memory_limit: int, strategies: Sequence[DecodeStrategy], width: int, height: int, n_processes: int
+) -> int:
+    """How many strategies can run at the same time without going over the memory limit (in bytes).
+
+    The full image, shared with the workers, is counted once. Any strategy may be the next one to run, so the
+    most demanding ones are counted. We always allow one, otherwise we could not decode the image at all.
+    """
+    available = memory_limit - width * height
+    estimates = sorted((s.estimate_memory(width, height) for s in strategies), reverse=True)
+    n = 0
+    for estimate in estimates[:n_processes]:
+        available -= estimate
+        if available < 0:
+            break
+        n += 1
+    return max(1, n)
@@ -0,0 +1,31 @@
+from pathlib import Path
+
+from gi.repository import Gio, GLib
+
+from ..async_writer import ChunkedFileWriter
+
+
+def write(path: Path, chunks) -> GLib.Error | None:
+    loop = GLib.MainLoop()
+    errors = []
+
+    def on_done(file: Gio.File, error: GLib.Error | None):
+        errors.append(error)
+        loop.quit()
+
+    ChunkedFileWriter(Gio.File.new_for_path(str(path)), iter(chunks), on_done).start()
+    GLib.timeout_add(2000, loop.quit)
+    loop.run()
+    return errors[0]
+
+
+def test_write_chunks(tmp_path: Path):
+    path = tmp_path / 'out.svg'
+    path.write_bytes(b'old')
+    assert write(path, [b'<svg>', b'x' * 200_000, b'</svg>']) is None
+    assert path.read_bytes() == b'<svg>' + b'x' * 200_000 + b'</svg>'
+
+
+def test_error_is_reported(tmp_path: Path):
+    error = write(tmp_path / 'missing' / 'out.svg', [b'data'])
+    assert isinstance(error, GLib.Error)
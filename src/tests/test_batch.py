@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+from pathlib import Path
+
+from ..batch import BatchProgress, BatchResult, BatchStatus, iter_image_paths, write_csv, write_jsonl
+
+
+class FakeSymbol:
+    def __init__(self, type_name: str, data: str):
+        self.type_name = type_name
+        self.data = data
+
+
+def test_iter_image_paths_walks_folders_in_order(tmp_path: Path):
+    (tmp_path / 'b').mkdir()
+    (tmp_path / 'a').mkdir()
+    for name in ('b/2.png', 'b/1.JPG', 'a/x.webp', 'a/notes.txt', 'top.tiff'):
+        (tmp_path / name).touch()
+    extra = tmp_path / 'explicit.dat'
+    extra.touch()
+    found = list(iter_image_paths([tmp_path, extra]))
+    assert [p.relative_to(tmp_path).as_posix() for p in found] == [
+        'top.tiff',
+        'a/x.webp',
+        'b/1.JPG',
+        'b/2.png',
+        # Given explicitly, so it is tried even without an image extension.
+        'explicit.dat',
+    ]
+
+
+def make_results() -> list[BatchResult]:
+    return [
+        BatchResult('one.png', [FakeSymbol('QRCODE', 'hello'), FakeSymbol('EAN13', '123')], 'inverted', 0.0125),
+        BatchResult('two.png', elapsed=0.5),
+        BatchResult('bad.png', error='cannot identify image file'),
+    ]
+
+
+def test_status():
+    assert [r.status for r in make_results()] == [BatchStatus.FOUND, BatchStatus.NOT_FOUND, BatchStatus.ERROR]
+
+
+def test_write_csv():
+    out = io.StringIO()
+    write_csv(make_results(), out)
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert [(r['path'], r['status'], r['symbol_type'], r['data']) for r in rows] == [
+        ('one.png', 'found', 'QRCODE', 'hello'),
+        ('one.png', 'found', 'EAN13', '123'),
+        ('two.png', 'not-found', '', ''),
+        ('bad.png', 'error', '', ''),
+    ]
+    assert rows[0]['strategy'] == 'inverted'
+    assert rows[0]['elapsed_ms'] == '12.5'
+    assert rows[3]['error'] == 'cannot identify image file'
+
+
+def test_write_jsonl():
+    out = io.StringIO()
+    write_jsonl(make_results(), out)
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert len(rows) == 4
+    assert rows[1] == {
+        'path': 'one.png',
+        'status': 'found',
+        'frame': 0,
+        'symbol_type': 'EAN13',
+        'data': '123',
+        'strategy': 'inverted',
+        'elapsed_ms': 12.5,
+        'error': '',
+    }
+
+
+def test_progress():
+    progress = BatchProgress(total=4, started=100.0)
+    for r in make_results():
+        progress.record(r)
+    progress.finished = 102.0
+    assert (progress.done, progress.found, progress.failed) == (3, 1, 1)
+    assert progress.fraction == 0.75
+    assert progress.throughput == 1.5
@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+import pytest
+
+
+pytest.importorskip('zbar')
+qrcode = pytest.importorskip('qrcode')
+
+from PIL import ImageOps  # noqa: E402
+
+from ..batch import BatchResult, BatchStatus  # noqa: E402
+from ..batch_scanner import BatchScanner  # noqa: E402
+
+
+def test_folder_is_scanned(tmp_path: Path):
+    for i in range(6):
+        img = qrcode.make(f'code-{i}').get_image().convert('L')
+        if i % 2:
+            img = ImageOps.invert(img)
+        img.save(tmp_path / f'{i}.png')
+    (tmp_path / 'broken.png').write_bytes(b'not an image')
+    results: list[BatchResult] = []
+    done = threading.Event()
+    scanner = BatchScanner(results.append, done.set, n_processes=2)
+    try:
+        scanner.add([str(tmp_path)])
+        assert done.wait(60)
+    finally:
+        scanner.shutdown()
+    by_name = {Path(r.path).name: r for r in results}
+    assert len(by_name) == 7
+    assert by_name['broken.png'].status == BatchStatus.ERROR
+    assert by_name['3.png'].symbols[0].data == 'code-3'
+    assert by_name['3.png'].strategy == 'inverted'
+    assert scanner.progress.done == 7
+    assert scanner.progress.found == 6
+
+
+def test_failed_task_gets_a_row():
+    results: list[BatchResult] = []
+    scanner = BatchScanner(results.append)
+    scanner.n_running = 1
+    scanner.progress.total = 1
+    future: Future[BatchResult] = Future()
+    future.set_exception(RuntimeError('worker died'))
+    scanner.on_future_done('/tmp/huge.png', future)
+    assert [(r.path, r.error) for r in results] == [('/tmp/huge.png', 'worker died')]
+    assert results[0].status == BatchStatus.ERROR
+    assert scanner.progress.done == scanner.progress.total == 1
+    assert scanner.progress.failed == 1
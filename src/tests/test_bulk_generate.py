@@ -0,0 +1,85 @@
+import io
+import threading
+import zipfile
+from pathlib import Path
+
+import pytest
+
+
+pytest.importorskip('qrcode')
+
+from ..bulk_generate import (  # noqa: E402
+    MIN_PARALLEL_ITEMS,
+    BulkItem,
+    BulkOutput,
+    BulkProgress,
+    FolderOutput,
+    ZipOutput,
+    generate_codes,
+    read_bulk_items,
+)
+from ..qr_export import QRExportFormat, QRStyle  # noqa: E402
+
+
+def test_csv_with_header():
+    text = 'ID,URL,Owner\nA/1,https://example.com/1,me\n,https://example.com/2,you\nA/1,https://example.com/3,\n'
+    items = read_bulk_items(io.StringIO(text), is_csv=True)
+    assert items == [
+        BulkItem('A_1', 'https://example.com/1'),
+        BulkItem('qrcode-00002', 'https://example.com/2'),
+        # Made unique.
+        BulkItem('A_1-2', 'https://example.com/3'),
+    ]
+
+
+def test_csv_without_header():
+    items = read_bulk_items(io.StringIO('hello,first\n"a, b",\n\nlonely\n'), is_csv=True)
+    assert items == [BulkItem('first', 'hello'), BulkItem('qrcode-00002', 'a, b'), BulkItem('qrcode-00003', 'lonely')]
+
+
+def test_text_list_keeps_commas_and_skips_blank_lines():
+    items = read_bulk_items(io.StringIO('a, b\r\n\n  \nc\n'), is_csv=False)
+    assert [i.text for i in items] == ['a, b', 'c']
+    assert [i.name for i in items] == ['qrcode-00001', 'qrcode-00002']
+
+
+def test_generate_into_folder(tmp_path: Path):
+    items = [BulkItem('one', 'first'), BulkItem('too-long', 'x' * 5000), BulkItem('two', 'second')]
+    seen = []
+    progress = generate_codes(
+        items, QRStyle(box_size=2), QRExportFormat.PNG, FolderOutput(tmp_path), 1, on_result=seen.append
+    )
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['one.png', 'two.png']
+    assert [r.item.name for r in seen] == ['one', 'too-long', 'two']
+    assert seen[1].error
+    assert (progress.total, progress.done, progress.failed) == (3, 3, 1)
+    assert progress.bytes_written == sum(p.stat().st_size for p in tmp_path.iterdir())
+
+
+def test_generate_zip_stream_in_processes():
+    items = [BulkItem(f'code-{i}', f'text {i}') for i in range(MIN_PARALLEL_ITEMS)]
+    buf = io.BytesIO()
+    progress = generate_codes(items, QRStyle(), QRExportFormat.SVG, ZipOutput(buf), 2)
+    assert progress.done == MIN_PARALLEL_ITEMS
+    with zipfile.ZipFile(buf) as zf:
+        names = zf.namelist()
+        assert names == [f'code-{i}.svg' for i in range(MIN_PARALLEL_ITEMS)]
+        assert zf.read(names[0]).startswith(b'<?xml')
+
+
+def test_stop(tmp_path: Path):
+    stop = threading.Event()
+    stop.set()
+    progress = BulkProgress()
+    generate_codes([BulkItem('a', 'a')], QRStyle(), QRExportFormat.PNG, FolderOutput(tmp_path), 1, progress, stop=stop)
+    assert progress.done == 0
+    assert progress.finished is not None
+
+
+def test_output_must_implement_write_and_close():
+    class Incomplete(BulkOutput):
+        def write(self, file_name: str, data: bytes):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
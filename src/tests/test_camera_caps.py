@@ -0,0 +1,71 @@
+from fractions import Fraction
+
+from ..camera_caps import (
+    CapsCandidate,
+    build_caps_filter_desc,
+    build_caps_ladder,
+    build_generic_caps_ladder,
+    parse_caps_string,
+)
+
+
+# Shaped like Gst.Caps.to_string() of a typical UVC webcam.
+V4L2_CAPS = (
+    'video/x-raw, format=(string)YUY2, width=(int)640, height=(int)480, framerate=(fraction){ 30/1, 15/1 }; '
+    'video/x-raw, format=(string)YUY2, width=(int)1280, height=(int)720, framerate=(fraction)10/1; '
+    'video/x-raw, format=(string)YUY2, width=(int)1920, height=(int)1080, framerate=(fraction)5/1; '
+    'image/jpeg, width=(int)1280, height=(int)720, framerate=(fraction){ 60/1, 30/1 }; '
+    'image/jpeg, width=(int)3840, height=(int)2160, framerate=(fraction)30/1'
+)
+PIPEWIRE_CAPS = (
+    'video/x-raw(memory:DMABuf), format=(string)NV12, width=(int)[ 1, 8192 ], height=(int)[ 1, 8192 ]; '
+    'video/x-raw, format=(string){ NV12, YUY2 }, width=(int)[ 1, 1920 ], height=(int)[ 1, 1080 ], '
+    'framerate=(fraction)[ 0/1, 60/1 ]'
+)
+
+
+def test_parse_lists_and_fixed_values():
+    candidates = parse_caps_string(V4L2_CAPS, 1280, 720, 30)
+    assert CapsCandidate('video/x-raw', 'YUY2', 640, 480, Fraction(30)) in candidates
+    assert CapsCandidate('image/jpeg', '', 3840, 2160, Fraction(30)) in candidates
+    assert len(candidates) == 5
+
+
+def test_prefer_cheapest_jpeg_meeting_target_when_raw_is_too_slow():
+    ladder = build_caps_ladder(V4L2_CAPS, 1280, 720, 30)
+    assert ladder[0] == CapsCandidate('image/jpeg', '', 1280, 720, Fraction(30))
+    assert ladder[1] == CapsCandidate('image/jpeg', '', 3840, 2160, Fraction(30))
+    assert ladder[-1] is None
+
+
+def test_prefer_raw_meeting_target():
+    ladder = build_caps_ladder(V4L2_CAPS, 640, 480, 30)
+    assert ladder[0] == CapsCandidate('video/x-raw', 'YUY2', 640, 480, Fraction(30))
+
+
+def test_fall_back_below_target():
+    ladder = build_caps_ladder(V4L2_CAPS, 4000, 3000, 30)
+    # Nothing meets the target. Formats with enough framerate come first, the biggest first.
+    assert ladder[0] == CapsCandidate('image/jpeg', '', 3840, 2160, Fraction(30))
+    assert ladder[-2].framerate < 30
+    assert ladder[-1] is None
+
+
+def test_ranges_are_clamped_to_target():
+    ladder = build_caps_ladder(PIPEWIRE_CAPS, 1280, 720, 30)
+    # DMABuf caps are skipped, NV12 is cheaper to convert than YUY2.
+    assert ladder[0] == CapsCandidate('video/x-raw', 'NV12', 1280, 720, Fraction(30))
+    assert ladder[1] == CapsCandidate('video/x-raw', 'YUY2', 1280, 720, Fraction(30))
+
+
+def test_empty_caps():
+    assert build_caps_ladder('', 1280, 720, 30) == [None]
+    assert build_generic_caps_ladder(1280, 720, 30)[-1] is None
+
+
+def test_filter_desc():
+    assert build_caps_filter_desc(None) == ''
+    raw = CapsCandidate('video/x-raw', 'NV12', 1280, 720, Fraction(30))
+    assert build_caps_filter_desc(raw) == ' ! video/x-raw,format=NV12,width=1280,height=720,framerate=30/1'
+    jpeg = CapsCandidate('image/jpeg', '', 1280, 720, Fraction(30))
+    assert build_caps_filter_desc(jpeg).endswith(' ! jpegdec')
@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+
+
+pytest.importorskip('zbar')
+qrcode = pytest.importorskip('qrcode')
+
+from PIL import Image, ImageOps  # noqa: E402
+
+from ..cascade import StillImageDecoder  # noqa: E402
+from ..decoding import DecodedSymbol  # noqa: E402
+from ..strategies import DecodeStrategy  # noqa: E402
+from ..tiling import merge_symbols  # noqa: E402
+
+
+def make_qr_image() -> Image.Image:
+    return qrcode.make('https://quan.hoabinh.vn').get_image().convert('L')
+
+
+def test_plain_image_is_won_by_first_strategy():
+    decoder = StillImageDecoder(n_processes=2)
+    try:
+        report = decoder.decode(make_qr_image())
+    finally:
+        decoder.shutdown()
+    assert report.winner == 'plain'
+    assert report.symbols[0].data == 'https://quan.hoabinh.vn'
+
+
+def test_inverted_image_needs_inversion():
+    strategies = (DecodeStrategy('plain'), DecodeStrategy('inverted', invert=True))
+    decoder = StillImageDecoder(strategies, n_processes=2)
+    try:
+        report = decoder.decode(ImageOps.invert(make_qr_image()))
+    finally:
+        decoder.shutdown()
+    assert report.winner == 'inverted'
+    assert {o.name for o in report.outcomes} == {'plain', 'inverted'}
+    assert report.job_id == decoder.last_job_id
+
+
+class FailingStrategy(DecodeStrategy):
+    def prepare(self, gray: Image.Image) -> Image.Image:
+        raise MemoryError('killed')
+
+
+def test_failed_strategy_is_reported():
+    decoder = StillImageDecoder((DecodeStrategy('plain'), FailingStrategy('failing')), n_processes=2)
+    try:
+        report = decoder.decode(Image.new('L', (200, 200), 255))
+    finally:
+        decoder.shutdown()
+    assert not report.symbols
+    # So that the scanner page doesn't cache it as "no code".
+    assert report.failed
+
+
+def test_large_image_is_decoded_in_tiles():
+    img = Image.new('L', (6000, 4000), 255)
+    qr = make_qr_image()
+    img.paste(qr, (4500, 3000))
+    decoder = StillImageDecoder(n_processes=2, tile_size=1024)
+    try:
+        report = decoder.decode(img)
+    finally:
+        decoder.shutdown()
+    assert report.winner == 'tiled'
+    assert [s.data for s in report.symbols] == ['https://quan.hoabinh.vn']
+    left, top = min(report.symbols[0].location)
+    assert left >= 4500 and top >= 3000
+
+
+def test_merge_symbols_by_location():
+    a = DecodedSymbol('QRCODE', 'x', 1, ((10, 10), (10, 50), (50, 50), (50, 10)))
+    # Same code found in an overlapping tile, at coarser factor.
+    b = DecodedSymbol('QRCODE', 'x', 2, ((12, 12), (12, 52), (52, 52), (52, 12)))
+    # Another copy of the same content elsewhere.
+    c = DecodedSymbol('QRCODE', 'x', 1, ((500, 500), (500, 540), (540, 540), (540, 500)))
+    assert merge_symbols([a, b, c]) == [b, c]
+
+
+def test_frames_stop_at_first_hit():
+    blank = Image.new('L', (300, 300), 255)
+    read: list[int] = []
+
+    def iter_frames():
+        for i, img in enumerate((blank, blank, make_qr_image(), make_qr_image())):
+            read.append(i)
+            yield img
+
+    decoder = StillImageDecoder(strategies=(DecodeStrategy('plain'),), n_processes=2)
+    done = threading.Event()
+    reports = []
+    try:
+        decoder.submit_frames(iter_frames(), lambda r: (reports.append(r), done.set()))
+        assert done.wait(30)
+    finally:
+        decoder.shutdown()
+    report = reports[0]
+    assert report.symbols[0].data == 'https://quan.hoabinh.vn'
+    assert (report.frame, report.n_frames) == (2, 3)
+    # The last frame is never read.
+    assert read == [0, 1, 2]
+    assert report.job_id == decoder.last_job_id
+
+
+def test_frames_are_reported_after_unexpected_error():
+    def iter_frames():
+        yield Image.new('L', (300, 300), 255)
+        raise SyntaxError('broken frame')
+
+    decoder = StillImageDecoder(strategies=(DecodeStrategy('plain'),), n_processes=1)
+    done = threading.Event()
+    reports = []
+    try:
+        decoder.submit_frames(iter_frames(), lambda r: (reports.append(r), done.set()))
+        assert done.wait(30)
+    finally:
+        decoder.shutdown()
+    assert reports[0].n_frames == 1
+    assert reports[0].failed
@@ -0,0 +1,45 @@
+from dataclasses import dataclass
+
+from PIL import Image
+
+from ..change_gate import ChangeGate
+
+
+@dataclass
+class Frame:
+    width: int
+    height: int
+    data: bytes
+
+    def to_image(self) -> Image.Image:
+        return Image.frombytes('L', (self.width, self.height), self.data)
+
+
+def make_frame(color: int) -> Frame:
+    img = Image.new('L', (320, 240), color)
+    img.paste(255 - color, (100, 80, 200, 160))
+    return Frame(img.width, img.height, img.tobytes())
+
+
+def test_skip_unchanged_frames():
+    gate = ChangeGate(threshold=2, force_interval=10)
+    assert gate.should_scan(make_frame(100), now=0)
+    assert not gate.should_scan(make_frame(100), now=0.1)
+    assert not gate.should_scan(make_frame(101), now=0.2)
+    assert gate.should_scan(make_frame(30), now=0.3)
+    assert gate.frames_checked == 4
+    assert gate.frames_skipped == 2
+    assert gate.skip_rate == 0.5
+
+
+def test_forced_rescan():
+    gate = ChangeGate(threshold=2, force_interval=1)
+    assert gate.should_scan(make_frame(100), now=0)
+    assert not gate.should_scan(make_frame(100), now=0.5)
+    assert gate.should_scan(make_frame(100), now=1.5)
+
+
+def test_disabled_gate():
+    gate = ChangeGate(threshold=0)
+    assert gate.should_scan(make_frame(100), now=0)
+    assert gate.should_scan(make_frame(100), now=0.1)
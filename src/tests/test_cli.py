@@ -0,0 +1,55 @@
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+pytest.importorskip('zbar')
+qrcode = pytest.importorskip('qrcode')
+
+from ..cli import decode_paths, main, write_results  # noqa: E402
+
+
+def make_files(folder: Path) -> list[Path]:
+    paths = []
+    for i in range(3):
+        path = folder / f'{i}.png'
+        qrcode.make(f'code-{i}').save(path)
+        paths.append(path)
+    (folder / 'empty.png').write_bytes(b'')
+    return paths
+
+
+def test_results_keep_file_order(tmp_path: Path):
+    make_files(tmp_path)
+    out = io.StringIO()
+    code = write_results(decode_paths([str(tmp_path)], n_processes=2), out)
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [Path(r['path']).name for r in rows] == ['0.png', '1.png', '2.png', 'empty.png']
+    assert [r['symbols'][0]['data'] for r in rows[:3]] == ['code-0', 'code-1', 'code-2']
+    assert rows[3]['status'] == 'error'
+    assert code == 1
+
+
+def test_single_file(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    path = make_files(tmp_path)[1]
+    assert main([str(path)]) == 0
+    row = json.loads(capsys.readouterr().out)
+    assert row['symbols'][0]['type'] == 'QRCODE'
+
+
+def test_gtk_is_not_imported(tmp_path: Path):
+    path = make_files(tmp_path)[0]
+    package = Path(__file__).parent.parent
+    script = (
+        'import sys\n'
+        f'sys.path.insert(0, {str(package.parent)!r})\n'
+        f'from {package.name} import cli\n'
+        f'code = cli.main([{str(path)!r}])\n'
+        "assert not [m for m in sys.modules if m.startswith('gi')], 'gi is imported'\n"
+        'sys.exit(code)\n'
+    )
+    subprocess.run([sys.executable, '-c', script], check=True, capture_output=True)
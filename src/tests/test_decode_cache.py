@@ -0,0 +1,62 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from ..decode_cache import DecodeCache, get_image_key
+from ..scanner_profiles import ScannerProfile
+
+
+def make_symbol(data: str):
+    return SimpleNamespace(type_name='QRCODE', data=data, quality=1, location=((1, 2), (3, 4)))
+
+
+def test_key_depends_on_pixels_size_and_profile():
+    img = Image.new('L', (8, 4), 255)
+    same = Image.new('L', (8, 4), 255)
+    other = img.copy()
+    other.putpixel((7, 3), 0)
+    assert get_image_key(img) == get_image_key(same)
+    assert get_image_key(img) != get_image_key(other)
+    # Same bytes, different shape.
+    assert get_image_key(img) != get_image_key(Image.new('L', (4, 8), 255))
+    assert get_image_key(img) != get_image_key(img, ScannerProfile('qr', ('qrcode',)))
+
+
+def test_lru_eviction_and_counters():
+    cache = DecodeCache(capacity=2)
+    cache.put('a', [make_symbol('A')])
+    cache.put('b', [])
+    assert cache.get('a')[0].data == 'A'
+    cache.put('c', [make_symbol('C')])
+    # "b" is the least recently used.
+    assert cache.get('b') is None
+    assert cache.get('c')[0].data == 'C'
+    assert (cache.hits, cache.misses, len(cache)) == (2, 1, 2)
+
+
+def test_empty_result_is_a_hit():
+    cache = DecodeCache()
+    cache.put('a', [])
+    assert cache.get('a') == []
+    assert cache.hits == 1
+
+
+def test_zero_capacity_disables():
+    cache = DecodeCache(capacity=0)
+    cache.put('a', [make_symbol('A')])
+    assert cache.get('a') is None
+
+
+def test_persistence_and_disk_eviction(tmp_path: Path):
+    pytest.importorskip('zbar')
+    cache = DecodeCache(capacity=1, folder=tmp_path, disk_capacity=2)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, [make_symbol(key.upper())])
+    assert sorted(p.stem for p in tmp_path.iterdir()) == ['b', 'c']
+    restarted = DecodeCache(capacity=1, folder=tmp_path, disk_capacity=2)
+    symbols = restarted.get('b')
+    assert symbols
+    assert (symbols[0].data, symbols[0].location) == ('B', ((1, 2), (3, 4)))
+    assert restarted.get('a') is None
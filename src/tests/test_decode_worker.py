@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+
+pytest.importorskip('zbar')
+pytest.importorskip('gi.repository.Gst', exc_type=ImportError)
+
+from gi.repository import Gst  # noqa: E402
+
+from ..decode_worker import DecodeWorkerPool, WebcamFrame  # noqa: E402
+from ..governor import DecodeRateGovernor  # noqa: E402
+
+
+def test_queue_drops_oldest_frame():
+    pool = DecodeWorkerPool(lambda symbols: False, n_workers=1, queue_depth=2)
+    for i in range(5):
+        pool.submit(WebcamFrame(sample=i))
+    assert pool.frames_submitted == 5
+    assert pool.frames_dropped == 3
+    assert [f.sample for f in pool.queue] == [3, 4]
+
+
+def test_flush_counts_as_dropped():
+    pool = DecodeWorkerPool(lambda symbols: False, n_workers=1, queue_depth=4)
+    pool.submit(WebcamFrame(sample=0))
+    pool.submit(WebcamFrame(sample=1))
+    pool.flush()
+    assert pool.frames_dropped == 2
+    assert not pool.queue
+
+
+def test_lossless_queue_waits_for_room():
+    pool = DecodeWorkerPool(lambda symbols: False, n_workers=1, queue_depth=1, lossless=True)
+    pool.submit(WebcamFrame(sample=0))
+    submitter = threading.Thread(target=pool.submit, args=(WebcamFrame(sample=1),))
+    submitter.start()
+    submitter.join(0.1)
+    assert submitter.is_alive()
+    # What a worker does when it takes a frame.
+    with pool.cond:
+        pool.queue.popleft()
+        pool.cond.notify_all()
+    submitter.join(1)
+    assert not submitter.is_alive()
+    assert pool.frames_dropped == 0
+    assert [f.sample for f in pool.queue] == [1]
+
+
+class ClosedGate:
+    frames_skipped = 0
+
+    def should_scan(self, frame) -> bool:
+        self.frames_skipped += 1
+        return False
+
+
+def test_gated_frames_are_not_fed_to_governor():
+    Gst.init(None)
+    buffer = Gst.Buffer.new_wrapped(bytes(64 * 48))
+    caps = Gst.Caps.from_string('video/x-raw,format=GRAY8,width=64,height=48')
+    governor = DecodeRateGovernor()
+    gate = ClosedGate()
+    pool = DecodeWorkerPool(lambda symbols: False, n_workers=1, governor=governor, change_gate=gate, lossless=True)
+    pool.start()
+    for _i in range(3):
+        pool.submit(WebcamFrame(sample=Gst.Sample.new(buffer, caps, None, None)))
+    pool.drain()
+    assert gate.frames_skipped == 3
+    assert governor.avg_cost == 0
+    assert pool.frames_decoded == 0
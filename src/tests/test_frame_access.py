@@ -0,0 +1,75 @@
+import pytest
+
+
+Gst = pytest.importorskip('gi.repository.Gst', exc_type=ImportError)
+
+from ..frame_access import mapped_sample  # noqa: E402
+
+
+GstApp = pytest.importorskip('gi.repository.GstApp', exc_type=ImportError)
+
+
+WIDTH, HEIGHT = 1920, 1080
+
+
+def make_gray_sample() -> Gst.Sample:
+    buffer = Gst.Buffer.new_wrapped(bytes(WIDTH * HEIGHT))
+    caps = Gst.Caps.from_string(f'video/x-raw,format=GRAY8,width={WIDTH},height={HEIGHT}')
+    return Gst.Sample.new(buffer, caps, None, None)
+
+
+def pull_test_sample(width: int, height: int) -> Gst.Sample:
+    pipeline = Gst.parse_launch(
+        f'videotestsrc num-buffers=1 pattern=smpte ! video/x-raw,format=GRAY8,width={width},height={height} ! '
+        'appsink name=sink'
+    )
+    sink = pipeline.get_by_name('sink')
+    pipeline.set_state(Gst.State.PLAYING)
+    try:
+        return sink.pull_sample()
+    finally:
+        pipeline.set_state(Gst.State.NULL)
+
+
+def get_rss_kb() -> int:
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * 4
+
+
+def test_mapped_sample_exposes_frame():
+    Gst.init(None)
+    with mapped_sample(make_gray_sample()) as frame:
+        assert frame
+        assert (frame.width, frame.height) == (WIDTH, HEIGHT)
+        assert len(frame.data) == WIDTH * HEIGHT
+
+
+def test_odd_width_frame_is_not_sheared():
+    # GStreamer pads GRAY8 rows to a multiple of 4 bytes, 321 pixels take 324 bytes.
+    Gst.init(None)
+    with mapped_sample(pull_test_sample(321, 12)) as frame:
+        assert frame
+        assert (frame.width, frame.height, frame.row_stride) == (321, 12, 324)
+        image = frame.to_image()
+        assert image.size == (321, 12)
+        packed = frame.packed_data()
+        assert image.tobytes() == packed
+    assert len(packed) == 321 * 12
+    # The top part of the SMPTE pattern is vertical bars, so its rows are the same.
+    rows = [packed[y * 321 : (y + 1) * 321] for y in range(6)]
+    assert all(r == rows[0] for r in rows)
+
+
+def test_rss_stays_flat_over_many_frames():
+    # Map and unmap a 1080p frame many times. If the buffers were leaked (not unmapped, or copied
+    # and kept around), RSS would grow by ~2MB per frame.
+    Gst.init(None)
+    for _i in range(100):
+        with mapped_sample(make_gray_sample()) as frame:
+            assert frame
+    baseline = get_rss_kb()
+    for _i in range(3000):
+        with mapped_sample(make_gray_sample()) as frame:
+            assert frame
+    assert get_rss_kb() - baseline < 20 * 1024
@@ -0,0 +1,59 @@
+import io
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from ..frames import is_pdf, iter_file_frames, load_poppler, open_next_frames
+
+
+def make_frames(n: int) -> list[Image.Image]:
+    return [Image.new('RGB', (40, 30), (i * 40, i * 40, i * 40)) for i in range(n)]
+
+
+def save_tiff(frames: list[Image.Image]) -> bytes:
+    out = io.BytesIO()
+    frames[0].save(out, 'TIFF', save_all=True, append_images=frames[1:])
+    return out.getvalue()
+
+
+def test_file_frames_are_gray_and_in_order(tmp_path: Path):
+    path = tmp_path / 'scan.tiff'
+    path.write_bytes(save_tiff(make_frames(4)))
+    frames = iter_file_frames(str(path))
+    first = next(frames)
+    assert (first.mode, first.size) == ('L', (40, 30))
+    assert [first.getpixel((0, 0))] + [f.getpixel((0, 0)) for f in frames] == [0, 40, 80, 120]
+
+
+def test_next_frames_skip_the_first():
+    frames = open_next_frames(save_tiff(make_frames(3)))
+    assert frames is not None
+    assert [f.getpixel((0, 0)) for f in frames] == [40, 80]
+
+
+def test_single_frame_has_no_next_frames():
+    out = io.BytesIO()
+    make_frames(1)[0].save(out, 'PNG')
+    assert open_next_frames(out.getvalue()) is None
+    # Not something Pillow can read.
+    assert open_next_frames(b'<svg xmlns="http://www.w3.org/2000/svg"/>') is None
+
+
+def test_animated_gif(tmp_path: Path):
+    path = tmp_path / 'anim.gif'
+    frames = make_frames(3)
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=100)
+    assert len(list(iter_file_frames(str(path)))) == 3
+
+
+def test_pdf_pages(tmp_path: Path):
+    if not load_poppler():
+        pytest.skip('Poppler is not available')
+    path = tmp_path / 'doc.pdf'
+    frames = make_frames(2)
+    frames[0].save(path, save_all=True, append_images=frames[1:], resolution=72)
+    assert is_pdf(path.read_bytes())
+    pages = list(iter_file_frames(str(path)))
+    assert len(pages) == 2
+    assert pages[1].mode == 'L'
@@ -0,0 +1,40 @@
+import zipfile
+from pathlib import Path
+
+import pytest
+
+
+pytest.importorskip('qrcode')
+
+from ..generate_cli import main  # noqa: E402
+
+
+def test_csv_to_zip(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    source = tmp_path / 'tags.csv'
+    source.write_text('name,text\nfirst,hello\nsecond,world\n')
+    output = tmp_path / 'codes.zip'
+    assert main([str(source), '-o', str(output), '-f', 'svg', '--foreground', '#1c71d8', '-j', '1']) == 0
+    with zipfile.ZipFile(output) as zf:
+        assert zf.namelist() == ['first.svg', 'second.svg']
+        assert b'fill="#1c71d8"' in zf.read('first.svg')
+    assert '2 of 2 codes done, 0 errors' in capsys.readouterr().err
+
+
+def test_text_list_to_folder_with_error(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    source = tmp_path / 'list.txt'
+    source.write_text('a,b\n' + 'x' * 5000 + '\n')
+    output = tmp_path / 'out'
+    assert main([str(source), '-o', str(output), '-s', '4', '-b', '1', '-e', 'H']) == 1
+    assert [p.name for p in output.iterdir()] == ['qrcode-00001.png']
+    assert 'qrcode-00002: Too much data for a QR code' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('option', [['--foreground', 'blurple'], ['-s', '0'], ['-b', '-1']])
+def test_invalid_style_is_refused(tmp_path: Path, option: list[str]):
+    source = tmp_path / 'list.txt'
+    source.write_text('a\n')
+    output = tmp_path / 'out'
+    with pytest.raises(SystemExit) as exc_info:
+        main([str(source), '-o', str(output), *option])
+    assert exc_info.value.code == 2
+    assert not output.exists()
@@ -0,0 +1,27 @@
+from ..governor import DecodeRateGovernor
+
+
+def test_limit_by_target_fps():
+    governor = DecodeRateGovernor(target_fps=10, cpu_budget=0)
+    passed = [governor.should_decode(now=t / 100) for t in range(100, 200)]
+    # 1 second of 100fps camera, 10 frames should pass.
+    assert sum(passed) == 10
+
+
+def test_limit_by_cpu_budget():
+    governor = DecodeRateGovernor(target_fps=0, cpu_budget=50)
+    governor.record_decode(0.1, evidence=False, now=0)
+    # Each decode costs 100ms of CPU, half a core allows one every 200ms.
+    assert governor.interval == 0.2
+    passed = [governor.should_decode(now=1 + t / 100) for t in range(100)]
+    assert sum(passed) == 5
+
+
+def test_boost_on_evidence():
+    governor = DecodeRateGovernor(target_fps=1, cpu_budget=0, boost_seconds=2)
+    governor.record_decode(0.01, evidence=True, now=10)
+    passed = [governor.should_decode(now=10 + t / 100) for t in range(100)]
+    assert all(passed)
+    # After the boost ends, the rate goes back to 1fps.
+    passed = [governor.should_decode(now=13 + t / 100) for t in range(100)]
+    assert sum(passed) == 1
@@ -0,0 +1,112 @@
+import io
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+
+gi = pytest.importorskip('gi')
+gi.require_version('Gio', '2.0')
+from gi.repository import Gio, GLib  # noqa: E402
+
+from ..ingest import ImageIngest, IngestStage  # noqa: E402
+
+
+def make_png_bytes(color: int) -> bytes:
+    # Noise, so that the file doesn't compress to a few bytes.
+    img = Image.frombytes('L', (64, 48), os.urandom(64 * 48))
+    img.putpixel((0, 0), color)
+    out = io.BytesIO()
+    img.save(out, 'PNG')
+    return out.getvalue()
+
+
+def serve_slowly(path: Path, data: bytes, chunk_size: int = 64, delay: float = 0.002):
+    """Stand-in for a slow remote file: a named pipe which is fed a few bytes at a time."""
+    os.mkfifo(path)
+
+    def write():
+        try:
+            with path.open('wb') as f:
+                for i in range(0, len(data), chunk_size):
+                    f.write(data[i : i + chunk_size])
+                    f.flush()
+                    time.sleep(delay)
+        except BrokenPipeError:
+            # The reader has given up.
+            pass
+
+    threading.Thread(target=write, daemon=True).start()
+
+
+def decode_with_pil(data: GLib.Bytes) -> Image.Image:
+    img = Image.open(io.BytesIO(data.get_data()))
+    img.load()
+    return img
+
+
+class Recorder:
+    def __init__(self):
+        self.loop = GLib.MainLoop()
+        self.stages: list[IngestStage] = []
+        self.loaded: list[Image.Image] = []
+        self.errors: list[str] = []
+        self.ingest = ImageIngest(decode_with_pil, self.on_loaded, self.on_failed, self.stages.append)
+
+    def on_loaded(self, img: Image.Image):
+        self.loaded.append(img)
+        self.loop.quit()
+
+    def on_failed(self, message: str):
+        self.errors.append(message)
+        self.loop.quit()
+
+    def run(self, timeout: float = 5):
+        source = GLib.timeout_add(int(timeout * 1000), self.loop.quit)
+        self.loop.run()
+        GLib.source_remove(source)
+
+
+def test_slow_file_is_loaded_without_blocking(tmp_path: Path):
+    recorder = Recorder()
+    serve_slowly(tmp_path / 'slow.png', make_png_bytes(0))
+    ticks = []
+    # The main loop must keep running while the file trickles in.
+    GLib.timeout_add(5, lambda: ticks.append(1) or recorder.ingest.is_busy)
+    recorder.ingest.load(Gio.File.new_for_path(str(tmp_path / 'slow.png')), 'image/png')
+    recorder.run()
+    assert [img.getpixel((0, 0)) for img in recorder.loaded] == [0]
+    assert recorder.stages == [IngestStage.READING, IngestStage.DECODING, IngestStage.DONE]
+    assert len(ticks) > 3
+
+
+def test_newer_image_cancels_older(tmp_path: Path):
+    recorder = Recorder()
+    serve_slowly(tmp_path / 'slow.png', make_png_bytes(0), delay=0.01)
+    fast = tmp_path / 'fast.png'
+    fast.write_bytes(make_png_bytes(255))
+    recorder.ingest.load(Gio.File.new_for_path(str(tmp_path / 'slow.png')), 'image/png')
+    recorder.ingest.load(Gio.File.new_for_path(str(fast)))
+    recorder.run()
+    assert [img.getpixel((0, 0)) for img in recorder.loaded] == [255]
+    assert IngestStage.QUERYING in recorder.stages
+    # Give the cancelled one a chance to come back, it must not.
+    context = GLib.MainContext.default()
+    deadline = time.monotonic() + 0.3
+    while time.monotonic() < deadline:
+        context.iteration(False)
+    assert len(recorder.loaded) == 1
+    assert not recorder.errors
+
+
+def test_not_an_image_is_rejected(tmp_path: Path):
+    recorder = Recorder()
+    text = tmp_path / 'note.txt'
+    text.write_text('Hello')
+    recorder.ingest.load(Gio.File.new_for_path(str(text)))
+    recorder.run()
+    assert not recorder.loaded
+    assert recorder.errors
@@ -0,0 +1,29 @@
+import json
+
+from ..metrics import FIRST_DECODE, FIRST_FRAME, StartupMetrics
+
+
+def test_mark_only_first_time():
+    metrics = StartupMetrics(started_at=0)
+    metrics.mark(FIRST_FRAME)
+    first = metrics.marks[FIRST_FRAME]
+    metrics.mark(FIRST_FRAME)
+    assert metrics.marks[FIRST_FRAME] == first
+
+
+def test_save_appends_json_lines(tmp_path):
+    path = tmp_path / 'cobang' / 'startup-metrics.jsonl'
+    metrics = StartupMetrics()
+    metrics.mark(FIRST_FRAME)
+    metrics.mark(FIRST_DECODE)
+    metrics.save('1.0', path)
+    metrics.save('1.1', path)
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r['version'] for r in records] == ['1.0', '1.1']
+    assert set(records[0]['marks']) == {FIRST_FRAME, FIRST_DECODE}
+
+
+def test_nothing_to_save(tmp_path):
+    path = tmp_path / 'startup-metrics.jsonl'
+    StartupMetrics().save('1.0', path)
+    assert not path.exists()
@@ -0,0 +1,33 @@
+import pytest
+
+
+gi = pytest.importorskip('gi')
+try:
+    gi.require_version('Gdk', '4.0')
+    gi.require_version('Gst', '1.0')
+except ValueError:
+    pytest.skip('GTK 4 is not available', allow_module_level=True)
+
+from gi.repository import Gdk, GLib  # noqa: E402
+
+from ..prep import texture_to_grayscale  # noqa: E402
+
+
+def make_texture(pixels: bytes, fmt: Gdk.MemoryFormat, channels: int) -> Gdk.Texture:
+    width = len(pixels) // channels
+    return Gdk.MemoryTexture.new(width, 1, fmt, GLib.Bytes.new(pixels), width * channels)
+
+
+def test_opaque_texture():
+    texture = make_texture(bytes((0, 0, 0, 255, 255, 255)), Gdk.MemoryFormat.R8G8B8, 3)
+    assert list(texture_to_grayscale(texture).getdata()) == [0, 255]
+
+
+def test_transparency_becomes_white():
+    # Opaque black, fully transparent black, half transparent black.
+    pixels = bytes((0, 0, 0, 255, 0, 0, 0, 0, 0, 0, 0, 128))
+    texture = make_texture(pixels, Gdk.MemoryFormat.R8G8B8A8, 4)
+    black, transparent, half = texture_to_grayscale(texture).getdata()
+    assert black == 0
+    assert transparent == 255
+    assert 125 <= half <= 129
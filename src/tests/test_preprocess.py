@@ -0,0 +1,76 @@
+import numpy as np
+from PIL import Image
+
+from ..preprocess import (
+    count_polar,
+    flatten_premultiplied_gray,
+    flatten_to_gray,
+    invert,
+    is_almost_black_white,
+    is_gray_almost_black_white,
+    is_histogram_almost_black_white,
+    to_color_array,
+)
+
+
+def make_random_rgba(width: int = 64, height: int = 48) -> Image.Image:
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 256, (height, width, 4), dtype=np.uint8), 'RGBA')
+
+
+def test_flatten_matches_pil_compositing():
+    img = make_random_rgba()
+    # What prep.make_grayscale used to do.
+    la = img.convert('LA')
+    canvas = Image.new('LA', img.size, (255, 255))
+    canvas.paste(la, mask=la)
+    expected = np.asarray(canvas.convert('L')).astype(int)
+    gray = flatten_to_gray(to_color_array(img))
+    assert gray.shape == (img.height, img.width)
+    assert np.abs(gray.astype(int) - expected).max() <= 1
+
+
+def test_flatten_opaque_rgb_matches_pil():
+    rgb = make_random_rgba().convert('RGB')
+    expected = np.asarray(rgb.convert('L')).astype(int)
+    assert np.abs(flatten_to_gray(to_color_array(rgb)).astype(int) - expected).max() <= 1
+
+
+def test_polar_boundaries():
+    values = np.arange(256, dtype=np.uint8)
+    # 0-9 and 246-255.
+    assert is_gray_almost_black_white(values) is False
+    assert count_polar(values) == 20
+
+
+def test_transparent_becomes_white():
+    rgba = np.array([[[0, 0, 0, 0], [0, 0, 0, 255]]], dtype=np.uint8)
+    assert flatten_to_gray(rgba).tolist() == [[255, 0]]
+
+
+def test_premultiplied_gray():
+    # (g', a): transparent, opaque black, opaque white, half transparent black.
+    la = np.array([[[0, 0], [0, 255], [255, 255], [0, 128]]], dtype=np.uint8)
+    assert flatten_premultiplied_gray(la).tolist() == [[255, 0, 255, 127]]
+
+
+def test_invert():
+    assert invert(np.array([0, 100, 255], dtype=np.uint8)).tolist() == [255, 155, 0]
+
+
+def test_black_white_polarity():
+    bw = np.zeros((10, 10, 3), dtype=np.uint8)
+    bw[:, 5:] = 255
+    assert is_almost_black_white(bw)
+    assert is_gray_almost_black_white(bw[..., 0])
+    assert is_histogram_almost_black_white(np.asarray(Image.fromarray(bw).histogram()), 100)
+    bw[:2] = 128
+    assert not is_almost_black_white(bw)
+    assert not is_gray_almost_black_white(bw[..., 0])
+    assert not is_histogram_almost_black_white(np.asarray(Image.fromarray(bw).histogram()), 100)
+
+
+def test_luminance_of_bright_pixels():
+    # 200 * 77 doesn't fit in uint8, this used to wrap with NumPy 1.x.
+    rgb = np.array([[[200, 0, 0], [0, 200, 0], [255, 255, 255]]], dtype=np.uint8)
+    assert flatten_to_gray(rgb).tolist() == [[60, 117, 255]]
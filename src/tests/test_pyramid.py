@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+
+zbar = pytest.importorskip('zbar')
+qrcode = pytest.importorskip('qrcode')
+pytest.importorskip('gi.repository.Gst', exc_type=ImportError)
+
+from ..decoding import create_scanner  # noqa: E402
+from ..frame_access import MappedFrame  # noqa: E402
+from ..pyramid import FULL_RESOLUTION, DecodePyramid, find_candidate_box  # noqa: E402
+
+
+DATA = 'https://example.com/pyramid'
+WIDTH, HEIGHT = 1920, 1080
+# Where the code is put in the frame. Not aligned to the reduce factors on purpose.
+CODE_LEFT, CODE_TOP = 1203, 601
+BOX_SIZE, BORDER = 6, 4
+
+
+def make_code() -> Image.Image:
+    qr = qrcode.QRCode(box_size=BOX_SIZE, border=BORDER)
+    qr.add_data(DATA)
+    return qr.make_image().get_image().convert('L')
+
+
+def make_texture(width: int, height: int, grain: int = 1) -> Image.Image:
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 256, (height // grain, width // grain), dtype=np.uint8)
+    return Image.fromarray(noise).resize((width, height), Image.Resampling.NEAREST)
+
+
+def make_frame(background: Image.Image) -> MappedFrame:
+    image = background.copy()
+    image.paste(make_code(), (CODE_LEFT, CODE_TOP))
+    return MappedFrame(image.width, image.height, image.tobytes())
+
+
+def test_reduce_factor():
+    pyramid = DecodePyramid()
+    assert pyramid.get_reduce_factor(1920, 640) == 3
+    assert pyramid.get_reduce_factor(1000, 640) == 2
+    assert pyramid.get_reduce_factor(640, 640) == 1
+    assert pyramid.get_reduce_factor(320, 640) == 1
+    assert pyramid.get_reduce_factor(1920, FULL_RESOLUTION) == 1
+
+
+def test_candidate_box_around_code():
+    image = Image.new('L', (640, 480), 128)
+    code = qrcode.make(DATA, box_size=2).get_image().convert('L')
+    image.paste(code, (400, 300))
+    box = find_candidate_box(image)
+    assert box
+    left, top, right, bottom = box
+    assert left <= 400 and top <= 300
+    assert right >= 400 + code.width and bottom >= 300 + code.height
+    # Not much more than the code and its margin.
+    assert (right - left) * (bottom - top) < 4 * code.width * code.height
+
+
+def test_no_candidate_box_in_blank_or_texture():
+    assert find_candidate_box(Image.new('L', (640, 480), 128)) is None
+    assert find_candidate_box(make_texture(640, 480)) is None
+
+
+def test_candidate_is_cropped_and_mapped_back():
+    # At the first level (1/8), the modules are less than a pixel, the code can only be found as evidence.
+    # At the second level (1/2), the crop around the evidence is decoded.
+    frame = make_frame(Image.new('L', (WIDTH, HEIGHT), 255))
+    pyramid = DecodePyramid((240, 960, FULL_RESOLUTION))
+    hit = pyramid.scan(create_scanner(), zbar.Image(), frame)
+    assert [s.data for s in hit.symbols] == [DATA]
+    assert hit.level == 960
+    assert hit.evidence
+    # The location is in full frame coordinates, around the code without its quiet zone.
+    xs = [x for x, y in hit.symbols[0].location]
+    ys = [y for x, y in hit.symbols[0].location]
+    margin = BOX_SIZE * BORDER
+    size = make_code().width - 2 * margin
+    assert min(xs) == pytest.approx(CODE_LEFT + margin, abs=4)
+    assert max(xs) == pytest.approx(CODE_LEFT + margin + size, abs=4)
+    assert min(ys) == pytest.approx(CODE_TOP + margin, abs=4)
+    assert max(ys) == pytest.approx(CODE_TOP + margin + size, abs=4)
+
+
+def test_escalate_after_misses():
+    # In a textured scene, there is no evidence to crop around, so the full frame is only scanned
+    # after `escalate_after` misses at the first level.
+    frame = make_frame(make_texture(WIDTH, HEIGHT, grain=8))
+    pyramid = DecodePyramid((240, FULL_RESOLUTION), escalate_after=3)
+    scanner, zimg = create_scanner(), zbar.Image()
+    for misses in (1, 2):
+        hit = pyramid.scan(scanner, zimg, frame)
+        assert not hit.symbols
+        assert hit.level == 240
+        assert pyramid.misses == misses
+    hit = pyramid.scan(scanner, zimg, frame)
+    assert [s.data for s in hit.symbols] == [DATA]
+    assert hit.level == FULL_RESOLUTION
+    assert pyramid.misses == 0
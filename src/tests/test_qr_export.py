@@ -0,0 +1,76 @@
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+
+
+pytest.importorskip('qrcode')
+
+from ..consts import ErrorCorrectionLevel  # noqa: E402
+from ..qr_export import QRExportFormat, QRStyle, iter_export_chunks, iter_module_runs  # noqa: E402
+from ..qr_matrix import make_qr_matrix  # noqa: E402
+
+
+@pytest.fixture
+def matrix():
+    return make_qr_matrix('https://quan.hoabinh.vn', ErrorCorrectionLevel.MEDIUM)
+
+
+def export(matrix, fmt: QRExportFormat) -> bytes:
+    return b''.join(iter_export_chunks(fmt, matrix, QRStyle(box_size=4, border=2, fill_color='#1c71d8')))
+
+
+def test_runs_cover_dark_modules(matrix):
+    rebuilt = np.zeros_like(matrix.modules)
+    n_runs = 0
+    for y, runs in iter_module_runs(matrix):
+        for x, length in runs:
+            assert not rebuilt[y, x : x + length].any()
+            rebuilt[y, x : x + length] = True
+            n_runs += 1
+    assert np.array_equal(rebuilt, matrix.modules)
+    assert n_runs < matrix.modules.sum()
+
+
+def test_svg(matrix):
+    root = ET.fromstring(export(matrix, QRExportFormat.SVG))
+    side = matrix.size + 4
+    assert root.get('viewBox') == f'0 0 {side} {side}'
+    assert root.get('width') == str(side * 4)
+    path = root.find('{http://www.w3.org/2000/svg}path')
+    assert path is not None
+    assert path.get('fill') == '#1c71d8'
+    lengths = [int(m) for m in re.findall(r'h(\d+)', path.get('d', ''))]
+    assert sum(lengths) == matrix.modules.sum()
+
+
+def test_pdf_cross_references(matrix):
+    data = export(matrix, QRExportFormat.PDF)
+    assert data.startswith(b'%PDF-1.4\n')
+    assert data.endswith(b'%%EOF\n')
+    startxref = int(data.rsplit(b'startxref\n', 1)[1].split()[0])
+    assert data[startxref:].startswith(b'xref\n0 6\n')
+    offsets = re.findall(rb'(\d{10}) 00000 n ', data[startxref:])
+    for number, offset in enumerate(offsets, 1):
+        assert data[int(offset) :].startswith(f'{number} 0 obj'.encode())
+    # The stream length, written after the stream.
+    length = int(re.search(rb'5 0 obj\n(\d+)', data).group(1))
+    start = data.index(b'stream\n') + len(b'stream\n')
+    assert data[start + length :].startswith(b'\nendstream')
+    side = (matrix.size + 4) * 4
+    assert f'/MediaBox [0 0 {side} {side}]'.encode() in data
+
+
+def test_eps(matrix):
+    data = export(matrix, QRExportFormat.EPS).decode()
+    side = (matrix.size + 4) * 4
+    assert data.startswith('%!PS-Adobe-3.0 EPSF-3.0\n')
+    assert f'%%BoundingBox: 0 0 {side} {side}' in data
+    assert data.count(' R\n') == sum(len(list(runs)) for _y, runs in iter_module_runs(matrix))
+
+
+def test_format_from_filename():
+    assert QRExportFormat.from_filename('code.SVG') == QRExportFormat.SVG
+    assert QRExportFormat.from_filename('code.pdf') == QRExportFormat.PDF
+    assert QRExportFormat.from_filename('code') is None
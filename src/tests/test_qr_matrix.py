@@ -0,0 +1,65 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+
+qrcode = pytest.importorskip('qrcode')
+
+from ..consts import ErrorCorrectionLevel  # noqa: E402
+from ..qr_matrix import (  # noqa: E402
+    QRMatrixCache,
+    get_qrcode_error_correction,
+    make_qr_matrix,
+    make_qr_png,
+    rasterize_qr_matrix,
+    rasterize_qr_modules,
+)
+
+
+def test_raster_matches_qrcode_image():
+    text = 'https://quan.hoabinh.vn'
+    qr = qrcode.QRCode(error_correction=get_qrcode_error_correction(ErrorCorrectionLevel.MEDIUM), box_size=5, border=2)
+    qr.add_data(text)
+    qr.make(fit=True)
+    expected = qr.make_image(fill_color='#1c71d8', back_color='#ffffff').convert('RGB')
+    matrix = make_qr_matrix(text, ErrorCorrectionLevel.MEDIUM)
+    assert matrix.version == qr.version
+    img = rasterize_qr_matrix(matrix, 5, 2, '#1c71d8', '#ffffff')
+    assert img.size == expected.size
+    assert np.array_equal(np.asarray(img), np.asarray(expected))
+
+
+def test_cache_skips_encoding_again():
+    cache = QRMatrixCache(capacity=2)
+    first = cache.get_matrix('a', ErrorCorrectionLevel.LOW)
+    assert cache.get_matrix('a', ErrorCorrectionLevel.LOW) is first
+    assert cache.get_matrix('a', ErrorCorrectionLevel.HIGH) is not first
+    cache.get_matrix('b', ErrorCorrectionLevel.LOW)
+    assert (cache.hits, cache.misses, len(cache)) == (1, 3, 2)
+    # The least recently used one, ('a', LOW), is evicted.
+    assert ('a', ErrorCorrectionLevel.LOW) not in cache.entries
+
+
+def test_matrix_is_read_only():
+    matrix = make_qr_matrix('a', ErrorCorrectionLevel.LOW)
+    assert matrix.size == 21
+    with pytest.raises(ValueError):
+        matrix.modules[0, 0] = False
+
+
+def test_one_pixel_per_module():
+    matrix = make_qr_matrix('a', ErrorCorrectionLevel.LOW)
+    pixels = rasterize_qr_modules(matrix, 4, '#1c71d8', '#ffffff')
+    assert pixels.shape == (29, 29, 3)
+    assert (pixels[:4] == 255).all()
+    # Top-left corner of the finder pattern.
+    assert tuple(pixels[4, 4]) == (0x1C, 0x71, 0xD8)
+
+
+def test_png_is_full_size():
+    matrix = make_qr_matrix('a', ErrorCorrectionLevel.LOW)
+    with Image.open(io.BytesIO(make_qr_png(matrix, 8, 3, '#000000', '#ffffff'))) as img:
+        assert img.format == 'PNG'
+        assert img.size == (27 * 8, 27 * 8)
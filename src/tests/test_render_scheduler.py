@@ -0,0 +1,77 @@
+import threading
+
+from gi.repository import GLib
+
+from ..render_scheduler import RenderScheduler
+
+
+def run_until(loop: GLib.MainLoop, done, timeout: int = 2000):
+    def check():
+        if done():
+            loop.quit()
+            return GLib.SOURCE_REMOVE
+        return GLib.SOURCE_CONTINUE
+
+    GLib.timeout_add(5, check)
+    GLib.timeout_add(timeout, loop.quit)
+    loop.run()
+
+
+def test_burst_makes_one_render():
+    loop = GLib.MainLoop()
+    rendered = []
+    scheduler = RenderScheduler(str.upper, lambda p, r: rendered.append(r), delay=20)
+    for text in ('h', 'he', 'hel', 'hell', 'hello'):
+        scheduler.request(text)
+    run_until(loop, lambda: rendered)
+    assert rendered == ['HELLO']
+    assert (scheduler.n_requested, scheduler.n_rendered) == (5, 1)
+    scheduler.shutdown()
+
+
+def test_stale_render_is_dropped():
+    loop = GLib.MainLoop()
+    release = threading.Event()
+    rendered = []
+
+    def render(text: str) -> str:
+        if text == 'slow':
+            release.wait(2)
+        return text
+
+    scheduler = RenderScheduler(render, lambda p, r: rendered.append(r), delay=1)
+    scheduler.request('slow')
+    run_until(loop, lambda: scheduler.is_rendering)
+    scheduler.request('fast')
+    release.set()
+    run_until(loop, lambda: rendered)
+    assert rendered == ['fast']
+    assert scheduler.n_dropped == 1
+    scheduler.shutdown()
+
+
+def test_same_params_are_not_rendered_again():
+    loop = GLib.MainLoop()
+    rendered = []
+    scheduler = RenderScheduler(str.upper, lambda p, r: rendered.append(r), delay=1)
+    scheduler.request('a')
+    run_until(loop, lambda: rendered)
+    scheduler.request('a')
+    run_until(loop, lambda: not scheduler.timer_id, timeout=200)
+    assert rendered == ['A']
+    assert scheduler.n_rendered == 1
+    scheduler.shutdown()
+
+
+def test_failure_is_reported():
+    loop = GLib.MainLoop()
+    failures = []
+
+    def render(text: str) -> str:
+        raise ValueError(text)
+
+    scheduler = RenderScheduler(render, lambda p, r: None, lambda p, e: failures.append(str(e)), delay=1)
+    scheduler.request('too long')
+    run_until(loop, lambda: failures)
+    assert failures == ['too long']
+    scheduler.shutdown()
@@ -0,0 +1,28 @@
+import pytest
+
+from ..scanner_profiles import ScannerProfile, load_profiles, pick_profile, pick_valid_profile
+
+
+def test_profile_config_strings():
+    profile = ScannerProfile('qr-fast', ('qrcode',), 2, 3, ('qrcode.binary',))
+    assert profile.to_config_strings() == ['disable', 'qrcode.enable', 'x-density=2', 'y-density=3', 'qrcode.binary']
+
+
+def test_all_symbologies_profile_does_not_disable():
+    assert ScannerProfile('all').to_config_strings() == ['x-density=1', 'y-density=1']
+
+
+def test_load_and_pick_profile():
+    profiles = load_profiles({'all': ([], 1, 1, []), 'qr-only': (['qrcode'], 1, 1, [])})
+    assert pick_profile(profiles, 'qr-only').symbologies == ('qrcode',)
+    # Unknown name falls back to 'all'.
+    assert pick_profile(profiles, 'nope').name == 'all'
+
+
+def test_invalid_profile_falls_back_to_default():
+    pytest.importorskip('zbar')
+    profiles = load_profiles({'all': ([], 1, 1, []), 'typo': (['qrcode'], 1, 1, ['qrcode.nonsense'])})
+    assert pick_valid_profile(profiles, 'typo').name == 'all'
+    # Even the default one may have been edited.
+    profiles = load_profiles({'all': ([], 1, 1, ['nonsense'])})
+    assert pick_valid_profile(profiles, 'all') == ScannerProfile('all')
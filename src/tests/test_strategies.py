@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from ..preprocess import adaptive_threshold
+from ..strategies import DEFAULT_STRATEGIES, DecodeStrategy, count_strategies_in_flight, pick_strategies
+
+
+def find_dark_spot(img: Image.Image) -> tuple[float, float]:
+    ys, xs = np.nonzero(np.asarray(img) < 128)
+    return xs.mean(), ys.mean()
+
+
+@pytest.mark.parametrize('rotation', [0, 15, -15, 45, 90])
+@pytest.mark.parametrize('scale', [0.5, 1, 2])
+def test_map_back_to_original(rotation: int, scale: float):
+    pixels = np.full((300, 400), 255, dtype=np.uint8)
+    pixels[50:56, 300:306] = 0
+    strategy = DecodeStrategy('test', scale=scale, rotation=rotation)
+    prepared = strategy.prepare(Image.fromarray(pixels))
+    x, y = strategy.map_back(find_dark_spot(prepared), prepared.size, (400, 300))
+    assert abs(x - 302.5) <= 2
+    assert abs(y - 52.5) <= 2
+
+
+def test_adaptive_threshold_keeps_low_contrast_marks():
+    # Dark marks on a gradient, which a global threshold would lose at one end or the other.
+    gray = np.tile(np.linspace(60, 200, 200).astype(np.uint8), (50, 1))
+    gray[20:30, ::10] -= 40
+    binary = adaptive_threshold(gray)
+    assert set(np.unique(binary)) == {0, 255}
+    assert (binary[25, ::10] == 0).all()
+    assert (binary[0] == 255).all()
+
+
+def test_adaptive_threshold_across_bands():
+    # Wide enough to be processed in several bands. Compare with the plain mean of each clipped block.
+    rng = np.random.default_rng(0)
+    gray = rng.integers(0, 256, (300, 8000), dtype=np.uint8)
+    r = 2
+    padded = np.pad(gray.astype(np.int64), r)
+    ones = np.pad(np.ones(gray.shape, dtype=np.int64), r)
+    sums = sum(padded[dy : dy + 300, dx : dx + 8000] for dy in range(2 * r + 1) for dx in range(2 * r + 1))
+    counts = sum(ones[dy : dy + 300, dx : dx + 8000] for dy in range(2 * r + 1) for dx in range(2 * r + 1))
+    expected = np.where(gray * counts > sums - 7 * counts, 255, 0)
+    assert np.array_equal(adaptive_threshold(gray, block_size=2 * r + 1, offset=7), expected)
+
+
+def test_strategies_in_flight_bounded_by_memory():
+    mib = 1024 * 1024
+    strategies = pick_strategies(DEFAULT_STRATEGIES, 4000, 3000)
+    assert count_strategies_in_flight(512 * mib, strategies, 4000, 3000, 3) == 3
+    assert count_strategies_in_flight(150 * mib, strategies, 4000, 3000, 3) == 1
+    # Never less than one, or the image could not be decoded at all.
+    assert count_strategies_in_flight(8 * mib, strategies, 4000, 3000, 3) == 1
+    rotated = DecodeStrategy('rotated', rotation=45).estimate_memory(4000, 3000)
+    assert rotated > DecodeStrategy('plain').estimate_memory(4000, 3000)
+
+
+def test_pick_strategies_by_size():
+    small = {s.name for s in pick_strategies(DEFAULT_STRATEGIES, 640, 480)}
+    large = {s.name for s in pick_strategies(DEFAULT_STRATEGIES, 4000, 3000)}
+    assert 'upscaled' in small and 'downscaled' not in small
+    assert 'downscaled' in large and 'upscaled' not in large
+    assert DEFAULT_STRATEGIES[0].name == 'plain'
@@ -0,0 +1,45 @@
+from itertools import pairwise
+
+import numpy as np
+
+from ..tiling import Tile, count_tiles_in_flight, plan_tiles, split_range
+
+
+def test_split_range_covers_with_overlap():
+    ranges = split_range(5000, 2048, 512)
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == 5000
+    for (_s1, e1), (s2, _e2) in pairwise(ranges):
+        assert e1 - s2 >= 512
+    assert split_range(1000, 2048, 512) == [(0, 1000)]
+
+
+def test_plan_tiles_from_coarse_to_fine():
+    tiles = plan_tiles(8000, 6000, 2048)
+    factors = [t.factor for t in tiles]
+    assert factors == sorted(factors, reverse=True)
+    # The coarsest level is the whole image in one tile.
+    assert tiles[0] == Tile(0, 0, 8000, 6000, 4)
+    for t in tiles:
+        assert max(t.size) <= 2048
+    # The finest level covers the whole image.
+    fine = [t for t in tiles if t.factor == 1]
+    assert max(t.right for t in fine) == 8000
+    assert max(t.bottom for t in fine) == 6000
+
+
+def test_tile_cut_and_map_back():
+    full = np.arange(100 * 80, dtype=np.uint32).reshape(80, 100)
+    tile = Tile(10, 20, 51, 60, 2)
+    cut = tile.cut(full)
+    assert cut.shape[::-1] == tile.size == (21, 20)
+    x, y = tile.map_back((3, 4))
+    assert cut[4, 3] == full[y, x]
+
+
+def test_tiles_in_flight_within_limit():
+    mib = 1024 * 1024
+    assert count_tiles_in_flight(512 * mib, 48 * mib, 2048, 8) == 8
+    assert count_tiles_in_flight(100 * mib, 48 * mib, 2048, 8) == 4
+    # Never less than one, or the image could not be decoded at all.
+    assert count_tiles_in_flight(32 * mib, 48 * mib, 2048, 8) == 1
@@ -0,0 +1,26 @@
+from ..ttl_cache import TTLCache
+
+
+def test_repeat_within_ttl():
+    cache = TTLCache(ttl=5, capacity=10)
+    assert not cache.check_and_add('a', now=0)
+    assert cache.check_and_add('a', now=3)
+    assert not cache.check_and_add('b', now=3)
+
+
+def test_repeat_after_ttl():
+    cache = TTLCache(ttl=5, capacity=10)
+    assert not cache.check_and_add('a', now=0)
+    assert not cache.check_and_add('a', now=6)
+
+
+def test_evict_least_recently_seen():
+    cache = TTLCache(ttl=60, capacity=2)
+    cache.check_and_add('a', now=0)
+    cache.check_and_add('b', now=1)
+    cache.check_and_add('a', now=2)
+    cache.check_and_add('c', now=3)
+    assert len(cache) == 2
+    # 'b' was evicted, so it is new again.
+    assert not cache.check_and_add('b', now=4)
+    assert cache.check_and_add('c', now=4)
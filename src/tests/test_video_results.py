@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from ..video_results import FrameSampler, SymbolTimeline, VideoScanReport
+
+
+def make_symbol(data: str):
+    return SimpleNamespace(type_name='QRCODE', data=data)
+
+
+def test_sampler_takes_one_frame_per_interval():
+    sampler = FrameSampler(0.5)
+    taken = [t for t in (i / 10 for i in range(21)) if sampler.should_take(t)]
+    assert taken == [0, 0.5, 1.0, 1.5, 2.0]
+    assert (sampler.n_seen, sampler.n_taken) == (21, 5)
+
+
+def test_sampler_zero_takes_all():
+    sampler = FrameSampler(0)
+    assert all(sampler.should_take(t / 30) for t in range(10))
+    # Frames without timestamp are never skipped.
+    assert FrameSampler(1).should_take(None)
+    assert FrameSampler(1).should_take(None)
+
+
+def test_timeline_merges_nearby_detections():
+    timeline = SymbolTimeline(gap=1.0)
+    assert [e.data for e in timeline.add(2.0, [make_symbol('a')])] == ['a']
+    # Out of order, from another worker.
+    assert not timeline.add(1.8, [make_symbol('a')])
+    assert [e.data for e in timeline.add(2.4, [make_symbol('a'), make_symbol('b')])] == ['b']
+    # Gone for too long, it is a new appearance.
+    assert timeline.add(5.0, [make_symbol('a')])
+    entries = timeline.get_sorted_entries()
+    assert [(e.data, e.first_seen, e.last_seen, e.n_frames) for e in entries] == [
+        ('a', 1.8, 2.4, 3),
+        ('b', 2.4, 2.4, 1),
+        ('a', 5.0, 5.0, 1),
+    ]
+
+
+def test_report_speed():
+    report = VideoScanReport('clip.mp4', duration=60, elapsed=4)
+    assert report.speed == 15
+    row = report.to_dict()
+    assert (row['status'], row['speed']) == ('not-found', 15)
@@ -0,0 +1,65 @@
+import pytest
+
+
+Gst = pytest.importorskip('gi.repository.Gst', exc_type=ImportError)
+
+from ..consts import GST_SOURCE_NAME  # noqa: E402
+from ..webcam_pipeline import WebcamPipeline  # noqa: E402
+
+
+@pytest.fixture
+def webcam_pipeline():
+    Gst.init(None)
+    webcam_pipeline = WebcamPipeline('fakesink sync=false')
+    yield webcam_pipeline
+    webcam_pipeline.stop()
+
+
+def test_swap_source_while_playing(webcam_pipeline: WebcamPipeline):
+    webcam_pipeline.set_source(f'videotestsrc name={GST_SOURCE_NAME} is-live=true pattern=black')
+    webcam_pipeline.play()
+    webcam_pipeline.pipeline.get_state(Gst.SECOND)
+    first = webcam_pipeline.source_bin
+    webcam_pipeline.set_source(f'videotestsrc name={GST_SOURCE_NAME} is-live=true pattern=white')
+    assert webcam_pipeline.source_bin is not first
+    assert first.get_parent() is None
+    # Only the new source is attached to the selector.
+    assert webcam_pipeline.selector.get_property('n-pads') == 1
+    assert webcam_pipeline.get_source_element().get_property('pattern') == 3
+    _ret, state, _pending = webcam_pipeline.pipeline.get_state(Gst.SECOND)
+    assert state == Gst.State.PLAYING
+
+
+def record_swaps(webcam_pipeline: WebcamPipeline) -> list[tuple[str, Gst.Element]]:
+    events: list[tuple[str, Gst.Element]] = []
+    webcam_pipeline.pipeline.connect('element-added', lambda _p, e: events.append(('added', e)))
+    webcam_pipeline.pipeline.connect('element-removed', lambda _p, e: events.append(('removed', e)))
+    return events
+
+
+@pytest.mark.parametrize('second_device, old_removed_first', [('/dev/video8', True), ('/dev/video9', False)])
+def test_same_camera_is_released_before_reopening(
+    webcam_pipeline: WebcamPipeline, second_device: str, old_removed_first: bool
+):
+    if not Gst.ElementFactory.find('v4l2src'):
+        pytest.skip('v4l2src is not available')
+    # The pipeline is not played, so the devices don't need to exist.
+    webcam_pipeline.set_source(f'v4l2src name={GST_SOURCE_NAME} device=/dev/video8')
+    first = webcam_pipeline.source_bin
+    events = record_swaps(webcam_pipeline)
+    webcam_pipeline.set_source(f'v4l2src name={GST_SOURCE_NAME} device={second_device} ! videoconvert')
+    second = webcam_pipeline.source_bin
+    expected = [('removed', first), ('added', second)]
+    assert events == (expected if old_removed_first else expected[::-1])
+    assert webcam_pipeline.selector.get_property('n-pads') == 1
+
+
+def test_mirror_and_freeze_without_state_change(webcam_pipeline: WebcamPipeline):
+    webcam_pipeline.set_source(f'videotestsrc name={GST_SOURCE_NAME} is-live=true')
+    webcam_pipeline.play()
+    webcam_pipeline.pipeline.get_state(Gst.SECOND)
+    webcam_pipeline.set_mirror(False)
+    webcam_pipeline.set_frozen(True)
+    assert webcam_pipeline.freeze_valve.get_property('drop')
+    _ret, state, _pending = webcam_pipeline.pipeline.get_state(0)
+    assert state == Gst.State.PLAYING
@@ -0,0 +1,121 @@
+"""Split very large images into overlapping tiles, so that they can be decoded piece by piece.
+
+A tile is cut from the full image with a reduction factor: at factor n, it covers n times more pixels
+on each side and takes every n-th pixel. So every tile has about the same number of pixels,
+whatever its factor, and the memory needed to decode it is bounded.
+Small codes are found in the tiles at factor 1, big ones in the coarser tiles.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from .preprocess import GrayArray
+
+
+if TYPE_CHECKING:
+    from .decoding import DecodedSymbol
+
+
+DEFAULT_TILE_SIZE = 2048
+# Images with more pixels than this are decoded in tiles.
+TILED_DECODE_MIN_PIXELS = 16_000_000
+# Rough number of tile-sized buffers alive while decoding a tile: the cut, the bytes passed to ZBar
+# and ZBar's own working copy.
+TILE_MEMORY_FACTOR = 3
+
+
+@dataclass(frozen=True)
+class Tile:
+    # Area in the full image.
+    left: int
+    top: int
+    right: int
+    bottom: int
+    factor: int = 1
+
+    @property
+    def size(self) -> tuple[int, int]:
+        """Size of the tile once reduced."""
+        return -(-(self.right - self.left) // self.factor), -(-(self.bottom - self.top) // self.factor)
+
+    def cut(self, full: GrayArray) -> GrayArray:
+        return full[self.top : self.bottom : self.factor, self.left : self.right : self.factor]
+
+    def map_back(self, point: tuple[int, int]) -> tuple[int, int]:
+        x, y = point
+        return x * self.factor + self.left, y * self.factor + self.top
+
+
+def split_range(length: int, span: int, overlap: int) -> list[tuple[int, int]]:
+    """Split [0, length) into ranges of the given span, overlapping by the given amount."""
+    if length <= span:
+        return [(0, length)]
+    step = span - overlap
+    starts = list(range(0, length - span, step)) + [length - span]
+    return [(s, s + span) for s in starts]
+
+
+def plan_tiles(width: int, height: int, tile_size: int = DEFAULT_TILE_SIZE) -> list[Tile]:
+    """Plan the tiles to decode an image, from the coarsest to the finest.
+
+    The coarsest factor is the first one at which the whole image fits in one tile. The coarse tiles come first,
+    because they are few and catch the big codes, which are the most common.
+    Tiles overlap by a quarter of their size, so that a code smaller than that is whole in at least one tile.
+    """
+    overlap = tile_size // 4
+    factors = [1]
+    while max(width, height) > tile_size * factors[-1]:
+        factors.append(factors[-1] * 2)
+    tiles = []
+    for factor in reversed(factors):
+        span = tile_size * factor
+        for top, bottom in split_range(height, span, overlap * factor):
+            for left, right in split_range(width, span, overlap * factor):
+                tiles.append(Tile(left, top, right, bottom, factor))
+    return tiles
+
+
+def count_tiles_in_flight(memory_limit: int, image_bytes: int, tile_size: int, n_processes: int) -> int:
+    """How many tiles can be decoded at the same time without going over the memory limit (in bytes).
+
+    The full image, shared with the workers, is counted once. We always allow one tile, even if the image alone
+    is over the limit, otherwise we could not decode it at all.
+    """
+    per_tile = TILE_MEMORY_FACTOR * tile_size * tile_size
+    return max(1, min(n_processes, (memory_limit - image_bytes) // per_tile))
+
+
+def get_bounding_box(symbol: DecodedSymbol) -> tuple[int, int, int, int] | None:
+    if not symbol.location:
+        return None
+    xs = [x for x, _y in symbol.location]
+    ys = [y for _x, y in symbol.location]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def is_same_place(a: DecodedSymbol, b: DecodedSymbol) -> bool:
+    """Tell if two symbols with the same content are one code seen twice, i.e. their boxes overlap."""
+    box_a, box_b = get_bounding_box(a), get_bounding_box(b)
+    if not box_a or not box_b:
+        return True
+    return box_a[0] <= box_b[2] and box_b[0] <= box_a[2] and box_a[1] <= box_b[3] and box_b[1] <= box_a[3]
+
+
+def merge_symbols(symbols: Iterable[DecodedSymbol]) -> list[DecodedSymbol]:
+    """Merge the symbols found in overlapping tiles, keeping the one with the best quality for each code.
+
+    The same content at two places which don't overlap is kept twice, they are two copies of the code.
+    """
+    merged: list[DecodedSymbol] = []
+    for sym in symbols:
+        for i, kept in enumerate(merged):
+            if kept.type_name == sym.type_name and kept.data == sym.data and is_same_place(kept, sym):
+                if sym.quality > kept.quality:
+                    merged[i] = sym
+                break
+        else:
+            merged.append(sym)
+    return merged
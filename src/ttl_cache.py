@@ -0,0 +1,31 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass, field
+
+
+@dataclass
+class TTLCache:
+    """Remember keys for `ttl` seconds, up to `capacity` keys (least recently seen ones are evicted).
+
+    Used to drop repeated scans of the same code in continuous scanning mode.
+    """
+
+    ttl: float = 5.0
+    capacity: int = 256
+    entries: OrderedDict[Hashable, float] = field(default_factory=OrderedDict, init=False)
+
+    def check_and_add(self, key: Hashable, now: float | None = None) -> bool:
+        """Return True if the key was seen within TTL. Either way, it is marked as seen at `now`."""
+        now = time.monotonic() if now is None else now
+        seen_at = self.entries.pop(key, None)
+        self.entries[key] = now
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return seen_at is not None and now - seen_at < self.ttl
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
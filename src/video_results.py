@@ -0,0 +1,126 @@
+"""Frame sampling and results of scanning recorded video files. No GStreamer here, see video_scan.py."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from .decoding import DecodedSymbol
+
+
+# Files with these extensions are scanned as videos by "cobang decode".
+VIDEO_SUFFIXES = frozenset('.mp4 .m4v .mkv .webm .mov .avi .ts .mts .m2ts .mpg .mpeg .ogv .3gp .flv .wmv'.split())
+# Seconds of stream time between two decoded frames. A code is rarely on screen for less than that.
+DEFAULT_SAMPLE_INTERVAL = 0.2
+# A code which is not seen for longer than this, in seconds, then seen again, is reported twice.
+DEFAULT_TIMELINE_GAP = 2.0
+
+
+class FrameSampler:
+    """Pick the frames to decode, one per `interval` seconds of stream time. 0 means every frame."""
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.next_timestamp: float | None = None
+        self.n_seen = 0
+        self.n_taken = 0
+
+    def should_take(self, timestamp: float | None) -> bool:
+        self.n_seen += 1
+        if self.interval > 0 and timestamp is not None:
+            if self.next_timestamp is not None and timestamp < self.next_timestamp:
+                return False
+            self.next_timestamp = timestamp + self.interval
+        self.n_taken += 1
+        return True
+
+
+@dataclass
+class VideoSymbol:
+    type_name: str
+    data: str
+    # Stream time, in seconds.
+    first_seen: float
+    last_seen: float
+    n_frames: int = 1
+
+    def to_dict(self) -> dict[str, object]:
+        return {
+            'type': self.type_name,
+            'data': self.data,
+            'first_seen': round(self.first_seen, 3),
+            'last_seen': round(self.last_seen, 3),
+            'frames': self.n_frames,
+        }
+
+
+class SymbolTimeline:
+    """Merge the detections of the same code in nearby frames into one entry, in order of appearance.
+
+    Frames are decoded by several workers, so they can come a bit out of order.
+    """
+
+    def __init__(self, gap: float = DEFAULT_TIMELINE_GAP):
+        self.gap = gap
+        self.entries: list[VideoSymbol] = []
+        self.latest: dict[tuple[str, str], VideoSymbol] = {}
+
+    def add(self, timestamp: float, symbols: Iterable[DecodedSymbol]) -> list[VideoSymbol]:
+        """Record the symbols found in the frame at `timestamp`. Return the entries which are new."""
+        new_entries = []
+        for sym in symbols:
+            key = (sym.type_name, sym.data)
+            entry = self.latest.get(key)
+            if entry and entry.first_seen - self.gap <= timestamp <= entry.last_seen + self.gap:
+                entry.first_seen = min(entry.first_seen, timestamp)
+                entry.last_seen = max(entry.last_seen, timestamp)
+                entry.n_frames += 1
+                continue
+            entry = self.latest[key] = VideoSymbol(sym.type_name, sym.data, timestamp, timestamp)
+            self.entries.append(entry)
+            new_entries.append(entry)
+        return new_entries
+
+    def get_sorted_entries(self) -> list[VideoSymbol]:
+        return sorted(self.entries, key=lambda e: e.first_seen)
+
+
+@dataclass
+class VideoScanReport:
+    path: str
+    symbols: list[VideoSymbol] = field(default_factory=list)
+    # Stream duration, in seconds.
+    duration: float = 0
+    # Wall time, in seconds.
+    elapsed: float = 0
+    frames_seen: int = 0
+    frames_decoded: int = 0
+    error: str = ''
+
+    @property
+    def speed(self) -> float:
+        """How many times faster than realtime."""
+        return self.duration / self.elapsed if self.elapsed > 0 else 0
+
+    def summary_text(self) -> str:
+        return (
+            f'{len(self.symbols)} codes in {self.duration:.1f} s of video, scanned in {self.elapsed:.1f} s '
+            f'({self.speed:.1f}x realtime), {self.frames_decoded} of {self.frames_seen} frames decoded'
+        )
+
+    def to_dict(self) -> dict[str, object]:
+        status = 'error' if self.error else 'found' if self.symbols else 'not-found'
+        return {
+            'path': self.path,
+            'status': status,
+            'symbols': [s.to_dict() for s in self.symbols],
+            'duration': round(self.duration, 3),
+            'elapsed_ms': round(self.elapsed * 1000, 1),
+            'speed': round(self.speed, 2),
+            'frames_seen': self.frames_seen,
+            'frames_decoded': self.frames_decoded,
+            'error': self.error,
+        }
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections.abc import Callable, Sequence
+from typing import cast
+
+from gi.repository import Gio, GLib, Gst, GstApp  # pyright: ignore[reportMissingModuleSource]
+from logbook import Logger
+
+from .consts import GST_APP_SINK_NAME, GST_SOURCE_NAME
+from .decode_worker import DecodeResult, DecodeWorkerPool, WebcamFrame
+from .frame_access import get_timestamp
+from .pyramid import FULL_RESOLUTION
+from .scanner_profiles import ScannerProfile
+from .video_results import DEFAULT_SAMPLE_INTERVAL, FrameSampler, SymbolTimeline, VideoScanReport, VideoSymbol
+
+
+log = Logger(__name__)
+
+# Frames waiting for the decode workers. The demuxer and video decoder wait when it is full.
+QUEUE_DEPTH = 4
+# The video decoder runs in its own threads, leave it a core.
+DEFAULT_WORKER_COUNT = max(1, (os.cpu_count() or 2) - 1)
+
+
+def build_video_file_pipeline_desc() -> str:
+    # Only the video stream is decoded, the audio one is not even exposed.
+    # sync=false: don't wait for the clock, go as fast as the decoding allows.
+    return (
+        f'uridecodebin name={GST_SOURCE_NAME} caps="video/x-raw(ANY)" expose-all-streams=false ! '
+        'videoconvert ! video/x-raw,format=GRAY8 ! '
+        f'appsink name={GST_APP_SINK_NAME} sync=false emit-signals=true max-buffers=2'
+    )
+
+
+class VideoFileScanner:
+    """Scan a recorded video file for codes, faster than realtime.
+
+    The GRAY8 frames from the appsink go to the same decode workers as the webcam ones, but no frame is dropped
+    for being late: the pipeline waits for the workers instead. Only one frame per `sample_interval` seconds
+    of stream time is decoded, 0 means all of them.
+
+    `on_symbol` is called with each new code, `on_done` with the report at the end, both in the main thread.
+    """
+
+    def __init__(
+        self,
+        file: Gio.File,
+        on_done: Callable[[VideoScanReport], object],
+        on_symbol: Callable[[VideoSymbol], object] | None = None,
+        sample_interval: float = DEFAULT_SAMPLE_INTERVAL,
+        profile: ScannerProfile | None = None,
+        n_workers: int = DEFAULT_WORKER_COUNT,
+        pyramid_levels: Sequence[int] = (FULL_RESOLUTION,),
+    ):
+        self.file = file
+        self.on_done = on_done
+        self.on_symbol = on_symbol
+        self.sampler = FrameSampler(sample_interval)
+        self.timeline = SymbolTimeline()
+        self.decode_pool = DecodeWorkerPool(
+            self.on_frame_decoded,
+            n_workers=n_workers,
+            queue_depth=QUEUE_DEPTH,
+            pyramid_levels=pyramid_levels,
+            profile=profile,
+            lossless=True,
+        )
+        self.pipeline: Gst.Pipeline | None = None
+        self.bus_watch_id = 0
+        self.started = 0.0
+        self.last_timestamp = 0.0
+        self.finishing = False
+
+    def start(self):
+        cmd = build_video_file_pipeline_desc()
+        log.info('To build pipeline: {}', cmd)
+        # Let GLib.Error propagate, the caller has nothing to scan without the pipeline.
+        pipeline = self.pipeline = cast(Gst.Pipeline, Gst.parse_launch(cmd))
+        source = cast(Gst.Element, pipeline.get_by_name(GST_SOURCE_NAME))
+        source.set_property('uri', self.file.get_uri())
+        app_sink = cast(GstApp.AppSink, pipeline.get_by_name(GST_APP_SINK_NAME))
+        app_sink.connect('new-sample', self.on_new_sample)
+        bus = pipeline.get_bus()
+        self.bus_watch_id = bus.add_watch(GLib.PRIORITY_DEFAULT, self.on_bus_message)
+        self.decode_pool.start()
+        self.started = time.perf_counter()
+        pipeline.set_state(Gst.State.PLAYING)
+
+    def stop(self):
+        """Stop without reporting."""
+        self.finishing = True
+        self.decode_pool.stop()
+        self.release_pipeline()
+
+    def release_pipeline(self):
+        if self.bus_watch_id:
+            GLib.source_remove(self.bus_watch_id)
+            self.bus_watch_id = 0
+        if self.pipeline:
+            self.pipeline.set_state(Gst.State.NULL)
+            self.pipeline = None
+
+    def on_new_sample(self, appsink: GstApp.AppSink) -> Gst.FlowReturn:
+        # Called in the streaming thread.
+        if not (sample := appsink.pull_sample()):
+            return Gst.FlowReturn.OK
+        timestamp = get_timestamp(sample)
+        if timestamp is not None:
+            self.last_timestamp = max(self.last_timestamp, timestamp)
+        if self.sampler.should_take(timestamp):
+            # Blocks while the decode workers are busy, which holds the video decoder back.
+            self.decode_pool.submit(WebcamFrame(sample))
+        return Gst.FlowReturn.OK
+
+    def on_frame_decoded(self, result: DecodeResult) -> bool:
+        # Called in main thread.
+        for entry in self.timeline.add(result.timestamp or 0, result.symbols):
+            log.info('Found {} code at {:.2f} s: {}', entry.type_name, entry.first_seen, entry.data)
+            if self.on_symbol:
+                self.on_symbol(entry)
+        return GLib.SOURCE_REMOVE
+
+    def on_bus_message(self, bus: Gst.Bus, message: Gst.Message) -> bool:
+        if message.type == Gst.MessageType.EOS:
+            self.finish()
+            return GLib.SOURCE_CONTINUE
+        if message.type == Gst.MessageType.ERROR:
+            error, debug = message.parse_error()
+            log.error('Error scanning video {}: {} {}', self.file.get_uri(), error, debug)
+            self.finish(error.message)
+        return GLib.SOURCE_CONTINUE
+
+    def finish(self, error: str = ''):
+        if self.finishing:
+            return
+        self.finishing = True
+        duration = self.query_duration()
+        if error:
+            self.decode_pool.stop()
+            self.report(duration, error)
+            return
+
+        # The last frames are still being decoded. Their results are posted to the main loop before the report.
+        def drain():
+            self.decode_pool.drain()
+            GLib.idle_add(self.report, duration, error)
+
+        threading.Thread(target=drain, name='cobang-video-drain', daemon=True).start()
+
+    def query_duration(self) -> float:
+        if self.pipeline:
+            ok, duration = self.pipeline.query_duration(Gst.Format.TIME)
+            if ok and duration > 0:
+                return duration / Gst.SECOND
+        return self.last_timestamp
+
+    def report(self, duration: float, error: str) -> bool:
+        self.release_pipeline()
+        report = VideoScanReport(
+            self.file.get_parse_name(),
+            self.timeline.get_sorted_entries(),
+            duration,
+            time.perf_counter() - self.started,
+            self.sampler.n_seen,
+            self.decode_pool.frames_decoded,
+            error,
+        )
+        log.info('Video scanned: {}', report.summary_text())
+        self.on_done(report)
+        return GLib.SOURCE_REMOVE
+
+
+def scan_video_file(
+    path: str, sample_interval: float = DEFAULT_SAMPLE_INTERVAL, profile: ScannerProfile | None = None
+) -> VideoScanReport:
+    """Scan a video file, running a main loop until done. For use outside the GUI."""
+    Gst.init(None)
+    loop = GLib.MainLoop()
+    reports: list[VideoScanReport] = []
+
+    def on_done(report: VideoScanReport):
+        reports.append(report)
+        loop.quit()
+
+    scanner = VideoFileScanner(
+        Gio.File.new_for_commandline_arg(path), on_done, sample_interval=sample_interval, profile=profile
+    )
+    try:
+        scanner.start()
+    except GLib.Error as e:
+        return VideoScanReport(path, error=e.message)
+    loop.run()
+    return reports[0]
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+from typing import cast
+
+from gi.repository import Gdk, GLib, Gst, GstApp  # pyright: ignore[reportMissingModuleSource]
+from logbook import Logger
+
+from .consts import (
+    GST_APP_SINK_NAME,
+    GST_FLIP_FILTER_NAME,
+    GST_FREEZE_VALVE_NAME,
+    GST_SELECTOR_NAME,
+    GST_SINK_NAME,
+    GST_SOURCE_NAME,
+)
+
+
+log = Logger(__name__)
+
+# Properties of the source elements which tell which camera they open.
+DEVICE_PROPERTY_NAMES = ('device', 'target-object', 'path', 'fd')
+
+
+def get_flip_method(mirror: bool) -> str:
+    return 'horizontal-flip' if mirror else 'none'
+
+
+def get_device_key(source_bin: Gst.Bin) -> tuple[object, ...] | None:
+    """Identify the camera opened by a source bin, or None if its source doesn't tell."""
+    if not (element := source_bin.get_by_name(GST_SOURCE_NAME)) or not (factory := element.get_factory()):
+        return None
+    values = tuple(
+        element.get_property(name) for name in DEVICE_PROPERTY_NAMES if element.find_property(name) is not None
+    )
+    if not any(v is not None and v != -1 for v in values):
+        return None
+    return (factory.get_name(), *values)
+
+
+class WebcamPipeline:
+    """Long-lived webcam pipeline, whose source can be swapped while it is running.
+
+    source bin -> input-selector -> valve -> videoflip -> videoconvert -> tee -> display sink
+                                                                          `-> GRAY8 appsink
+
+    Changing camera only replaces the source bin in front of the input-selector, and mirroring or pausing
+    only changes element properties, so the display and scan branches keep running and we don't get
+    the black screen of a NULL -> PLAYING round trip.
+    """
+
+    def __init__(self, display_sink_desc: str, mirror: bool = True):
+        # leaky=2 on the display queue prevents a stalled GL sink from back-pressuring the tee
+        # and blocking the scan branch.
+        # sync-streams=false: the old source must not hold the new one back while being swapped out.
+        cmd = (
+            f'input-selector name={GST_SELECTOR_NAME} sync-streams=false ! '
+            f'valve name={GST_FREEZE_VALVE_NAME} drop=false ! '
+            f'videoflip name={GST_FLIP_FILTER_NAME} method={get_flip_method(mirror)} ! videoconvert ! tee name=t ! '
+            f'queue leaky=2 ! videoscale ! {display_sink_desc} '
+            't. ! queue leaky=2 max-size-buffers=2 ! videoconvert ! video/x-raw,format=GRAY8 ! '
+            f'appsink name={GST_APP_SINK_NAME} max_buffers=2 drop=1'
+        )
+        log.info('To build pipeline: {}', cmd)
+        # Let GLib.Error propagate, the caller has nothing to show without the pipeline.
+        self.pipeline = cast(Gst.Pipeline, Gst.parse_launch(cmd))
+        self.selector = cast(Gst.Element, self.pipeline.get_by_name(GST_SELECTOR_NAME))
+        self.freeze_valve = cast(Gst.Element, self.pipeline.get_by_name(GST_FREEZE_VALVE_NAME))
+        self.flip_filter = cast(Gst.Element, self.pipeline.get_by_name(GST_FLIP_FILTER_NAME))
+        self.app_sink = cast(GstApp.AppSink, self.pipeline.get_by_name(GST_APP_SINK_NAME))
+        self.source_bin: Gst.Bin | None = None
+        self.selector_pad: Gst.Pad | None = None
+        log.debug('Pipeline built: {}', self.pipeline)
+
+    def get_paintable(self) -> Gdk.Paintable | None:
+        gtk4_sink = self.pipeline.get_by_name(GST_SINK_NAME)
+        if not gtk4_sink:
+            # When glsinkbin wraps gtk4paintablesink, the inner element's name is not
+            # discoverable via get_by_name() — retrieve it via the bin's "sink" property.
+            if sink_bin := self.pipeline.get_by_name('sink_bin'):
+                gtk4_sink = sink_bin.get_property('sink')
+        if not gtk4_sink:
+            log.error('Failed to get gtk4paintablesink element')
+            return None
+        log.info('Gtk4 sink: {}', gtk4_sink)
+        return gtk4_sink.get_property('paintable')
+
+    def is_from_source(self, message: Gst.Message) -> bool:
+        """Tell if the message was posted by the current source."""
+        return bool(self.source_bin and message.src and message.src.has_as_ancestor(self.source_bin))
+
+    def get_source_element(self) -> Gst.Element | None:
+        return self.source_bin.get_by_name(GST_SOURCE_NAME) if self.source_bin else None
+
+    def set_source(self, source_desc: str):
+        """Replace the current source with one built from a pipeline description, e.g. "v4l2src ! jpegdec".
+
+        The source element should be named GST_SOURCE_NAME. Raise GLib.Error if the description is invalid.
+        When switching to another camera, the old source keeps playing until the new one is set up.
+        When reopening the same camera (e.g. with another format), the old source is released first,
+        because a camera can't be opened twice.
+        """
+        started_at = time.monotonic()
+        log.info('To switch source to: {}', source_desc)
+        source_bin = cast(Gst.Bin, Gst.parse_bin_from_description(source_desc, True))
+        if self.source_bin and (key := get_device_key(source_bin)) and key == get_device_key(self.source_bin):
+            log.debug('Releasing {} before reopening it', key)
+            self.remove_source()
+        self.pipeline.add(source_bin)
+        selector_pad = cast(Gst.Pad, self.selector.request_pad_simple('sink_%u'))
+        source_bin.get_static_pad('src').link(selector_pad)
+        selector_pad.add_probe(Gst.PadProbeType.BUFFER, self.on_first_buffer, started_at)
+        source_bin.sync_state_with_parent()
+        self.selector.set_property('active-pad', selector_pad)
+        self.remove_source()
+        self.source_bin, self.selector_pad = source_bin, selector_pad
+
+    def remove_source(self):
+        if not self.source_bin or not self.selector_pad:
+            return
+        source_bin, selector_pad = self.source_bin, self.selector_pad
+        self.source_bin = self.selector_pad = None
+        source_bin.set_state(Gst.State.NULL)
+        source_bin.get_static_pad('src').unlink(selector_pad)
+        self.selector.release_request_pad(selector_pad)
+        self.pipeline.remove(source_bin)
+
+    def on_first_buffer(self, pad: Gst.Pad, info: Gst.PadProbeInfo, started_at: float) -> Gst.PadProbeReturn:
+        # Called in the streaming thread of the new source.
+        log.info('Switched webcam source in {:.0f}ms', (time.monotonic() - started_at) * 1000)
+        return Gst.PadProbeReturn.REMOVE
+
+    def set_mirror(self, mirror: bool):
+        # videoflip accepts a new method while playing, renegotiating if the frame size changes.
+        started_at = time.monotonic()
+        self.flip_filter.set_property('method', get_flip_method(mirror))
+        log.info('Changed flip method in {:.1f}ms', (time.monotonic() - started_at) * 1000)
+
+    def set_frozen(self, frozen: bool):
+        """Freeze the display on the last frame, while the camera keeps running to resume instantly."""
+        self.freeze_valve.set_property('drop', frozen)
+
+    def play(self):
+        self.set_frozen(False)
+        self.pipeline.set_state(Gst.State.PLAYING)
+
+    def stop(self):
+        """Release the camera. The pipeline can be played again later, with the same source."""
+        self.pipeline.set_state(Gst.State.NULL)
+
+    def add_bus_watch(self, callback: Callable[[Gst.Bus, Gst.Message], bool]):
+        self.pipeline.get_bus().add_watch(GLib.PRIORITY_DEFAULT, callback)
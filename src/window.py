@@ -20,6 +20,7 @@
 from __future__ import annotations
 
 import os
+from collections.abc import Sequence
 from typing import TYPE_CHECKING, Self, cast
 
 from gi.repository import (  # pyright: ignore[reportMissingModuleSource]
@@ -40,6 +41,7 @@ from .consts import (
     ScanSourceName,
 )
 from .messages import WifiInfoMessage
+from .metrics import WINDOW_SHOWN, startup_metrics
 from .net import (
     DummyAgent,
     NMWifiSecretsRetriever,
@@ -47,6 +49,7 @@ from .net import (
     get_saved_wifi_networks,
     is_connected_same_wifi,
 )
+from .pages.batch_scan import BatchScanDialog
 from .pages.generator import GeneratorPage
 from .pages.scanner import ScannerPage
 from .ui import icon_name_for_wifi_strength
@@ -79,11 +82,15 @@ class CoBangWindow(Adw.ApplicationWindow):
         action = Gio.SimpleAction.new('paste-image', None)
         self.add_action(action)
         action.connect('activate', self.on_paste_image)
+        action = Gio.SimpleAction.new('batch-scan', None)
+        self.add_action(action)
+        action.connect('activate', self.on_batch_scan)
 
         # Connect signals from scanner page
         self.scanner_page.connect('request-camera-access', self.on_camera_access_requested)
         self.scanner_page.connect('poll-wifi-connection-status', self.on_wifi_connection_status_polled)
         self.scanner_page.connect('request-connect-wifi', self.on_wifi_connecting_requested)
+        self.scanner_page.connect('request-batch-scan', self.on_batch_scan_requested)
 
         # Connect signals from generator page
         self.generator_page.connect('request-saved-wifi-networks', self.on_request_saved_wifi_networks)
@@ -98,6 +105,14 @@ class CoBangWindow(Adw.ApplicationWindow):
         self.nm_wifi_secrets_retriever.connect('wifi-secrets-retrieved', self.cb_wifi_secrets_retrieved)
         NM.Client.new_async(None, self.cb_networkmanager_client_init_done)
 
+        if self.get_application():
+            outside_sandbox = not self.portal.running_under_sandbox() and not os.getenv(ENV_EMULATE_SANDBOX)
+            log.debug('Calculated is_outside_sandbox: {}', outside_sandbox)
+            self.is_outside_sandbox = outside_sandbox
+        # Don't wait for the window to be shown, looking for cameras can take a while.
+        if self.is_outside_sandbox:
+            self.scanner_page.start_device_discovery()
+
     @property
     def portal(self) -> Xdp.Portal:
         app = self.get_application()
@@ -125,19 +140,11 @@ class CoBangWindow(Adw.ApplicationWindow):
 
     @Gtk.Template.Callback()
     def on_shown(self, *args):
-        if self.get_application():
-            outside_sandbox = not self.portal.running_under_sandbox() and not os.getenv(ENV_EMULATE_SANDBOX)
-            log.debug('Calculated is_outside_sandbox: {}', outside_sandbox)
-            self.is_outside_sandbox = outside_sandbox
-        GLib.timeout_add(1000, self.check_and_start_webcam)
-
-    def check_and_start_webcam(self):
+        startup_metrics.mark(WINDOW_SHOWN)
         scan_source = self.scanner_page.scan_source_viewstack.get_visible_child_name()
         log.info('Scan source: {}', scan_source)
         if scan_source == ScanSourceName.WEBCAM:
             self.scanner_page.request_camera_access()
-        # Indicate that we don't want to repeat this callback.
-        return False
 
     def cb_camera_access_request_via_portal(self, portal: Xdp.Portal, result: Gio.AsyncResult):
         # When testing with Ghostty terminal, the app lost focus and the portal request is denied.
@@ -211,6 +218,20 @@ class CoBangWindow(Adw.ApplicationWindow):
     def on_paste_image(self, *args):
         self.scanner_page.on_paste_image()
 
+    def on_batch_scan(self, *args):
+        self.open_batch_scan(())
+
+    def on_batch_scan_requested(self, scanner_page: ScannerPage, files: list[Gio.File]):
+        self.open_batch_scan(files)
+
+    def open_batch_scan(self, files: Sequence[Gio.File]):
+        """Open the batch scanning dialog, starting with the given files or folders."""
+        self.activate_pause_button()
+        dialog = BatchScanDialog(profile=self.scanner_page.still_decoder.profile)
+        dialog.present(self)
+        if files:
+            dialog.add_files(files)
+
     def on_request_saved_wifi_networks(self, _src: GeneratorPage):
         """Handle request to retrieve saved WiFi networks."""
         if not self.nm_client: